@@ -0,0 +1,80 @@
+"""
+Benchmarks for HtmlExporter container nesting.
+
+Compares the fragment-stream wrapping of HtmlExporter against the original
+implementation, which rebuilt the whole content string once per container.
+
+Usage:
+    python benchmarks/bench_html_exporter.py [containers:size_in_bytes ...]
+
+Defaults to 100 containers over 1 MB, 1,000 containers over 1 MB and
+10,000 containers over 10 MB.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'p'))
+
+from haba_parser import HabaData
+from html_exporter import HtmlExporter
+
+DEFAULT_CASES = [(100, 1024 * 1024), (1000, 1024 * 1024), (10_000, 10 * 1024 * 1024)]
+
+
+def legacy_wrap(haba_data):
+    """The original implementation of HtmlExporter._wrap_content_in_containers."""
+    content = haba_data.content
+    for i in reversed(range(len(haba_data.presentation_items))):
+        container, _ = haba_data.presentation_items[i]
+        class_name = f"haba-container-{i}"
+        container = container.strip()
+        if container.startswith('<') and '>' in container:
+            tag_end = container.find('>')
+            container = container[:tag_end] + f' class="{class_name}"' + container[tag_end:]
+            tag_name = container[1:container.find(' ') if ' ' in container else container.find('>')]
+            content = f"{container}\n{content}\n</{tag_name}>"
+        else:
+            content = f'<div class="{class_name}">\n{content}\n</div>'
+    return content
+
+
+def make_data(container_count, size):
+    """Builds a HabaData with container_count containers around `size` characters of content."""
+    data = HabaData()
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+    data.content = line * max(1, size // len(line))
+    tags = ["<div>", "<section>", "<p>", "<span>"]
+    # No styles: the original wrapping did not add style classes
+    data.presentation_items = [(tags[i % len(tags)], "") for i in range(container_count)]
+    return data
+
+
+def best_of(runs, func, *args):
+    """Returns the best wall-clock time of `runs` calls and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv):
+    cases = [tuple(int(part) for part in arg.split(':')) for arg in argv] or DEFAULT_CASES
+    exporter = HtmlExporter()
+    for container_count, size in cases:
+        data = make_data(container_count, size)
+        runs = 3
+        new_time, new_result = best_of(runs, exporter._wrap_content_in_containers, data)
+        print(f"{container_count} containers, {size / (1024 * 1024):.1f} MB content")
+        print(f"  streamed fragments: {new_time * 1000:10.2f} ms")
+        legacy_time, legacy_result = best_of(runs, legacy_wrap, data)
+        assert legacy_result == new_result, "outputs differ"
+        print(f"  original:           {legacy_time * 1000:10.2f} ms  ({legacy_time / new_time:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
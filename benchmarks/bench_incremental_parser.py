@@ -0,0 +1,62 @@
+"""
+Benchmarks for IncrementalHabaParser.
+
+Simulates typing one character at a time into the content and script layers
+of documents of increasing size, and compares the per-keystroke cost of a
+full HabaParser.parse against IncrementalHabaParser.apply_edit.
+
+Usage:
+    python benchmarks/bench_incremental_parser.py [size_in_bytes ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'p'))
+
+from haba_parser import HabaParser
+from incremental_parser import IncrementalHabaParser
+from bench_parser import make_document
+
+DEFAULT_SIZES = [1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024]
+KEYSTROKES = 200
+
+# A keystroke in a document of at least 1 MB must be this many times cheaper
+# than a full parse, so per-edit work that scans the whole document shows up.
+# Typing still copies the text, and the script layer is a quarter of it.
+MIN_SPEEDUP = 2
+
+
+def time_typing(text, offset, use_incremental):
+    """Returns the mean seconds per keystroke when typing at offset."""
+    parser = HabaParser()
+    incremental = IncrementalHabaParser(parser)
+    incremental.parse(text)
+    start = time.perf_counter()
+    for i in range(KEYSTROKES):
+        if use_incremental:
+            incremental.apply_edit(offset + i, 0, "x")
+        else:
+            text = text[:offset + i] + "x" + text[offset + i:]
+            parser.parse(text)
+    return (time.perf_counter() - start) / KEYSTROKES
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    print(f"{'size':>12} {'layer':>8} {'full parse (ms)':>16} {'incremental (ms)':>17}")
+    for size in sizes:
+        text = make_document(size)
+        for layer, marker in (("script", "<script_layer>\n"), ("styles", "<styles>\n")):
+            offset = text.index(marker) + len(marker)
+            full = time_typing(text, offset, use_incremental=False)
+            partial = time_typing(text, offset, use_incremental=True)
+            print(f"{len(text):>12} {layer:>8} {full * 1000:>16.3f} {partial * 1000:>17.3f}")
+            if len(text) >= 1024 * 1024:
+                assert partial * MIN_SPEEDUP < full, \
+                    f"typing in the {layer} layer is less than {MIN_SPEEDUP}x faster than a full parse"
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+"""
+Memory benchmark for holding many parsed .haba documents at once.
+
+Parses the same set of small documents into HabaData and CompactHabaData
+objects and reports the memory retained per document.
+
+Usage:
+    python benchmarks/bench_memory.py [document_count]
+
+Defaults to 100,000 documents.
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'p'))
+
+from haba_parser import HabaParser
+
+DEFAULT_COUNT = 100_000
+
+STYLES = [
+    "{ color: 'blue', font-size: '16px' }",
+    "{ color: 'black', font-size: '14px' }",
+    "{ background: 'lightgray', padding: '10px' }",
+]
+
+
+def make_document(i):
+    """A small document whose containers and styles repeat across documents."""
+    containers = "\n".join(f"        {tag}" for tag in ("<h1>", "<p>", "<div>"))
+    styles = "\n".join(f"        {style}" for style in STYLES)
+    return (
+        f"<content_layer>\n    Document {i}\n</content_layer>\n"
+        f"<presentation_layer>\n    <containers>\n{containers}\n    </containers>\n"
+        f"    <styles>\n{styles}\n    </styles>\n</presentation_layer>\n"
+        f"<script_layer>\n    console.log({i});\n</script_layer>\n"
+    )
+
+
+def retained_bytes(parse, texts):
+    gc.collect()
+    tracemalloc.start()
+    documents = [parse(text) for text in texts]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del documents
+    return size
+
+
+def main(argv):
+    count = int(argv[0]) if argv else DEFAULT_COUNT
+    parser = HabaParser()
+    texts = [make_document(i) for i in range(count)]
+    print(f"{'representation':>16} {'total (MB)':>12} {'per document (B)':>18}")
+    for name, parse in (("HabaData", parser.parse), ("CompactHabaData", parser.parse_compact)):
+        size = retained_bytes(parse, texts)
+        print(f"{name:>16} {size / 1e6:>12.1f} {size / count:>18.0f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,92 @@
+"""
+Benchmarks for HabaParser.
+
+Compares the single-pass tokenizing parser against the original
+implementation, which ran one regex search over the whole document per layer.
+
+Usage:
+    python benchmarks/bench_parser.py [size_in_bytes ...]
+
+Defaults to 1 KB, 1 MB and 50 MB documents.
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'p'))
+
+from haba_parser import HabaParser, HabaData
+
+DEFAULT_SIZES = [1024, 1024 * 1024, 50 * 1024 * 1024]
+
+
+def legacy_parse(raw_text):
+    """The original five-regex implementation of HabaParser.parse."""
+    data = HabaData()
+    content_match = re.search(r'<content_layer>(.*?)</content_layer>', raw_text, re.DOTALL)
+    if content_match:
+        data.content = content_match.group(1).strip()
+    presentation_match = re.search(r'<presentation_layer>(.*?)</presentation_layer>', raw_text, re.DOTALL)
+    if presentation_match:
+        presentation_text = presentation_match.group(1).strip()
+        containers_match = re.search(r'<containers>(.*?)</containers>', presentation_text, re.DOTALL)
+        styles_match = re.search(r'<styles>(.*?)</styles>', presentation_text, re.DOTALL)
+        containers = []
+        if containers_match:
+            containers = [line.strip() for line in containers_match.group(1).strip().split('\n') if line.strip()]
+        styles = []
+        if styles_match:
+            styles = [line.strip() for line in styles_match.group(1).strip().split('\n') if line.strip()]
+        for i in range(len(containers)):
+            style = styles[i] if i < len(styles) else ""
+            data.presentation_items.append((containers[i], style))
+    script_match = re.search(r'<script_layer>(.*?)</script_layer>', raw_text, re.DOTALL)
+    if script_match:
+        data.script = script_match.group(1).strip()
+    return data
+
+
+def make_document(size):
+    """Generates a .haba document of roughly `size` characters."""
+    item_count = max(1, size // 2000)
+    containers = "\n".join("        <div>" for _ in range(item_count))
+    styles = "\n".join(f"        {{ color: 'blue', font-size: '{10 + i % 20}px' }}" for i in range(item_count))
+    script = "    console.log('hello');\n" * max(1, size // 100)
+    overhead = len(containers) + len(styles) + len(script) + 200
+    line = "    Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+    content = line * max(1, (size - overhead) // len(line))
+    return (
+        f"<content_layer>\n{content}</content_layer>\n"
+        f"<presentation_layer>\n    <containers>\n{containers}\n    </containers>\n"
+        f"    <styles>\n{styles}\n    </styles>\n</presentation_layer>\n"
+        f"<script_layer>\n{script}</script_layer>\n"
+    )
+
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or DEFAULT_SIZES
+    parser = HabaParser()
+    print(f"{'size':>12} {'legacy (s)':>12} {'single-pass (s)':>16} {'speedup':>8}")
+    for size in sizes:
+        text = make_document(size)
+        repeat = 3 if size > 10 * 1024 * 1024 else 20
+        legacy_time, expected = best_of(legacy_parse, text, repeat)
+        new_time, actual = best_of(parser.parse, text, repeat)
+        assert (actual.content, actual.presentation_items, actual.script) == \
+            (expected.content, expected.presentation_items, expected.script)
+        print(f"{len(text):>12} {legacy_time:>12.6f} {new_time:>16.6f} {legacy_time / new_time:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
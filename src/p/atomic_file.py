@@ -0,0 +1,58 @@
+"""
+Atomic file replacement.
+
+Writes go to a temporary file in the destination directory, which is renamed
+over the destination only once everything has been written. Readers never
+see a partially written file, and a failed write leaves the old file intact.
+"""
+
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+
+
+def _read_umask():
+    """Returns the process umask. os.umask can only be read by setting it."""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import: changing the umask on every write would race with
+# other threads creating files (ResultCache writes from run_many workers)
+_NEW_FILE_MODE = 0o666 & ~_read_umask()
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'w', encoding: str = None):
+    """
+    Opens a temporary file for writing that replaces path on success.
+
+    Args:
+        path: The destination file path
+        mode: 'w' for text or 'wb' for binary
+        encoding: Text encoding (defaults to UTF-8 in text mode)
+
+    Yields:
+        The open temporary file object
+    """
+    if 'b' not in mode and encoding is None:
+        encoding = 'utf-8'
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            # mkstemp creates files readable only by the owner; keep the usual mode
+            if os.path.exists(path):
+                os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+            else:
+                os.chmod(temp_path, _NEW_FILE_MODE)
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
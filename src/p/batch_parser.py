@@ -0,0 +1,174 @@
+"""
+Bulk parsing of .haba files across a process pool.
+
+Usage:
+    python -m src.p.batch_parser content/ "drafts/**/*.haba" --workers 8
+
+Every file is read, parsed and checked for malformed layer tags (see
+HabaParser.check); files that cannot be read or decoded, or whose tags are
+unclosed, unmatched or misplaced, are reported as errors. The exit code is 1
+if any file failed.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from .haba_parser import HabaParser
+    from . import habac
+except ImportError:
+    from haba_parser import HabaParser
+    import habac
+
+# The outcome of parsing one file: data is a HabaData (None on error or
+# when data was not requested) and error is an error message or None.
+FileResult = namedtuple('FileResult', ['path', 'data', 'error', 'size'])
+
+# Aggregate numbers for a batch run
+BatchStats = namedtuple('BatchStats', ['files', 'errors', 'bytes', 'seconds', 'files_per_second', 'mb_per_second'])
+
+
+def find_haba_files(patterns) -> list:
+    """
+    Expands directories and glob patterns into a sorted list of .haba file paths.
+
+    Directories are searched recursively for *.haba files; other patterns
+    are expanded with glob (with ** support).
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(glob.glob(os.path.join(pattern, '**', '*.haba'), recursive=True))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def parse_file(path: str, parser: HabaParser = None, keep_data: bool = True, use_habac: bool = False,
+               validate: bool = False) -> FileResult:
+    """
+    Reads and parses one .haba file, capturing any error.
+
+    With use_habac, the file is loaded through its .habac cache, which is
+    written or refreshed as needed. With validate, a file with malformed
+    layer tags is reported as an error listing the problems.
+    """
+    parser = parser or HabaParser()
+    try:
+        if use_habac:
+            size = os.path.getsize(path)
+            data = habac.load_cached(path, parser)
+            if validate:
+                # The cache holds no source text, so the tags are checked on the raw bytes
+                with open(path, 'rb') as f:
+                    raw_text = f.read()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                size = os.fstat(f.fileno()).st_size
+                raw_text = f.read()
+            data = parser.parse(raw_text)
+        problems = parser.check(raw_text) if validate else None
+        if problems:
+            return FileResult(path, None, "; ".join(problems), size)
+        return FileResult(path, data if keep_data else None, None, size)
+    except (OSError, UnicodeDecodeError) as e:
+        return FileResult(path, None, f"{type(e).__name__}: {e}", 0)
+
+
+def _parse_chunk(paths, keep_data, use_habac, validate):
+    """Worker entry point: parses a chunk of files in one task."""
+    parser = HabaParser()
+    return [parse_file(path, parser, keep_data, use_habac, validate) for path in paths]
+
+
+def parse_files(paths, max_workers: int = None, chunk_size: int = None, keep_data: bool = True,
+                use_habac: bool = False, validate: bool = False):
+    """
+    Parses many .haba files in parallel.
+
+    Args:
+        paths: The file paths to parse
+        max_workers: Number of worker processes (defaults to the CPU count);
+                     1 parses in the current process
+        chunk_size: Files sent to a worker per task (defaults to about four
+                    tasks per worker)
+        keep_data: Whether to return the parsed HabaData for each file
+        use_habac: Whether to load and refresh .habac caches next to the files
+        validate: Whether to report files with malformed layer tags as errors
+
+    Returns:
+        A tuple (results, stats): the FileResult for each path, in input
+        order, and a BatchStats with throughput figures
+    """
+    paths = list(paths)
+    max_workers = max_workers or os.cpu_count() or 1
+    if not chunk_size:
+        chunk_size = max(1, -(-len(paths) // (max_workers * 4)))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+
+    start = time.perf_counter()
+    if max_workers == 1 or len(chunks) <= 1:
+        results = [result for chunk in chunks for result in _parse_chunk(chunk, keep_data, use_habac, validate)]
+    else:
+        results_by_chunk = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_parse_chunk, chunk, keep_data, use_habac, validate): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                results_by_chunk[futures[future]] = future.result()
+        results = [result for i in range(len(chunks)) for result in results_by_chunk[i]]
+    seconds = time.perf_counter() - start
+
+    total_bytes = sum(result.size for result in results)
+    elapsed = max(seconds, 1e-9)
+    stats = BatchStats(
+        files=len(results),
+        errors=sum(1 for result in results if result.error),
+        bytes=total_bytes,
+        seconds=seconds,
+        files_per_second=len(results) / elapsed,
+        mb_per_second=total_bytes / (1024 * 1024) / elapsed,
+    )
+    return results, stats
+
+
+def main(argv=None):
+    """
+    The main function for the batch parser CLI.
+    """
+    parser = argparse.ArgumentParser(description="Parse many .haba files in parallel and report unreadable files and malformed layer tags.")
+    parser.add_argument("paths", nargs="+", help="Directories (searched recursively) or glob patterns of .haba files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Files per worker task.")
+    parser.add_argument("--habac", action="store_true", help="Load from and refresh .habac caches next to each file.")
+    parser.add_argument("--quiet", action="store_true", help="Only print errors and the summary.")
+    args = parser.parse_args(argv)
+
+    paths = find_haba_files(args.paths)
+    if not paths:
+        print("Error: No .haba files found.")
+        sys.exit(1)
+
+    results, stats = parse_files(paths, max_workers=args.workers, chunk_size=args.chunk_size,
+                                  keep_data=False, use_habac=args.habac, validate=True)
+
+    for result in results:
+        if result.error:
+            print(f"ERROR {result.path}: {result.error}")
+        elif not args.quiet:
+            print(f"OK    {result.path}")
+
+    print("-" * 30)
+    print(f"Parsed {stats.files} files ({stats.bytes / (1024 * 1024):.2f} MB) in {stats.seconds:.2f}s "
+          f"- {stats.files_per_second:.1f} files/s, {stats.mb_per_second:.2f} MB/s")
+    if stats.errors:
+        print(f"{stats.errors} file(s) failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,270 @@
+"""
+Runs the script layers of .haba files from the command line.
+
+Usage:
+    python -m src.p.cli_runner page.haba
+    python -m src.p.cli_runner content/ "drafts/**/*.haba" --jobs 4 --jsonl
+
+A single file is run with its console output streamed as it arrives.
+Several files, directories (searched recursively) or glob patterns are run
+concurrently, each in a pooled browser, and reported as they finish: as
+text, or with --jsonl as one JSON object per document followed by a JSON
+summary on stderr.
+
+Exit codes:
+    0  Every script ran without errors
+    1  No files were found, or a file could not be read
+    2  Invalid arguments
+    3  A script reported an error or timed out, or no browser could run it
+"""
+
 import argparse
+import json
 import sys
 import os
+import time
+from collections import namedtuple
+
+from .script_runner import ScriptRunner, DEFAULT_SCRIPT_TIMEOUT
+
+EXIT_OK = 0
+EXIT_FILE_ERROR = 1
+EXIT_SCRIPT_ERROR = 3
 
-from .script_runner import ScriptRunner
+# The outcome of running one document's script
+DocumentResult = namedtuple('DocumentResult', ['path', 'logs', 'tasks', 'seconds', 'read_error'])
 
-def main():
+# Aggregate numbers for a batch run
+RunStats = namedtuple('RunStats', ['documents', 'script_errors', 'read_errors', 'tasks', 'seconds',
+                                   'documents_per_second', 'mean_seconds', 'p95_seconds', 'max_seconds'])
+
+
+def expand_paths(patterns) -> list:
     """
-    The main function for the CLI script runner.
+    Expands the command line paths into a list of files, without duplicates.
+
+    Directories and glob patterns are expanded with find_haba_files; other
+    paths are kept as given, so a missing file is reported rather than
+    skipped.
+    """
+    # batch_parser imports multiprocessing, which is only needed when parsing
+    from .batch_parser import find_haba_files
+
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern) or any(c in pattern for c in '*?['):
+            matches = find_haba_files([pattern])
+            if not matches:
+                print(f"Warning: No .haba files match '{pattern}'", file=sys.stderr)
+        else:
+            matches = [pattern]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def has_errors(tasks) -> bool:
+    return any(task['type'] == 'error' for task in tasks)
+
+
+def run_documents(runner, paths, max_workers=None, timeout=DEFAULT_SCRIPT_TIMEOUT):
+    """
+    Runs the scripts of many .haba files concurrently.
+
+    :return: An iterator of DocumentResult, in the order the runs finish.
+    """
+    started = {}
+    read_errors = set()
+
+    def read(path):
+        started[path] = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, UnicodeDecodeError):
+            read_errors.add(path)
+            raise
+
+    for path, logs, tasks in runner.run_many(paths, max_workers=max_workers, timeout=timeout, read=read):
+        seconds = time.perf_counter() - started.pop(path, time.perf_counter())
+        yield DocumentResult(path, logs, tasks, seconds, path in read_errors)
+
+
+def summarize(times, script_errors: int, read_errors: int, tasks: int, seconds: float) -> RunStats:
+    """
+    Returns the aggregate numbers of a batch run that took seconds, given
+    the run time of each document and the error and task counts.
     """
-    parser = argparse.ArgumentParser(description="Run the script from a .haba file and get actionable tasks.")
-    parser.add_argument("file", help="The path to the .haba file to run.")
-    args = parser.parse_args()
+    times = sorted(times)
+    count = len(times)
+    return RunStats(
+        documents=count,
+        script_errors=script_errors,
+        read_errors=read_errors,
+        tasks=tasks,
+        seconds=seconds,
+        documents_per_second=count / max(seconds, 1e-9),
+        mean_seconds=sum(times) / count if count else 0.0,
+        p95_seconds=times[min(count - 1, int(count * 0.95))] if count else 0.0,
+        max_seconds=times[-1] if count else 0.0,
+    )
 
+
+def exit_code(stats: RunStats) -> int:
+    if stats.read_errors:
+        return EXIT_FILE_ERROR
+    if stats.script_errors:
+        return EXIT_SCRIPT_ERROR
+    return EXIT_OK
+
+
+def print_tasks(tasks, indent=""):
+    for task in tasks:
+        print(f"{indent}- [{task['type'].upper()}] {task['description']}")
+        if task.get('details'):
+            print(f"{indent}  Details: {task['details']}")
+
+
+def run_single(args) -> int:
+    """Runs one file, streaming its console output. Returns the exit code."""
     try:
-        with open(args.file, 'r', encoding='utf-8') as f:
+        with open(args.files[0], 'r', encoding='utf-8') as f:
             haba_content = f.read()
     except FileNotFoundError:
-        print(f"Error: File not found at '{args.file}'")
-        sys.exit(1)
+        print(f"Error: File not found at '{args.files[0]}'")
+        return EXIT_FILE_ERROR
     except Exception as e:
         print(f"Error reading file: {e}")
-        sys.exit(1)
+        return EXIT_FILE_ERROR
+
+    from .result_cache import ResultCache
 
-    print(f"Running script from '{args.file}'...")
-    runner = ScriptRunner()
-    logs, tasks = runner.run_script(haba_content)
+    print(f"Running script from '{args.files[0]}'...")
+    runner = ScriptRunner(result_cache=ResultCache() if args.cache else None)
     print("-" * 30)
 
-    print("\n--- Console Output ---")
-    if logs:
-        for log in logs:
-            print(log)
-    else:
+    # Logs are printed as the script produces them
+    print("\n--- Console Output ---", flush=True)
+    streamed = 0
+
+    def print_log(log):
+        nonlocal streamed
+        streamed += 1
+        print(log, flush=True)
+
+    try:
+        logs, tasks = runner.run_script(haba_content, timeout=args.timeout,
+                                        on_log=None if args.cache else print_log)
+    finally:
+        runner.close()
+    for log in logs:
+        print(log)
+    if not logs and not streamed:
         print("No console output.")
 
     print("\n--- Actionable Tasks ---")
     if tasks:
-        for task in tasks:
-            print(f"- [{task['type'].upper()}] {task['description']}")
-            if task.get('details'):
-                print(f"  Details: {task['details']}")
+        print_tasks(tasks)
     else:
         print("No actionable tasks found.")
+    return EXIT_SCRIPT_ERROR if has_errors(tasks) else EXIT_OK
+
+
+def run_batch(args, paths) -> int:
+    """Runs many files concurrently, reporting each as it finishes. Returns the exit code."""
+    from .result_cache import ResultCache
+
+    cache = ResultCache() if args.cache else None
+    runner = ScriptRunner(result_cache=cache)
+    timeout = args.timeout if args.timeout is not None else DEFAULT_SCRIPT_TIMEOUT
+    # Only the numbers the summary needs are kept, not each document's logs
+    times = []
+    script_errors = read_errors = task_count = 0
+    start = time.perf_counter()
+    try:
+        for result in run_documents(runner, paths, max_workers=args.jobs, timeout=timeout):
+            times.append(result.seconds)
+            task_count += len(result.tasks)
+            if result.read_error:
+                read_errors += 1
+            elif has_errors(result.tasks):
+                # Includes scripts that could not run because no browser started
+                script_errors += 1
+            if args.jsonl:
+                record = {'file': result.path, 'ok': not has_errors(result.tasks),
+                          'seconds': round(result.seconds, 4), 'logs': result.logs, 'tasks': result.tasks}
+                print(json.dumps(record), flush=True)
+            elif not args.quiet or has_errors(result.tasks):
+                status = "ERROR" if has_errors(result.tasks) else "OK"
+                print(f"[{status}] {result.path} ({result.seconds:.2f}s)")
+                if not args.quiet:
+                    for log in result.logs:
+                        print(f"    {log}")
+                print_tasks(result.tasks, indent="    ")
+                sys.stdout.flush()
+    finally:
+        runner.close()
+    stats = summarize(times, script_errors, read_errors, task_count, time.perf_counter() - start)
+
+    if args.jsonl:
+        summary = {key: round(value, 4) if isinstance(value, float) else value
+                   for key, value in stats._asdict().items()}
+        if cache is not None:
+            summary.update(cache_hits=cache.hits, cache_misses=cache.misses)
+        print(json.dumps({'summary': summary}), file=sys.stderr)
+    else:
+        print("-" * 30)
+        print(f"Ran {stats.documents} scripts in {stats.seconds:.2f}s - {stats.documents_per_second:.1f} scripts/s; "
+              f"per script: mean {stats.mean_seconds:.2f}s, p95 {stats.p95_seconds:.2f}s, max {stats.max_seconds:.2f}s")
+        if cache is not None:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+        if stats.read_errors:
+            print(f"{stats.read_errors} file(s) could not be read.")
+        if stats.script_errors:
+            print(f"{stats.script_errors} script(s) reported errors.")
+    return exit_code(stats)
+
+
+def main(argv=None):
+    """
+    The main function for the CLI script runner.
+    """
+    from .result_cache import DEFAULT_CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Run the script from .haba files and get actionable tasks.")
+    parser.add_argument("files", nargs="+",
+                        help="The .haba files to run; directories (searched recursively) and glob patterns "
+                             "run every .haba file they contain.")
+    parser.add_argument("--cache", action="store_true",
+                        help=f"Reuse the results of earlier runs of the same script (stored in {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Number of scripts run at once, each in its own browser (default: CPU count).")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help=f"Seconds each script may run (default: {DEFAULT_SCRIPT_TIMEOUT} when running many files).")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="Print one JSON object per file, and a JSON summary on stderr.")
+    parser.add_argument("--quiet", action="store_true",
+                        help="When running many files, only print failing files and the summary.")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    single = (len(args.files) == 1 and not args.jsonl and not os.path.isdir(args.files[0])
+              and not any(c in args.files[0] for c in '*?['))
+    if single:
+        code = run_single(args)
+    else:
+        paths = expand_paths(args.files)
+        if not paths:
+            print("Error: No .haba files found.", file=sys.stderr)
+            code = EXIT_FILE_ERROR
+        else:
+            code = run_batch(args, paths)
+    if code:
+        sys.exit(code)
 
 if __name__ == "__main__":
     main()
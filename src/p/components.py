@@ -2,6 +2,11 @@ import tkinter as tk
 from tkinter import ttk
 import re
 
+try:
+    from .haba_parser import LineIndex
+except ImportError:
+    from haba_parser import LineIndex
+
 class SymbolOutlinePanel(tk.Frame):
     """
     A panel to display an outline of symbols based on the language.
@@ -71,8 +76,9 @@ class TodoExplorerPanel(tk.Frame):
         if not pattern:
             return
 
+        line_index = LineIndex(text_content)
         for match in pattern.finditer(text_content):
-            line_num = text_content.count('\n', 0, match.start()) + 1
+            line_num = line_index.line_number(match.start())
 
             if match.group(1):  # Matched // comment
                 keyword = match.group(1)
@@ -0,0 +1,103 @@
+"""
+Writing exported files together with precompressed siblings.
+
+A static file server can send example.html.gz (or example.html.zst) as-is
+instead of compressing example.html on every request. CompressedOutput
+compresses the bytes as they are written, so the output is never read back.
+
+gzip is always available. zstd needs the optional zstandard package; when
+it is missing, a zstd request falls back to gzip.
+"""
+
+import contextlib
+import gzip
+import os
+
+try:
+    from .atomic_file import atomic_write
+except ImportError:
+    from atomic_file import atomic_write
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+COMPRESSION_SUFFIXES = {GZIP: '.gz', ZSTD: '.zst'}
+
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 19
+
+
+def resolve_formats(formats) -> list:
+    """
+    Returns the compression formats that will actually be written for a request.
+
+    Unknown formats raise ValueError; zstd falls back to gzip when the
+    zstandard package is not installed. Duplicates are removed.
+    """
+    resolved = []
+    for name in formats:
+        if name not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression format '{name}' (expected one of {', '.join(COMPRESSION_SUFFIXES)})")
+        if name == ZSTD and not ZSTD_AVAILABLE:
+            name = GZIP
+        if name not in resolved:
+            resolved.append(name)
+    return resolved
+
+
+class CompressedOutput:
+    """
+    A binary, write-only stream that writes an output file and a compressed
+    copy per format in one pass.
+
+    Every file is written atomically. After the stream is closed, sizes maps
+    each written path to its size in bytes.
+
+    Example:
+        with CompressedOutput("page.html", ["gzip"]) as out:
+            exporter.export_to_stream(haba_data, out)
+    """
+
+    def __init__(self, output_path: str, formats=(GZIP,)):
+        self.output_path = output_path
+        self.formats = resolve_formats(formats)
+        self.sizes = {}
+        self._stack = None
+        self._writers = []
+
+    def __enter__(self):
+        with contextlib.ExitStack() as stack:
+            self._writers = [stack.enter_context(atomic_write(self.output_path, 'wb'))]
+            for name in self.formats:
+                raw = stack.enter_context(atomic_write(self.output_path + COMPRESSION_SUFFIXES[name], 'wb'))
+                self._writers.append(stack.enter_context(self._compressor(name, raw)))
+            self._stack = stack.pop_all()
+        return self
+
+    def _compressor(self, name, raw):
+        if name == ZSTD:
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+        # No name or timestamp in the header, so unchanged output compresses identically
+        return gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def write(self, data: bytes) -> int:
+        for writer in self._writers:
+            writer.write(data)
+        return len(data)
+
+    def flush(self):
+        # The files are flushed when the stream is closed
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stack.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            paths = [self.output_path] + [self.output_path + COMPRESSION_SUFFIXES[name] for name in self.formats]
+            self.sizes = {path: os.path.getsize(path) for path in paths}
+        return False
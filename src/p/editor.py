@@ -4,32 +4,37 @@ import re
 import os
 import sys
 import json
-import numpy as np
-try:
-    from quanta_tissu.tisslm.core.model import QuantaTissu
-    from quanta_tissu.tisslm.core.tokenizer import Tokenizer
-    from quanta_tissu.tisslm.core.generate_text import generate_text
-    QUANTA_TISSU_AVAILABLE = True
-except ImportError:
-    QUANTA_TISSU_AVAILABLE = False
 
 # Handle both relative and absolute imports
 try:
     from .menu import MenuBar
     from .haba_parser import HabaParser, HabaData
+    from .incremental_parser import IncrementalHabaParser
+    from .parse_cache import CachingHabaParser
     from .components import SymbolOutlinePanel, TodoExplorerPanel
     from .script_runner import ScriptRunner
     from .html_exporter import HtmlExporter
     from .oauth_client import OAuthClient
     from .config_manager import ConfigManager
+    from .lazy_import import lazy_import, is_available
 except ImportError:
     from menu import MenuBar
     from haba_parser import HabaParser, HabaData
+    from incremental_parser import IncrementalHabaParser
+    from parse_cache import CachingHabaParser
     from components import SymbolOutlinePanel, TodoExplorerPanel
     from script_runner import ScriptRunner
     from html_exporter import HtmlExporter
     from oauth_client import OAuthClient
     from config_manager import ConfigManager
+    from lazy_import import lazy_import, is_available
+
+# The model is only imported when the demo window loads it. Only the top-level
+# package is checked here; a missing submodule is reported by initialize_model
+QUANTA_TISSU_AVAILABLE = is_available('quanta_tissu')
+QuantaTissu = lazy_import('quanta_tissu.tisslm.core.model', 'QuantaTissu')
+Tokenizer = lazy_import('quanta_tissu.tisslm.core.tokenizer', 'Tokenizer')
+generate_text = lazy_import('quanta_tissu.tisslm.core.generate_text', 'generate_text')
 
 
 class QuantaDemoWindow(tk.Toplevel):
@@ -49,9 +54,9 @@ class QuantaDemoWindow(tk.Toplevel):
         self.external_model_client = external_model_client
         self.active_profile_name = None
 
-        # Create widgets first, then initialize model
+        # Create widgets first, then load the model once the window is shown
         self.create_widgets()
-        self.initialize_model()
+        self.after_idle(self.initialize_model)
         self.menu_bar = MenuBar(self)
         
         # Start demo after everything is set up
@@ -84,6 +89,10 @@ class QuantaDemoWindow(tk.Toplevel):
             self.log_to_console(f"Model Error: {e}. Check paths. Demo will use stubbed responses.")
             self.model = None
             self.tokenizer = None
+        except ImportError as e:
+            self.log_to_console(f"Error: `quanta_tissu` model could not be imported ({e}). Demo will use stubbed responses.")
+            self.model = None
+            self.tokenizer = None
         except Exception as e:
             self.log_to_console(f"An unexpected error occurred during model initialization: {e}")
             self.model = None
@@ -822,8 +831,11 @@ class HabaEditor(tk.Frame):
 
         # Initialize managers and variables
         self.config_manager = ConfigManager()
-        self.parser = HabaParser()
-        self.script_runner = ScriptRunner()
+        # Saving, exporting and running scripts re-parse the same buffer,
+        # so parses are cached by content hash
+        self.parser = CachingHabaParser()
+        self.incremental_parser = IncrementalHabaParser(self.parser)
+        self.script_runner = ScriptRunner(parser=self.parser)
         self.html_exporter = HtmlExporter()
         self.language = 'javascript' # Default language for the script panel
         self.external_model_client = None
@@ -1017,19 +1029,24 @@ class HabaEditor(tk.Frame):
             self.run_button.config(state=tk.DISABLED, text="Running...")
             self.update()
 
-        logs, tasks = self.script_runner.run_script(haba_content)
+        # Logs are shown in the console panel as the script produces them
+        self.console_output_text.config(state=tk.NORMAL)
+        self.console_output_text.delete("1.0", tk.END)
+        self.console_output_text.config(state=tk.DISABLED)
+
+        def show_log(log):
+            self.console_output_text.config(state=tk.NORMAL)
+            self.console_output_text.insert(tk.END, f"{log}\n")
+            self.console_output_text.see(tk.END)
+            self.console_output_text.config(state=tk.DISABLED)
+            self.update_idletasks()
+
+        logs, tasks = self.script_runner.run_script(haba_content, on_log=show_log)
 
         # Re-enable the button if it exists
         if hasattr(self, 'run_button'):
             self.run_button.config(state=tk.NORMAL, text="Run Script")
 
-        # Update console output panel
-        self.console_output_text.config(state=tk.NORMAL)
-        self.console_output_text.delete("1.0", tk.END)
-        for log in logs:
-            self.console_output_text.insert(tk.END, f"{log}\n")
-        self.console_output_text.config(state=tk.DISABLED)
-
         # Update actionable tasks panel
         self.tasks_listbox.delete(0, tk.END)
         for task in tasks:
@@ -1074,11 +1091,8 @@ class HabaEditor(tk.Frame):
         script_content = self.script_text.get("1.0", tk.END)
         haba_data.script = script_content.strip()
 
-        # Build the final .haba content string
-        final_content = self.parser.build(haba_data)
-
-        with open(filepath, "w") as f:
-            f.write(final_content)
+        # Write the .haba layers straight to disk, replacing the file atomically
+        self.parser.build_to_file(haba_data, filepath)
 
     def export_html(self):
         """
@@ -1135,7 +1149,8 @@ class HabaEditor(tk.Frame):
     def render_preview(self):
         raw_content = self.raw_text.get("1.0", tk.END)
         try:
-            haba_data = self.parser.parse(raw_content)
+            # Only the layer touched since the last render is re-parsed
+            haba_data = self.incremental_parser.update(raw_content)
         except Exception as e:
             # If parsing fails, show error in preview
             self.preview_text.config(state=tk.NORMAL)
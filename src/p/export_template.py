@@ -0,0 +1,258 @@
+"""
+Compiled document templates for HtmlExporter.
+
+A template is the static skeleton of an exported page with slots for the
+dynamic parts:
+
+    {{title}}       the document title
+    {{css}}         the generated style rules
+    {{content}}     the content wrapped in its containers
+    {{script}}      the script layer
+    {{stylesheet}}  the URL of a shared stylesheet, when the styles are
+                    exported to one (see HtmlExporter.shared_stylesheet)
+
+and optional sections: {{#script}}...{{/script}} is rendered only when the
+slot has a value, and {{^script}}...{{/script}} only when it has none.
+Compiling splits the text once into static fragments, slots and sections.
+For each combination of rendered sections, and each encoding, the
+template is then laid out once as a tuple of (static text, slot) pairs,
+with the static text pre-encoded, so rendering a page is a plain loop that
+only writes the slot values in between.
+"""
+
+import re
+from functools import lru_cache
+
+SLOT_NAMES = ('title', 'css', 'content', 'script', 'stylesheet')
+
+_TOKEN_PATTERN = re.compile(r'\{\{\s*([#^/]?)\s*(\w+)\s*\}\}')
+
+# Compiled template parts
+_TEXT = 'text'
+_SLOT = 'slot'
+_SECTION = 'section'
+_INVERTED_SECTION = 'inverted_section'
+
+
+class TemplateError(ValueError):
+    """Raised when a template uses an unknown slot or has unbalanced sections."""
+
+
+DEFAULT_TEMPLATE = (
+    '<!DOCTYPE html>\n'
+    '<html lang="en">\n'
+    '<head>\n'
+    '    <meta charset="UTF-8">\n'
+    '    <meta name="viewport" content="width=device-width, initial-scale=1.0">\n'
+    '    <title>{{title}}</title>\n'
+    '{{#stylesheet}}'
+    '    <link rel="stylesheet" href="{{stylesheet}}">\n'
+    '{{/stylesheet}}'
+    '{{^stylesheet}}'
+    '    <style>\n'
+    '        /* Haba Generated Styles */\n'
+    '{{css}}'
+    '        body { font-family: Arial, sans-serif; margin: 20px; }\n'
+    '        .haba-content { max-width: 800px; margin: 0 auto; }\n'
+    '    </style>\n'
+    '{{/stylesheet}}'
+    '</head>\n'
+    '<body>\n'
+    '    <div class="haba-content">\n'
+    '        {{content}}\n'
+    '    </div>\n'
+    '{{#script}}'
+    '    <script>\n'
+    '        {{script}}\n'
+    '    </script>\n'
+    '{{/script}}'
+    '</body>\n'
+    '</html>'
+)
+
+MINIFIED_TEMPLATE = (
+    '<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8">'
+    '<meta name="viewport" content="width=device-width,initial-scale=1.0">'
+    '<title>{{title}}</title>'
+    '{{#stylesheet}}<link rel="stylesheet" href="{{stylesheet}}">{{/stylesheet}}'
+    '{{^stylesheet}}'
+    '<style>{{css}}body{font-family:Arial,sans-serif;margin:20px}.haba-content{max-width:800px;margin:0 auto}</style>'
+    '{{/stylesheet}}'
+    '</head><body><div class="haba-content">{{content}}</div>'
+    '{{#script}}<script>{{script}}</script>{{/script}}'
+    '</body></html>'
+)
+
+
+def _compile(text):
+    """Splits template text into a tree of text, slot and section parts."""
+    root = []
+    stack = [(None, root)]
+    pos = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        marker, name = match.groups()
+        if name not in SLOT_NAMES:
+            raise TemplateError(f"Unknown template slot '{name}' (expected one of {', '.join(SLOT_NAMES)})")
+        parts = stack[-1][1]
+        if match.start() > pos:
+            parts.append((_TEXT, text[pos:match.start()]))
+        pos = match.end()
+
+        if marker in ('#', '^'):
+            section_parts = []
+            parts.append((_SECTION if marker == '#' else _INVERTED_SECTION, name, section_parts))
+            stack.append((name, section_parts))
+        elif marker == '/':
+            if stack[-1][0] != name:
+                raise TemplateError(f"Unexpected end of section '{name}'")
+            stack.pop()
+        else:
+            parts.append((_SLOT, name))
+
+    if len(stack) > 1:
+        raise TemplateError(f"Section '{stack[-1][0]}' is not closed")
+    if pos < len(text):
+        root.append((_TEXT, text[pos:]))
+    return root
+
+
+def _layout(parts, sections, layout):
+    """
+    Appends the (static text, slot name) pairs of compiled parts to layout.
+
+    sections maps each section name to whether it is rendered. Adjacent
+    static text, such as the text on both sides of a skipped section, is
+    merged into one pair; the slot name is None only for trailing text.
+    """
+    for part in parts:
+        if part[0] == _TEXT:
+            text, name = layout[-1]
+            if name is None:
+                layout[-1] = (text + part[1], None)
+            else:
+                layout.append((part[1], None))
+        elif part[0] == _SLOT:
+            text, name = layout[-1]
+            if name is None:
+                layout[-1] = (text, part[1])
+            else:
+                layout.append(('', part[1]))
+        elif sections[part[1]] == (part[0] == _SECTION):
+            _layout(part[2], sections, layout)
+    return layout
+
+
+def _render(layout, values):
+    """Yields the static text and slot values of a layout in order."""
+    for text, name in layout:
+        if text:
+            yield text
+        if name is None:
+            continue
+        value = values.get(name)
+        if value.__class__ is str:
+            if value:
+                yield value
+        elif value is not None:
+            yield from value()
+
+
+class ExportTemplate:
+    """
+    A compiled page template.
+
+    Compile a template once and reuse it for every export; templates are
+    immutable and can be shared between exporters and threads.
+    """
+
+    def __init__(self, text: str):
+        """
+        Args:
+            text: The template text
+
+        Raises:
+            TemplateError: If the template is malformed
+        """
+        self.text = text
+        self._parts = _compile(text)
+        # Each section gets a bit of the mask that selects a layout
+        self._section_bits = tuple((1 << i, name) for i, name in enumerate(sorted(self._section_names())))
+        self._layouts = {}  # encoding -> {section mask -> layout}
+
+    def _section_names(self, parts=None) -> set:
+        """The names of the sections in parts, nested ones included."""
+        names = set()
+        for part in self._parts if parts is None else parts:
+            if part[0] in (_SECTION, _INVERTED_SECTION):
+                names.add(part[1])
+                names |= self._section_names(part[2])
+        return names
+
+    def _layout(self, values: dict, encoding: str = None) -> tuple:
+        """Returns the layout for the sections values renders, built once per combination."""
+        mask = 0
+        for bit, name in self._section_bits:
+            if values.get(name):
+                mask |= bit
+        layouts = self._layouts.get(encoding)
+        if layouts is None:
+            layouts = self._layouts.setdefault(encoding, {})
+        layout = layouts.get(mask)
+        if layout is None:
+            sections = {name: bool(mask & bit) for bit, name in self._section_bits}
+            layout = _layout(self._parts, sections, [('', None)])
+            if encoding is not None:
+                layout = [(text.encode(encoding), name) for text, name in layout]
+            layout = layouts[mask] = tuple(layout)
+        return layout
+
+    @classmethod
+    def from_file(cls, filepath: str, encoding: str = 'utf-8') -> 'ExportTemplate':
+        """Compiles the template stored in a file."""
+        with open(filepath, 'r', encoding=encoding) as f:
+            return compile_template(f.read())
+
+    @property
+    def slots(self) -> set:
+        """The names of the slots and sections the template uses."""
+        names = set()
+        pending = list(self._parts)
+        while pending:
+            part = pending.pop()
+            if part[0] == _SLOT:
+                names.add(part[1])
+            elif part[0] in (_SECTION, _INVERTED_SECTION):
+                names.add(part[1])
+                pending.extend(part[2])
+        return names
+
+    def iter_render(self, values: dict, encoding: str = None):
+        """
+        Yields the rendered page as fragments.
+
+        Args:
+            values: Slot name -> value. A value is a str, or a callable
+                returning an iterable of str fragments (called once per use
+                of the slot). A section is rendered when its value is truthy,
+                and an inverted section when it is not.
+            encoding: If given, static fragments are yielded as pre-encoded
+                bytes; slot values are always yielded as str
+
+        Yields:
+            str fragments, and bytes fragments when an encoding is given
+        """
+        return _render(self._layout(values, encoding), values)
+
+    def render(self, values: dict) -> str:
+        """Returns the rendered page as a string."""
+        return "".join(self.iter_render(values))
+
+
+@lru_cache(maxsize=32)
+def compile_template(text: str) -> ExportTemplate:
+    """Compiles template text, reusing the compiled template for text seen before."""
+    return ExportTemplate(text)
+
+
+DEFAULT = compile_template(DEFAULT_TEMPLATE)
+MINIFIED = compile_template(MINIFIED_TEMPLATE)
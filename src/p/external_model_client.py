@@ -1,10 +1,16 @@
 import webbrowser
-import requests
-from requests_oauthlib import OAuth2Session
 import os
 import threading
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
+try:
+    from .lazy_import import lazy_import
+except ImportError:
+    from lazy_import import lazy_import
+
+# Imported on first use
+OAuth2Session = lazy_import('requests_oauthlib', 'OAuth2Session')
+
 # Placeholder credentials - in a real application, these would be stored securely
 # and not hardcoded.
 REDIRECT_URI = "http://localhost:8080/callback"
@@ -57,8 +57,5 @@ class FileHandler:
         script_content = self.editor.display.script_text.get("1.0", tk.END)
         haba_data.script = script_content.strip()
 
-        # Build the final .haba content string
-        final_content = self.editor.parser.build(haba_data)
-
-        with open(filepath, "w") as f:
-            f.write(final_content)
+        # Write the .haba layers straight to disk, replacing the file atomically
+        self.editor.parser.build_to_file(haba_data, filepath)
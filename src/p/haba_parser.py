@@ -1,11 +1,267 @@
+import io
 import re
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, MutableSequence
+from types import MappingProxyType
+
+try:
+    from .atomic_file import atomic_write
+except ImportError:
+    from atomic_file import atomic_write
+
+LAYER_TAGS = ('content_layer', 'presentation_layer', 'containers', 'styles', 'script_layer')
+PRESENTATION_TAG = 'presentation_layer'
+NESTED_TAGS = ('containers', 'styles')
+TOP_LEVEL_TAGS = ('content_layer', 'presentation_layer', 'script_layer')
+_LAYER_INDEX = {name: i for i, name in enumerate(LAYER_TAGS)}
+
+# Matches any opening or closing layer tag, e.g. <content_layer> or </styles>
+_TAG_PATTERN = re.compile(r'<(/?)(' + '|'.join(LAYER_TAGS) + r')>')
+# The same pattern for bytes-like buffers (bytes, mmap) in ASCII-compatible encodings
+_BYTES_TAG_PATTERN = re.compile(_TAG_PATTERN.pattern.encode('ascii'))
+_LINE_PATTERN = re.compile(r'[^\n]+')
+
+# Characters encoded at a time when writing to binary streams
+_ENCODE_CHUNK_SIZE = 1024 * 1024
+
+
+def _strip_span(text, start, end):
+    """Returns text[start:end].strip() without copying the unstripped slice."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return text[start:end]
+
+
+def _span_lines(text, span):
+    """Returns the stripped, non-empty lines of text within span (one entry per line)."""
+    if span is None:
+        return []
+    lines = []
+    for match in _LINE_PATTERN.finditer(text, *span):
+        line = match.group().strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+class LineIndex:
+    """
+    Maps offsets in a source text to line numbers.
+
+    The table of line start offsets is built with one scan when the index is
+    created, and no reference to the source is kept; every lookup is a binary
+    search. Lines are numbered from 1 and columns from 0, matching Tk text
+    indices. The source may be a str or a bytes-like buffer.
+    """
+    __slots__ = ('line_starts',)
+
+    def __init__(self, source):
+        newline = '\n' if isinstance(source, str) else b'\n'
+        # 4-byte offsets unless the source is too large for them
+        starts = array('I' if len(source) < 2 ** 32 else 'q', [0])
+        position = source.find(newline)
+        while position != -1:
+            starts.append(position + 1)
+            position = source.find(newline, position + 1)
+        self.line_starts = starts  # The offset at which each line starts
+
+    def __sizeof__(self):
+        # Includes the line table, which sys.getsizeof would leave out
+        return super().__sizeof__() + len(self.line_starts) * self.line_starts.itemsize
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    def line_number(self, offset: int) -> int:
+        """Returns the 1-based line containing offset."""
+        return bisect_right(self.line_starts, offset)
+
+    def position(self, offset: int):
+        """Returns the (line, column) of offset."""
+        line = self.line_number(offset)
+        return line, offset - self.line_starts[line - 1]
+
+    def offset(self, line: int, column: int = 0) -> int:
+        """Returns the offset of a (line, column) position."""
+        return self.line_starts[line - 1] + column
+
+    def tk_index(self, offset: int) -> str:
+        """Returns offset as a Tk text index such as "3.4"."""
+        return "%d.%d" % self.position(offset)
+
+    def line_range(self, start: int, end: int):
+        """Returns the first and last lines touched by the span [start, end]."""
+        return self.line_number(start), self.line_number(end)
+
+
+# The shared, read-only source_spans of data without source information
+_NO_SPANS = MappingProxyType({})
+
+
+class LayerSpans(Mapping):
+    """
+    A read-only mapping of layer names to (start, end) source offsets.
+
+    The offsets of every layer in LAYER_TAGS are stored in one array instead
+    of a dict of tuples, which keeps parse results small.
+    """
+    __slots__ = ('_offsets',)
+
+    def __init__(self, spans: dict):
+        offsets = array('q', [-1]) * (2 * len(LAYER_TAGS))
+        for name, (start, end) in spans.items():
+            i = 2 * _LAYER_INDEX[name]
+            offsets[i] = start
+            offsets[i + 1] = end
+        self._offsets = offsets
+
+    def __getitem__(self, name):
+        i = 2 * _LAYER_INDEX.get(name, -1)
+        if i < 0 or self._offsets[i] < 0:
+            raise KeyError(name)
+        return self._offsets[i], self._offsets[i + 1]
+
+    def __iter__(self):
+        return (name for i, name in enumerate(LAYER_TAGS) if self._offsets[2 * i] >= 0)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __sizeof__(self):
+        # Includes the offsets array, which sys.getsizeof would leave out
+        return super().__sizeof__() + len(self._offsets) * self._offsets.itemsize
+
+    def __repr__(self):
+        return f"LayerSpans({dict(self)!r})"
+
 
 class HabaData:
     """A simple data class to hold the parsed Haba file content."""
+    __slots__ = ('content', 'presentation_items', 'script', 'source_spans', 'line_index')
+
     def __init__(self):
         self.content = ""
         self.presentation_items = [] # A list of tuples (container_text, style_text)
         self.script = ""
+        self.source_spans = {} # Layer name -> (start, end) offsets in the parsed source (a LayerSpans once parsed)
+        self.line_index = None # LineIndex of the parsed source, built by layer_lines
+
+    def layer_lines(self, name: str, source=None):
+        """
+        Returns the (first, last) source lines of a layer's text, or None if the
+        layer is missing or no source information is available.
+
+        Args:
+            name: The layer name
+            source: The text the data was parsed from. Parsing does not build
+                a line index, so the first call needs the source to build one;
+                later calls reuse it.
+        """
+        span = self.source_spans.get(name)
+        if span is None:
+            return None
+        if self.line_index is None:
+            if source is None:
+                return None
+            self.line_index = LineIndex(source)
+        return self.line_index.line_range(*span)
+
+
+class PresentationItemsView(MutableSequence):
+    """
+    A list-like view of a CompactHabaData's containers and styles as (container, style) tuples.
+
+    Reading is cheap; changes rebuild the underlying tables, so prefer
+    assigning a whole new list when making many changes.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self):
+        return len(self._data._containers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(self._data._containers[index], self._data._styles[index]))
+        return (self._data._containers[index], self._data._styles[index])
+
+    def __iter__(self):
+        return zip(self._data._containers, self._data._styles)
+
+    def __setitem__(self, index, value):
+        items = list(self)
+        items[index] = value
+        self._data.presentation_items = items
+
+    def __delitem__(self, index):
+        items = list(self)
+        del items[index]
+        self._data.presentation_items = items
+
+    def insert(self, index, value):
+        items = list(self)
+        items.insert(index, value)
+        self._data.presentation_items = items
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, PresentationItemsView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class CompactHabaData(HabaData):
+    """
+    A memory-compact HabaData for holding many parsed documents at once.
+
+    Containers and styles are stored as two parallel tuples of interned
+    strings instead of a list of tuples, so repeated containers and styles
+    are shared between items and between documents. The attribute API is
+    the same as HabaData; presentation_items is a PresentationItemsView.
+    No source information is kept: source_spans is always empty and
+    layer_lines returns None.
+    """
+    __slots__ = ('_containers', '_styles')
+
+    def __init__(self):
+        self.content = ""
+        self.script = ""
+        self.source_spans = _NO_SPANS
+        self.line_index = None
+        self._containers = ()
+        self._styles = ()
+
+    @property
+    def presentation_items(self):
+        return PresentationItemsView(self)
+
+    @presentation_items.setter
+    def presentation_items(self, items):
+        containers = []
+        styles = []
+        for container, style in items:
+            containers.append(sys.intern(container))
+            styles.append(sys.intern(style))
+        self._containers = tuple(containers)
+        self._styles = tuple(styles)
+
+    @classmethod
+    def from_data(cls, haba_data: HabaData) -> 'CompactHabaData':
+        """Creates a CompactHabaData with the same content as haba_data."""
+        data = cls()
+        data.content = haba_data.content
+        data.presentation_items = haba_data.presentation_items
+        data.script = haba_data.script
+        return data
 
 class HabaParser:
     """
@@ -16,45 +272,124 @@ class HabaParser:
     In the presentation_layer, containers and styles are matched by order.
     """
 
+    def scan(self, raw_text: str) -> dict:
+        """
+        Finds the boundaries of every layer in a single pass over the text.
+
+        raw_text may also be a bytes-like buffer such as an mmap of a UTF-8
+        file, in which case the offsets are byte offsets.
+
+        Returns a dict mapping layer names (see LAYER_TAGS) to the (start, end)
+        offsets of the text between the layer's opening and closing tags.
+        Like the original per-layer regex search, the first opening tag wins
+        and is paired with the first closing tag after it. The containers and
+        styles sections are only recognised inside the presentation layer.
+        """
+        is_text = isinstance(raw_text, str)
+        pattern = _TAG_PATTERN if is_text else _BYTES_TAG_PATTERN
+        opened = {}
+        spans = {}
+        for match in pattern.finditer(raw_text):
+            closing, name = match.groups()
+            if not is_text:
+                name = name.decode('ascii')
+            if name in spans:
+                continue
+            if name in NESTED_TAGS and (PRESENTATION_TAG not in opened or PRESENTATION_TAG in spans):
+                continue
+            if closing:
+                if name in opened:
+                    spans[name] = (opened[name], match.start())
+                    if all(tag in spans for tag in TOP_LEVEL_TAGS):
+                        break
+            elif name not in opened:
+                opened[name] = match.end()
+        return spans
+
+    def check(self, raw_text: str) -> list:
+        """
+        Finds layer tags that scan() has to skip or cannot pair.
+
+        parse() never fails on malformed markup; it leaves out any layer it
+        cannot pair. This reports why: tags that are never closed, closing
+        tags without an opening tag, repeated layers and containers or styles
+        sections outside the presentation layer.
+
+        Returns a list of messages in document order, empty for a well-formed file.
+        """
+        is_text = isinstance(raw_text, str)
+        pattern = _TAG_PATTERN if is_text else _BYTES_TAG_PATTERN
+        newline = '\n' if is_text else b'\n'
+        opened = {}
+        closed = set()
+        repeated = set()
+        problems = []
+        for match in pattern.finditer(raw_text):
+            closing, name = match.groups()
+            if not is_text:
+                closing, name = closing.decode('ascii'), name.decode('ascii')
+            if name in NESTED_TAGS and PRESENTATION_TAG not in opened:
+                problems.append((match.start(), f"<{closing}{name}> is outside the presentation layer"))
+            elif closing:
+                if name in opened:
+                    del opened[name]
+                    closed.add(name)
+                elif name in repeated:
+                    repeated.discard(name)
+                else:
+                    problems.append((match.start(), f"</{name}> has no opening tag"))
+            elif name in opened or name in closed:
+                problems.append((match.start(), f"<{name}> is repeated and ignored"))
+                repeated.add(name)
+            else:
+                opened[name] = match.start()
+        problems.extend((start, f"<{name}> is never closed") for name, start in opened.items())
+        problems.sort(key=lambda problem: problem[0])
+        return [f"line {raw_text.count(newline, 0, start) + 1}: {message}" for start, message in problems]
+
     def parse(self, raw_text: str) -> HabaData:
         """
         Parses the raw text of a .haba file into a HabaData object.
         """
-        data = HabaData()
+        return self.parse_spans(raw_text, self.scan(raw_text))
+
+    def parse_compact(self, raw_text: str) -> CompactHabaData:
+        """
+        Parses the raw text of a .haba file into a CompactHabaData object.
 
-        # Extract content layer
-        content_match = re.search(r'<content_layer>(.*?)</content_layer>', raw_text, re.DOTALL)
-        if content_match:
-            data.content = content_match.group(1).strip()
+        No layer spans or line index are attached, to keep each document small.
+        """
+        return self.parse_spans(raw_text, self.scan(raw_text), CompactHabaData, with_source_info=False)
 
-        # Extract presentation layer
-        presentation_match = re.search(r'<presentation_layer>(.*?)</presentation_layer>', raw_text, re.DOTALL)
-        if presentation_match:
-            presentation_text = presentation_match.group(1).strip()
+    def parse_spans(self, raw_text: str, spans: dict, data_class=HabaData, with_source_info: bool = True) -> HabaData:
+        """
+        Builds a HabaData (or data_class) object from layer spans previously found by scan().
 
-            # Extract containers and styles
-            containers_match = re.search(r'<containers>(.*?)</containers>', presentation_text, re.DOTALL)
-            styles_match = re.search(r'<styles>(.*?)</styles>', presentation_text, re.DOTALL)
+        Unless with_source_info is False, the spans are kept as
+        data.source_spans. No line index is built here, since that scans the
+        whole text on every parse; data.layer_lines(name, raw_text) builds it
+        on first use.
+        """
+        data = data_class()
+        if with_source_info:
+            data.source_spans = LayerSpans(spans)
 
-            containers = []
-            if containers_match:
-                # Assuming one container per line for now
-                containers = [line.strip() for line in containers_match.group(1).strip().split('\n') if line.strip()]
+        if 'content_layer' in spans:
+            data.content = _strip_span(raw_text, *spans['content_layer'])
 
-            styles = []
-            if styles_match:
-                # Assuming one style per line for now
-                styles = [line.strip() for line in styles_match.group(1).strip().split('\n') if line.strip()]
+        if PRESENTATION_TAG in spans:
+            containers = _span_lines(raw_text, spans.get('containers'))
+            styles = _span_lines(raw_text, spans.get('styles'))
 
             # Match containers and styles by order
+            presentation_items = []
             for i in range(len(containers)):
                 style = styles[i] if i < len(styles) else "" # Default to empty style if not enough styles
-                data.presentation_items.append((containers[i], style))
+                presentation_items.append((containers[i], style))
+            data.presentation_items = presentation_items
 
-        # Extract script layer
-        script_match = re.search(r'<script_layer>(.*?)</script_layer>', raw_text, re.DOTALL)
-        if script_match:
-            data.script = script_match.group(1).strip()
+        if 'script_layer' in spans:
+            data.script = _strip_span(raw_text, *spans['script_layer'])
 
         return data
 
@@ -62,28 +397,67 @@ class HabaParser:
         """
         Builds a .haba file string from a HabaData object.
         """
-        # Build content layer
-        content_str = f"<content_layer>\n    {haba_data.content}\n</content_layer>\n"
+        return "".join(self.iter_build(haba_data))
 
-        # Build presentation layer
-        containers_str = "\n".join([f"        {item[0]}" for item in haba_data.presentation_items])
-        styles_str = "\n".join([f"        {item[1]}" for item in haba_data.presentation_items])
+    def iter_build(self, haba_data: HabaData):
+        """
+        Yields the .haba text for a HabaData object as a sequence of fragments.
+
+        The layers are yielded as-is rather than copied into larger strings,
+        so the fragments can be written out without building the document.
+        """
+        # Content layer
+        yield "<content_layer>\n    "
+        yield haba_data.content
+        yield "\n</content_layer>\n"
 
-        presentation_str = (
-            "<presentation_layer>\n"
-            "    <containers>\n"
-            f"{containers_str}\n"
-            "    </containers>\n"
-            "    <styles>\n"
-            f"{styles_str}\n"
-            "    </styles>\n"
-            "</presentation_layer>\n"
-        )
+        # Presentation layer, one container and one style per line
+        yield "<presentation_layer>\n    <containers>\n"
+        yield from self._iter_lines(item[0] for item in haba_data.presentation_items)
+        yield "    </containers>\n    <styles>\n"
+        yield from self._iter_lines(item[1] for item in haba_data.presentation_items)
+        yield "    </styles>\n</presentation_layer>\n"
 
-        # Build script layer
-        script_str = f"<script_layer>\n    {haba_data.script}\n</script_layer>\n"
+        # Script layer
+        yield "<script_layer>\n    "
+        yield haba_data.script
+        yield "\n</script_layer>\n"
+
+    def _iter_lines(self, values):
+        empty = True
+        for value in values:
+            empty = False
+            yield f"        {value}\n"
+        if empty:
+            yield "\n"
+
+    def build_to(self, haba_data: HabaData, stream, encoding: str = 'utf-8'):
+        """
+        Writes the .haba text for a HabaData object to an open file object.
 
-        return content_str + presentation_str + script_str
+        Args:
+            haba_data: The data to write
+            stream: A text or binary file object
+            encoding: Encoding used when stream is binary
+        """
+        if isinstance(stream, io.TextIOBase):
+            for fragment in self.iter_build(haba_data):
+                stream.write(fragment)
+            return
+        for fragment in self.iter_build(haba_data):
+            # Encode large layers piece by piece to avoid a full encoded copy
+            for start in range(0, len(fragment), _ENCODE_CHUNK_SIZE):
+                stream.write(fragment[start:start + _ENCODE_CHUNK_SIZE].encode(encoding))
+
+    def build_to_file(self, haba_data: HabaData, filepath: str, encoding: str = 'utf-8'):
+        """
+        Saves a HabaData object as a .haba file.
+
+        The file is written to a temporary file and renamed over filepath,
+        so an interrupted save never leaves a truncated document behind.
+        """
+        with atomic_write(filepath, 'w', encoding=encoding) as f:
+            self.build_to(haba_data, f)
 
 
 # Example Usage (for testing purposes)
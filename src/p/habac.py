@@ -0,0 +1,191 @@
+"""
+The .habac pre-parsed cache format.
+
+A .habac file stores a parsed HabaData next to its .haba source so it can be
+reloaded without parsing. Layout (little-endian):
+
+    header:  magic b'HABC', format version (u16),
+             source mtime in ns (i64), source size in bytes (u64),
+             BLAKE2b-128 digest of the source bytes (16 bytes)
+    table:   content length (u64), script length (u64), item count (u32),
+             then a (container length, style length) u32 pair per item
+    data:    the UTF-8 content, script, and each container and style, in order
+
+load_cached() trusts the cache when the source mtime and size are unchanged,
+falls back to comparing the digest when they differ, and otherwise parses
+the source and rewrites the cache.
+"""
+
+import hashlib
+import os
+import struct
+from collections import namedtuple
+
+try:
+    from .haba_parser import HabaParser, HabaData
+    from .atomic_file import atomic_write
+except ImportError:
+    from haba_parser import HabaParser, HabaData
+    from atomic_file import atomic_write
+
+MAGIC = b'HABC'
+FORMAT_VERSION = 1
+CACHE_SUFFIX = 'c'  # example.haba -> example.habac
+
+_HEADER = struct.Struct('<4sHqQ16s')
+_TABLE = struct.Struct('<QQI')
+_ITEM = struct.Struct('<II')
+
+# Source file metadata stored in a .habac header
+SourceInfo = namedtuple('SourceInfo', ['mtime_ns', 'size', 'digest'])
+
+
+class HabacFormatError(ValueError):
+    """Raised when a .habac file is truncated, corrupt or of another format version."""
+
+
+def cache_path_for(source_path: str) -> str:
+    """Returns the .habac path stored next to a .haba source file."""
+    return source_path + CACHE_SUFFIX
+
+
+def source_digest(raw_bytes: bytes) -> bytes:
+    """Returns the digest of a source file's bytes stored in the header."""
+    return hashlib.blake2b(raw_bytes, digest_size=16).digest()
+
+
+def decode_source(raw_bytes: bytes) -> str:
+    """Decodes source bytes the way open(path, 'r', encoding='utf-8') reads them."""
+    return raw_bytes.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def dumps(haba_data: HabaData, source: SourceInfo) -> bytes:
+    """Serializes haba_data and its source metadata to .habac bytes."""
+    content = haba_data.content.encode('utf-8')
+    script = haba_data.script.encode('utf-8')
+    encoded_items = [(container.encode('utf-8'), style.encode('utf-8'))
+                     for container, style in haba_data.presentation_items]
+
+    parts = [
+        _HEADER.pack(MAGIC, FORMAT_VERSION, source.mtime_ns, source.size, source.digest),
+        _TABLE.pack(len(content), len(script), len(encoded_items)),
+    ]
+    parts.extend(_ITEM.pack(len(container), len(style)) for container, style in encoded_items)
+    parts.append(content)
+    parts.append(script)
+    for container, style in encoded_items:
+        parts.append(container)
+        parts.append(style)
+    return b"".join(parts)
+
+
+def read_header(raw: bytes) -> SourceInfo:
+    """Reads the source metadata from the start of .habac bytes."""
+    if len(raw) < _HEADER.size:
+        raise HabacFormatError("Truncated .habac header")
+    magic, version, mtime_ns, size, digest = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise HabacFormatError("Not a .habac file")
+    if version != FORMAT_VERSION:
+        raise HabacFormatError(f"Unsupported .habac version {version} (expected {FORMAT_VERSION})")
+    return SourceInfo(mtime_ns, size, digest)
+
+
+def loads(raw: bytes):
+    """
+    Deserializes .habac bytes.
+
+    Returns:
+        A tuple (HabaData, SourceInfo)
+    """
+    source = read_header(raw)
+    view = memoryview(raw)
+    try:
+        offset = _HEADER.size
+        content_length, script_length, item_count = _TABLE.unpack_from(raw, offset)
+        offset += _TABLE.size
+        item_lengths = [_ITEM.unpack_from(raw, offset + i * _ITEM.size) for i in range(item_count)]
+        offset += item_count * _ITEM.size
+
+        def take(length):
+            nonlocal offset
+            if offset + length > len(raw):
+                raise HabacFormatError("Truncated .habac data")
+            text = str(view[offset:offset + length], 'utf-8')
+            offset += length
+            return text
+
+        data = HabaData()
+        data.content = take(content_length)
+        data.script = take(script_length)
+        data.presentation_items = [(take(container_length), take(style_length))
+                                   for container_length, style_length in item_lengths]
+    except (struct.error, UnicodeDecodeError) as e:
+        raise HabacFormatError(f"Corrupt .habac data: {e}") from e
+    finally:
+        view.release()
+    return data, source
+
+
+def write_cache(source_path: str, haba_data: HabaData = None, parser: HabaParser = None) -> HabaData:
+    """
+    Writes the .habac cache for a .haba file, parsing it unless haba_data is given.
+
+    haba_data must be the parse of the file's current contents.
+
+    Returns:
+        The HabaData that was cached
+    """
+    with open(source_path, 'rb') as f:
+        stat_result = os.fstat(f.fileno())
+        raw_bytes = f.read()
+    return _write_cache(source_path, raw_bytes, stat_result, haba_data, parser)
+
+
+def _write_cache(source_path, raw_bytes, stat_result, haba_data, parser):
+    if haba_data is None:
+        parser = parser or HabaParser()
+        haba_data = parser.parse(decode_source(raw_bytes))
+    source = SourceInfo(stat_result.st_mtime_ns, stat_result.st_size, source_digest(raw_bytes))
+    with atomic_write(cache_path_for(source_path), 'wb') as f:
+        f.write(dumps(haba_data, source))
+    return haba_data
+
+
+def load_cached(source_path: str, parser: HabaParser = None, write: bool = True) -> HabaData:
+    """
+    Loads a .haba file through its .habac cache.
+
+    Args:
+        source_path: Path to the .haba file
+        parser: The HabaParser used when the cache is missing or stale
+        write: Whether to (re)write a missing or stale cache
+
+    Returns:
+        The parsed HabaData
+    """
+    stat_result = os.stat(source_path)
+    try:
+        with open(cache_path_for(source_path), 'rb') as f:
+            raw = f.read()
+        data, source = loads(raw)
+    except (OSError, HabacFormatError):
+        data = source = None
+
+    if source is not None and (source.mtime_ns, source.size) == (stat_result.st_mtime_ns, stat_result.st_size):
+        return data
+
+    with open(source_path, 'rb') as f:
+        stat_result = os.fstat(f.fileno())
+        raw_bytes = f.read()
+    if source is None or source.size != len(raw_bytes) or source.digest != source_digest(raw_bytes):
+        parser = parser or HabaParser()
+        data = parser.parse(decode_source(raw_bytes))
+    # Otherwise the source was only touched: keep the cached data
+
+    if write:
+        try:
+            _write_cache(source_path, raw_bytes, stat_result, data, parser)
+        except OSError:
+            pass  # The parse is still good; a cache that cannot be written is rebuilt next time
+    return data
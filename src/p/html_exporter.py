@@ -3,75 +3,384 @@ HTML Exporter for Haba files.
 Converts .haba files to .html files with proper styling and structure.
 """
 
+import hashlib
+import io
+import os
 import re
+from bisect import bisect_right
 try:
     from .haba_parser import HabaData
+    from .atomic_file import atomic_write
+    from .compressed_output import CompressedOutput
+    from . import export_template
 except ImportError:
     from haba_parser import HabaData
+    from atomic_file import atomic_write
+    from compressed_output import CompressedOutput
+    import export_template
+
+# Bump whenever a change to the exporter changes its output, so incremental
+# builds (see site_exporter) re-export every document.
+EXPORTER_VERSION = "3"
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_STYLE_CACHE_SIZE = 4096
+STYLE_CLASS_PREFIX = "haba-style-"
+
+# Style properties, in both 'key: value' and "key: 'value'" formats
+_STYLE_PAIR_PATTERN = re.compile(r"([\w-]+)\s*:\s*['\"]?([^,'\"]*)['\"]?")
+_CSS_SPACE_PATTERN = re.compile(r"\s*([:;,{}])\s*")
+# JavaScript tokens that matter for finding string and template literal text:
+# comments, quoted strings (which only span lines through a backslash
+# continuation), template literal starts and braces
+_SCRIPT_CODE_PATTERN = re.compile(r"""//[^\n]*|/\*.*?(?:\*/|\Z)|'(?:\\.|[^'\\\n])*'?|"(?:\\.|[^"\\\n])*"?|[`{}]""",
+                                  re.DOTALL)
+# Escapes, the end of a template literal and the start of a ${...} expression
+_SCRIPT_TEMPLATE_PATTERN = re.compile(r"\\.|`|\$\{", re.DOTALL)
+
+
+def minify_css(css: str) -> str:
+    """Removes the optional whitespace around CSS punctuation."""
+    return _CSS_SPACE_PATTERN.sub(r"\1", css).strip()
+
+
+def _literal_spans(script: str) -> list:
+    """
+    Returns the (start, end) offsets of the text of the string and template
+    literals in a script, in order.
+
+    Regular expression literals are not recognised, so a quote or backtick
+    in one is taken as the start of a literal.
+    """
+    spans = []
+    frames = [0]  # Brace depth of each code level, None for template text
+    position = 0
+    text_start = 0
+    while position < len(script):
+        if frames[-1] is None:
+            match = _SCRIPT_TEMPLATE_PATTERN.search(script, position)
+            while match is not None and match.group()[0] == '\\':
+                match = _SCRIPT_TEMPLATE_PATTERN.search(script, match.end())
+            if match is None:
+                spans.append((text_start, len(script)))
+                break
+            spans.append((text_start, match.start()))
+            if match.group() == '`':
+                frames.pop()
+            else:
+                frames.append(0)
+            position = match.end()
+            continue
+
+        match = _SCRIPT_CODE_PATTERN.search(script, position)
+        if match is None:
+            break
+        token = match.group()
+        position = match.end()
+        if token == '`':
+            frames.append(None)
+            text_start = position
+        elif token == '{':
+            frames[-1] += 1
+        elif token == '}':
+            if frames[-1]:
+                frames[-1] -= 1
+            elif len(frames) > 1:
+                # The end of a ${...} expression
+                frames.pop()
+                text_start = position
+        elif token[0] in '\'"':
+            spans.append(match.span())
+    return spans
+
+
+def minify_script(script: str) -> str:
+    """
+    Removes blank lines and surrounding whitespace from JavaScript lines.
+
+    Line breaks are kept, since automatic semicolon insertion depends on
+    them. Line breaks inside string and template literals, such as a
+    backslash continuation or the text of a multi-line template, are left
+    as they are, with the whitespace around them.
+    """
+    spans = _literal_spans(script)
+    starts = [start for start, _ in spans]
+
+    def in_literal(offset):
+        i = bisect_right(starts, offset) - 1
+        return i >= 0 and offset < spans[i][1]
+
+    lines = []
+    offset = 0
+    starts_in_literal = False
+    for line in script.split('\n'):
+        offset += len(line)
+        ends_in_literal = offset < len(script) and in_literal(offset)
+        offset += 1
+        if not starts_in_literal:
+            line = line.lstrip()
+        if not ends_in_literal:
+            line = line.rstrip()
+        if line or starts_in_literal or ends_in_literal:
+            lines.append(line)
+        starts_in_literal = ends_in_literal
+    return '\n'.join(lines)
+
+
+def _iter_chunks(fragments, chunk_size):
+    """Regroups text fragments into pieces of at most chunk_size characters."""
+    pending = []
+    pending_size = 0
+    for fragment in fragments:
+        if pending_size + len(fragment) <= chunk_size:
+            pending.append(fragment)
+            pending_size += len(fragment)
+            continue
+        if pending:
+            yield "".join(pending)
+            pending = []
+            pending_size = 0
+        if len(fragment) <= chunk_size:
+            pending.append(fragment)
+            pending_size = len(fragment)
+            continue
+        for start in range(0, len(fragment), chunk_size):
+            piece = fragment[start:start + chunk_size]
+            if len(piece) == chunk_size:
+                yield piece
+            else:
+                pending.append(piece)
+                pending_size = len(piece)
+    if pending:
+        yield "".join(pending)
+
+
+def _write_encoded(stream, fragments, chunk_size, encoding):
+    """
+    Writes str and pre-encoded bytes fragments to a binary stream in writes
+    of at most chunk_size bytes.
+    """
+    pending = []
+    pending_size = 0
+    for fragment in fragments:
+        if fragment.__class__ is str:
+            if len(fragment) > chunk_size:
+                # Encode large fragments in slices to avoid a full encoded copy
+                for start in range(0, len(fragment), chunk_size):
+                    piece = fragment[start:start + chunk_size].encode(encoding)
+                    pending.append(piece)
+                    pending_size += len(piece)
+                    if pending_size >= chunk_size:
+                        pending, pending_size = _write_full_chunks(stream, pending, chunk_size)
+                continue
+            fragment = fragment.encode(encoding)
+        pending.append(fragment)
+        pending_size += len(fragment)
+        if pending_size >= chunk_size:
+            pending, pending_size = _write_full_chunks(stream, pending, chunk_size)
+    if pending:
+        stream.write(b"".join(pending))
+
+
+def _write_full_chunks(stream, pending, chunk_size):
+    """Writes the complete chunk_size pieces of pending bytes and returns the rest."""
+    data = b"".join(pending)
+    end = len(data) - len(data) % chunk_size
+    for start in range(0, end, chunk_size):
+        stream.write(data[start:start + chunk_size])
+    rest = data[end:]
+    return ([rest], len(rest)) if rest else ([], 0)
+
+
+class StyleCompiler:
+    """
+    Compiles Haba style strings to shared CSS classes.
+
+    Every distinct CSS rule gets one class, named after a hash of the rule,
+    so containers with identical styles share a single stylesheet entry and
+    the same rule has the same class in every document. Compiled styles are
+    memoized, so a repeated style string costs one dict lookup.
+    """
+
+    def __init__(self, convert, max_entries: int = DEFAULT_STYLE_CACHE_SIZE):
+        """
+        Args:
+            convert: Function converting a Haba style string to CSS declarations
+            max_entries: Number of compiled styles kept before the memo is reset
+        """
+        self.convert = convert
+        self.max_entries = max_entries
+        self._compiled = {}  # style string -> (class_name, css), or None for empty styles
+
+    def compile(self, style_str: str):
+        """
+        Returns the (class_name, css) pair for a Haba style string, or None if
+        the style has no CSS declarations.
+        """
+        try:
+            return self._compiled[style_str]
+        except KeyError:
+            pass
+        css = self.convert(style_str)
+        compiled = (self.class_name(css), css) if css else None
+        if len(self._compiled) >= self.max_entries:
+            self._compiled.clear()
+        self._compiled[style_str] = compiled
+        return compiled
+
+    def class_name(self, css: str) -> str:
+        """Returns the shared class name for a CSS rule."""
+        return STYLE_CLASS_PREFIX + hashlib.blake2b(css.encode('utf-8'), digest_size=6).hexdigest()
+
+    def rules(self, haba_data: HabaData) -> list:
+        """
+        Returns the distinct (class_name, css) rules used by a document, in
+        order of first use.
+        """
+        rules = {}
+        for _, style in haba_data.presentation_items:
+            compiled = self.compile(style)
+            if compiled is not None:
+                rules.setdefault(compiled[0], compiled[1])
+        return list(rules.items())
+
 
 class HtmlExporter:
     """
     Exports HabaData to HTML format with proper styling and structure.
+
+    Each container gets a haba-container-<index> class, plus the shared
+    haba-style-<hash> class of its style.
     """
     
-    def __init__(self):
-        pass
+    def __init__(self, minify: bool = False, template=None):
+        """
+        Args:
+            minify: Whether to leave out indentation and optional whitespace
+                in the HTML, CSS and script. The content is never changed.
+            template: A custom page template, as an ExportTemplate or as
+                template text (compiled once here). Defaults to the built-in
+                page, or its minified form.
+        """
+        self.minify = minify
+        if template is None:
+            template = export_template.MINIFIED if minify else export_template.DEFAULT
+        elif isinstance(template, str):
+            template = export_template.compile_template(template)
+        self.template = template
+        self.style_compiler = StyleCompiler(self._convert_haba_style_to_css)
+        self._tags = {}  # (index, container, style) -> memoized (opening, closing) tags
     
-    def export_to_html(self, haba_data: HabaData, title: str = "Haba Output") -> str:
+    def export_to_html(self, haba_data: HabaData, title: str = "Haba Output", stylesheet_href: str = None) -> str:
         """
         Converts HabaData to a complete HTML document.
         
         Args:
             haba_data: The parsed Haba data
             title: The title for the HTML document
+            stylesheet_href: URL of a shared stylesheet to link instead of
+                inlining the styles (see shared_stylesheet)
             
         Returns:
             Complete HTML document as string
         """
-        html_parts = []
-        
-        # HTML document structure
-        html_parts.append("<!DOCTYPE html>")
-        html_parts.append('<html lang="en">')
-        html_parts.append("<head>")
-        html_parts.append('    <meta charset="UTF-8">')
-        html_parts.append('    <meta name="viewport" content="width=device-width, initial-scale=1.0">')
-        html_parts.append(f"    <title>{title}</title>")
-        
-        # Add styles
-        html_parts.append("    <style>")
-        html_parts.append("        /* Haba Generated Styles */")
-        
-        # Generate CSS classes for each container
-        for i, (container, style) in enumerate(haba_data.presentation_items):
-            class_name = f"haba-container-{i}"
-            css_style = self._convert_haba_style_to_css(style)
-            if css_style:
-                html_parts.append(f"        .{class_name} {{ {css_style} }}")
-        
-        # Add default styling
-        html_parts.append("        body { font-family: Arial, sans-serif; margin: 20px; }")
-        html_parts.append("        .haba-content { max-width: 800px; margin: 0 auto; }")
-        html_parts.append("    </style>")
-        html_parts.append("</head>")
-        html_parts.append("<body>")
-        
-        # Add content wrapped in containers
-        content_html = self._wrap_content_in_containers(haba_data)
-        html_parts.append(f'    <div class="haba-content">')
-        html_parts.append(f"        {content_html}")
-        html_parts.append("    </div>")
-        
-        # Add script if present
-        if haba_data.script and haba_data.script.strip():
-            html_parts.append("    <script>")
-            html_parts.append(f"        {haba_data.script}")
-            html_parts.append("    </script>")
-        
-        html_parts.append("</body>")
-        html_parts.append("</html>")
-        
-        return "\n".join(html_parts)
+        return "".join(self.iter_html(haba_data, title, stylesheet_href=stylesheet_href))
+
+    def iter_html(self, haba_data: HabaData, title: str = "Haba Output", encoding: str = None,
+                  stylesheet_href: str = None):
+        """
+        Yields the HTML document for HabaData as a sequence of fragments.
+
+        The content and script are yielded as-is rather than copied into
+        larger strings, so the document can be written out without building it.
+
+        Args:
+            haba_data: The parsed Haba data
+            title: The title for the HTML document
+            encoding: If given, the template's static fragments are yielded
+                as pre-encoded bytes
+            stylesheet_href: URL of a shared stylesheet to link instead of
+                inlining the styles
+
+        Yields:
+            HTML fragments
+        """
+        return self.template.iter_render(self._template_values(haba_data, title, stylesheet_href), encoding)
+
+    def _template_values(self, haba_data: HabaData, title: str, stylesheet_href: str = None) -> dict:
+        """Returns the template slot values for a document."""
+        script = haba_data.script if haba_data.script and haba_data.script.strip() else ""
+        if script and self.minify:
+            script = minify_script(script)
+        return {
+            'title': title,
+            'css': lambda: self._iter_css(haba_data),
+            'content': lambda: self._iter_wrapped_content(haba_data),
+            'script': script,
+            'stylesheet': stylesheet_href,
+        }
+
+    def shared_stylesheet(self, rules) -> str:
+        """
+        Builds a stylesheet shared by many pages.
+
+        Args:
+            rules: (class_name, css) pairs, e.g. from style_compiler.rules()
+                for every document; duplicates are written once
+
+        Returns:
+            The CSS text: the default page styles followed by the rules,
+            ordered by class name so the same rules give the same file
+        """
+        rules = dict(rules)
+        if self.minify:
+            parts = ["body{font-family:Arial,sans-serif;margin:20px}.haba-content{max-width:800px;margin:0 auto}"]
+            parts.extend(f".{class_name}{{{minify_css(rules[class_name])}}}" for class_name in sorted(rules))
+            return "".join(parts)
+        parts = [
+            "/* Haba Generated Styles */\n",
+            "body { font-family: Arial, sans-serif; margin: 20px; }\n",
+            ".haba-content { max-width: 800px; margin: 0 auto; }\n",
+        ]
+        parts.extend(f".{class_name} {{ {rules[class_name]} }}\n" for class_name in sorted(rules))
+        return "".join(parts)
+
+    def _iter_css(self, haba_data: HabaData):
+        """Yields one CSS rule per distinct style of a document."""
+        if self.minify:
+            for class_name, css_style in self.style_compiler.rules(haba_data):
+                yield f".{class_name}{{{minify_css(css_style)}}}"
+        else:
+            for class_name, css_style in self.style_compiler.rules(haba_data):
+                yield f"        .{class_name} {{ {css_style} }}\n"
+
+    def export_to_stream(self, haba_data: HabaData, stream, title: str = "Haba Output",
+                         encoding: str = 'utf-8', chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         stylesheet_href: str = None):
+        """
+        Writes the HTML document for HabaData to an open file object.
+
+        Small fragments are coalesced and large ones split, so every write is
+        at most chunk_size characters (bytes for a binary stream) and no full
+        copy of the document is made. For a socket, pass sock.makefile('wb').
+
+        Args:
+            haba_data: The parsed Haba data
+            stream: A text or binary file object
+            title: Title for the HTML document
+            encoding: Encoding used when stream is binary
+            chunk_size: Maximum size of a write
+            stylesheet_href: URL of a shared stylesheet to link instead of
+                inlining the styles
+        """
+        if isinstance(stream, io.TextIOBase):
+            fragments = self.iter_html(haba_data, title, stylesheet_href=stylesheet_href)
+            for chunk in _iter_chunks(fragments, chunk_size):
+                stream.write(chunk)
+        else:
+            fragments = self.iter_html(haba_data, title, encoding, stylesheet_href)
+            _write_encoded(stream, fragments, chunk_size, encoding)
+        stream.flush()
     
     def _convert_haba_style_to_css(self, style_str: str) -> str:
         """
@@ -95,7 +404,7 @@ class HtmlExporter:
         
         # Parse style properties
         # Handle both 'key: value' and "key: 'value'" formats
-        pairs = re.findall(r"([\w-]+)\s*:\s*['\"]?([^,'\"]*)['\"]?", style_str)
+        pairs = _STYLE_PAIR_PATTERN.findall(style_str)
         
         for key, value in pairs:
             key = key.strip()
@@ -117,37 +426,77 @@ class HtmlExporter:
         Returns:
             HTML content wrapped in containers
         """
-        content = haba_data.content
-        
-        # Start from the innermost container and work outward
-        for i in reversed(range(len(haba_data.presentation_items))):
-            container, _ = haba_data.presentation_items[i]
-            class_name = f"haba-container-{i}"
-            
-            # Parse container tag and add class
-            container = container.strip()
-            if container.startswith('<') and '>' in container:
-                # Find the tag name and add class attribute
-                tag_end = container.find('>')
-                if ' ' in container[:tag_end]:
-                    # Tag already has attributes
-                    container = container[:tag_end] + f' class="{class_name}"' + container[tag_end:]
-                else:
-                    # Simple tag, add class
-                    container = container[:tag_end] + f' class="{class_name}"' + container[tag_end:]
-                
-                # Extract tag name for closing tag
-                tag_name = container[1:container.find(' ') if ' ' in container else container.find('>')]
-                closing_tag = f"</{tag_name}>"
-                
-                content = f"{container}\n{content}\n{closing_tag}"
-            else:
-                # Fallback: wrap in div if container format is unclear
-                content = f'<div class="{class_name}">\n{content}\n</div>'
-        
-        return content
+        return "".join(self._iter_wrapped_content(haba_data))
+
+    def _iter_wrapped_content(self, haba_data: HabaData):
+        """
+        Yields the content wrapped in its containers as a stream of fragments.
+
+        The first container is the outermost one. The opening tags are yielded
+        first, then the content, then the closing tags in reverse order, so
+        the content is never copied.
+
+        Args:
+            haba_data: The parsed Haba data
+
+        Yields:
+            HTML fragments
+        """
+        tags = self._tags
+        closing_tags = []
+        for i, (container, style) in enumerate(haba_data.presentation_items):
+            key = (i, container, style)
+            try:
+                opening_tag, closing_tag = tags[key]
+            except KeyError:
+                compiled = self.style_compiler.compile(style)
+                opening_tag, closing_tag = self._container_tags(i, container, compiled[0] if compiled else None)
+                opening_tag += "\n"
+                closing_tag = "\n" + closing_tag
+                if len(tags) >= DEFAULT_STYLE_CACHE_SIZE:
+                    tags.clear()
+                tags[key] = (opening_tag, closing_tag)
+            yield opening_tag
+            closing_tags.append(closing_tag)
+
+        yield haba_data.content
+
+        if closing_tags:
+            closing_tags.reverse()
+            yield "".join(closing_tags)
+
+    def _container_tags(self, index: int, container: str, style_class: str = None):
+        """
+        Builds the opening and closing tags for a container.
+
+        Args:
+            index: The position of the container in the presentation items
+            container: The container text, e.g. "<div>" or "<p id='intro'>"
+            style_class: The shared class of the container's style, if any
+
+        Returns:
+            A tuple (opening_tag, closing_tag)
+        """
+        class_name = f"haba-container-{index}"
+        if style_class:
+            class_name = f"{class_name} {style_class}"
+
+        # Parse container tag and add class
+        container = container.strip()
+        if container.startswith('<') and '>' in container:
+            # Add the class attribute before the end of the opening tag
+            tag_end = container.find('>')
+            container = container[:tag_end] + f' class="{class_name}"' + container[tag_end:]
+
+            # Extract tag name for closing tag
+            tag_name = container[1:container.find(' ') if ' ' in container else container.find('>')]
+            return container, f"</{tag_name}>"
+
+        # Fallback: wrap in div if container format is unclear
+        return f'<div class="{class_name}">', "</div>"
     
-    def export_to_file(self, haba_data: HabaData, output_path: str, title: str = "Haba Output"):
+    def export_to_file(self, haba_data: HabaData, output_path: str, title: str = "Haba Output",
+                       precompress=(), stylesheet_href: str = None):
         """
         Exports HabaData to an HTML file.
         
@@ -155,8 +504,19 @@ class HtmlExporter:
             haba_data: The parsed Haba data
             output_path: Path to save the HTML file
             title: Title for the HTML document
+            precompress: Compression formats ('gzip', 'zstd') of sibling files
+                such as output_path + '.gz', compressed while the HTML is written
+            stylesheet_href: URL of a shared stylesheet to link instead of
+                inlining the styles
+
+        Returns:
+            A dict mapping each written path to its size in bytes
         """
-        html_content = self.export_to_html(haba_data, title)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        if precompress:
+            with CompressedOutput(output_path, precompress) as out:
+                self.export_to_stream(haba_data, out, title, stylesheet_href=stylesheet_href)
+            return out.sizes
+
+        with atomic_write(output_path, 'w', encoding='utf-8') as f:
+            self.export_to_stream(haba_data, f, title, stylesheet_href=stylesheet_href)
+        return {output_path: os.path.getsize(output_path)}
@@ -0,0 +1,198 @@
+"""
+Incremental parsing for .haba documents.
+
+Keeps the layer boundaries found by the last parse and, for each edit,
+re-parses only the layer the edit falls into. Edits that create, remove or
+touch a layer tag fall back to a full single-pass parse.
+"""
+
+try:
+    from .haba_parser import HabaParser, HabaData, LayerSpans, _TAG_PATTERN, _strip_span, _span_lines
+except ImportError:
+    from haba_parser import HabaParser, HabaData, LayerSpans, _TAG_PATTERN, _strip_span, _span_lines
+
+# Length of the longest layer tag, used to bound the tag search around an edit
+_MAX_TAG_LENGTH = len('</presentation_layer>')
+
+# Block size used when locating the changed region between two buffers
+_DIFF_BLOCK_SIZE = 4096
+
+
+def find_edit(old_text: str, new_text: str):
+    """
+    Finds a single edit that turns old_text into new_text.
+
+    Returns:
+        A tuple (offset, removed_length, inserted_text), or None if the texts are equal.
+    """
+    if old_text == new_text:
+        return None
+
+    limit = min(len(old_text), len(new_text))
+
+    # Common prefix, compared block by block and then character by character
+    prefix = 0
+    while prefix + _DIFF_BLOCK_SIZE <= limit and \
+            old_text[prefix:prefix + _DIFF_BLOCK_SIZE] == new_text[prefix:prefix + _DIFF_BLOCK_SIZE]:
+        prefix += _DIFF_BLOCK_SIZE
+    while prefix < limit and old_text[prefix] == new_text[prefix]:
+        prefix += 1
+
+    # Common suffix, not overlapping the prefix
+    limit -= prefix
+    old_end, new_end = len(old_text), len(new_text)
+    suffix = 0
+    while suffix + _DIFF_BLOCK_SIZE <= limit and \
+            old_text[old_end - suffix - _DIFF_BLOCK_SIZE:old_end - suffix] == \
+            new_text[new_end - suffix - _DIFF_BLOCK_SIZE:new_end - suffix]:
+        suffix += _DIFF_BLOCK_SIZE
+    while suffix < limit and old_text[old_end - suffix - 1] == new_text[new_end - suffix - 1]:
+        suffix += 1
+
+    return prefix, old_end - suffix - prefix, new_text[prefix:new_end - suffix]
+
+
+def _touches_tag(text, start, end):
+    """Returns True if a layer tag overlaps text[start:end] (or straddles start when empty)."""
+    window_start = max(0, start - _MAX_TAG_LENGTH)
+    window_end = min(len(text), end + _MAX_TAG_LENGTH)
+    for match in _TAG_PATTERN.finditer(text, window_start, window_end):
+        if match.start() < end and match.end() > start:
+            return True
+        if start == end and match.start() < start < match.end():
+            return True
+    return False
+
+
+class IncrementalHabaParser:
+    """
+    Re-parses a .haba document incrementally as it is edited.
+
+    Call parse() once with the full text, then apply_edit() for every change
+    (or update() with the new full text when the edit range isn't known).
+    Each call returns a fresh HabaData equal to HabaParser().parse(text).
+    """
+
+    def __init__(self, parser: HabaParser = None):
+        self.parser = parser or HabaParser()
+        self.text = ""
+        self.spans = {}
+        self.full_parses = 0
+        self.partial_parses = 0
+        self._content = ""
+        self._script = ""
+        self._containers = []
+        self._styles = []
+        self._presentation_items = []
+
+    def parse(self, raw_text: str) -> HabaData:
+        """
+        Fully parses raw_text and remembers its layer boundaries.
+        """
+        self.text = raw_text
+        self.spans = self.parser.scan(raw_text)
+        self.full_parses += 1
+
+        self._content = self._extract_text('content_layer')
+        self._script = self._extract_text('script_layer')
+        self._containers = self._extract_lines('containers')
+        self._styles = self._extract_lines('styles')
+        self._pair_presentation_items()
+        return self._snapshot()
+
+    def apply_edit(self, offset: int, removed_length: int, inserted_text: str) -> HabaData:
+        """
+        Applies an edit to the last parsed text and re-parses only the affected layer.
+
+        Args:
+            offset: Character offset at which the edit starts
+            removed_length: Number of characters removed at offset
+            inserted_text: Text inserted at offset
+
+        Returns:
+            The HabaData for the edited document
+        """
+        old_text = self.text
+        end = offset + removed_length
+        if offset < 0 or end > len(old_text):
+            raise ValueError(f"Edit range {offset}:{end} is outside the document (length {len(old_text)})")
+
+        new_text = old_text[:offset] + inserted_text + old_text[end:]
+        if (_touches_tag(old_text, offset, end)
+                or _touches_tag(new_text, offset, offset + len(inserted_text))):
+            return self.parse(new_text)
+
+        # An edit that doesn't touch a tag lies either wholly inside a layer
+        # or wholly outside every layer, since layer spans end at their tags.
+        # Layers may overlap in malformed documents, so refresh every layer
+        # containing the edit.
+        layers = self._enclosing_layers(offset, end)
+        self.text = new_text
+        self._shift_spans(offset, end, len(inserted_text) - removed_length)
+        self.partial_parses += 1
+
+        if 'content_layer' in layers:
+            self._content = self._extract_text('content_layer')
+        if 'script_layer' in layers:
+            self._script = self._extract_text('script_layer')
+        if 'containers' in layers:
+            self._containers = self._extract_lines('containers')
+        if 'styles' in layers:
+            self._styles = self._extract_lines('styles')
+        if 'containers' in layers or 'styles' in layers:
+            self._pair_presentation_items()
+        # Edits elsewhere (between layers, or around the containers and
+        # styles sections) only move the layer boundaries.
+
+        return self._snapshot()
+
+    def update(self, raw_text: str) -> HabaData:
+        """
+        Brings the parser up to date with raw_text, the new full document text.
+
+        The edit is located by comparing against the last parsed text, so only
+        the layer that changed is re-parsed.
+        """
+        if not self.full_parses:
+            return self.parse(raw_text)
+        edit = find_edit(self.text, raw_text)
+        if edit is None:
+            return self._snapshot()
+        return self.apply_edit(*edit)
+
+    def _enclosing_layers(self, start, end):
+        """Returns the names of the layers whose spans contain [start, end]."""
+        return [name for name, (span_start, span_end) in self.spans.items()
+                if span_start <= start and end <= span_end]
+
+    def _shift_spans(self, start, end, delta):
+        """Moves the layer boundaries that follow an edit of [start, end]."""
+        for name, (span_start, span_end) in self.spans.items():
+            if span_start <= start and end <= span_end:
+                self.spans[name] = (span_start, span_end + delta)
+            elif span_start >= end:
+                self.spans[name] = (span_start + delta, span_end + delta)
+
+    def _extract_text(self, name):
+        span = self.spans.get(name)
+        return _strip_span(self.text, *span) if span else ""
+
+    def _extract_lines(self, name):
+        if 'presentation_layer' not in self.spans:
+            return []
+        return _span_lines(self.text, self.spans.get(name))
+
+    def _pair_presentation_items(self):
+        styles = self._styles
+        self._presentation_items = [
+            (container, styles[i] if i < len(styles) else "")
+            for i, container in enumerate(self._containers)
+        ]
+
+    def _snapshot(self):
+        data = HabaData()
+        data.content = self._content
+        data.presentation_items = list(self._presentation_items)
+        data.script = self._script
+        data.source_spans = LayerSpans(self.spans)
+        return data
@@ -0,0 +1,70 @@
+"""
+Deferred imports of heavy optional dependencies.
+
+Selenium, requests, keyring and quanta_tissu take far longer to import
+than the modules that use them, and are only needed once a script is run
+or a model is called. lazy_import returns a stand-in that imports its
+module on first use, so importing cli_runner or opening the editor does
+not pay for them.
+
+Usage:
+    webdriver = lazy_import('selenium.webdriver')
+    OAuth2Session = lazy_import('requests_oauthlib', 'OAuth2Session')
+
+The stand-in forwards attribute access and calls. It cannot be used where
+a real class is required, such as an except clause or isinstance; access
+such classes through a lazily imported module instead. A missing module,
+or a missing attribute of one, raises ImportError at first use rather than
+at import time.
+"""
+
+import importlib
+import importlib.util
+
+
+def is_available(module_name: str) -> bool:
+    """Returns whether a top-level module is installed, without importing it."""
+    return importlib.util.find_spec(module_name) is not None
+
+
+class LazyImport:
+    """A module, or an attribute of one, imported on first use."""
+
+    def __init__(self, module_name: str, attribute: str = None):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            # import_module holds the import lock, so concurrent first uses
+            # all get the same module
+            target = importlib.import_module(self._module_name)
+            if self._attribute is not None:
+                try:
+                    target = getattr(target, self._attribute)
+                except AttributeError:
+                    # As from module import name would
+                    raise ImportError(f"cannot import name '{self._attribute}' from '{self._module_name}'",
+                                      name=self._module_name) from None
+            self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        # Lets mock's autospec see the real attributes
+        return dir(self._load())
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        name = self._module_name if self._attribute is None else f"{self._module_name}.{self._attribute}"
+        return f"<lazy import of {name}>"
+
+
+def lazy_import(module_name: str, attribute: str = None) -> LazyImport:
+    """Returns a stand-in for a module, or for one of its attributes, imported on first use."""
+    return LazyImport(module_name, attribute)
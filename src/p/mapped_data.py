@@ -0,0 +1,135 @@
+"""
+Memory-mapped, lazily decoded HabaData.
+
+A MappedHabaData keeps only the (start, end) byte offsets of each layer in a
+memory-mapped .haba file. A layer is decoded into a Python string the first
+time it is accessed, so opening many documents costs little more than the
+layer table until their content is actually needed.
+"""
+
+import mmap
+import os
+
+try:
+    from .haba_parser import HabaParser, HabaData, LineIndex, PRESENTATION_TAG, _span_lines
+except ImportError:
+    from haba_parser import HabaParser, HabaData, LineIndex, PRESENTATION_TAG, _span_lines
+
+
+class MappedHabaData(HabaData):
+    """
+    A HabaData whose layers are views into a mapped buffer.
+
+    content, presentation_items and script behave like the plain HabaData
+    attributes: they are decoded on first access and can be reassigned.
+    """
+
+    def __init__(self, buffer, spans: dict, encoding: str = 'utf-8'):
+        """
+        Args:
+            buffer: A bytes-like object (usually an mmap) holding the document
+            spans: Layer byte spans, as returned by HabaParser.scan(buffer)
+            encoding: An ASCII-compatible encoding used to decode the layers
+        """
+        # HabaData.__init__ is not called: its attributes are properties here.
+        self.buffer = buffer
+        self.spans = spans
+        # Byte offsets; line numbers are the same as in the decoded text
+        self.source_spans = spans
+        self._line_index = None
+        self.encoding = encoding
+        self._decoded = {}
+
+    @property
+    def line_index(self):
+        # Built on first use, so loading a document does not read the whole mapping
+        if self._line_index is None:
+            self._line_index = LineIndex(self.buffer)
+        return self._line_index
+
+    def _decode_span(self, name):
+        span = self.spans.get(name)
+        if span is None:
+            return ""
+        start, end = span
+        # Decode straight from the mapping, without an intermediate bytes copy
+        with memoryview(self.buffer)[start:end] as view:
+            return str(view, self.encoding)
+
+    def _layer_text(self, name):
+        if name not in self._decoded:
+            self._decoded[name] = self._decode_span(name).strip()
+        return self._decoded[name]
+
+    @property
+    def content(self):
+        return self._layer_text('content_layer')
+
+    @content.setter
+    def content(self, value):
+        self._decoded['content_layer'] = value
+
+    @property
+    def script(self):
+        return self._layer_text('script_layer')
+
+    @script.setter
+    def script(self, value):
+        self._decoded['script_layer'] = value
+
+    @property
+    def presentation_items(self):
+        if PRESENTATION_TAG not in self._decoded:
+            items = []
+            if PRESENTATION_TAG in self.spans:
+                containers = self._section_lines('containers')
+                styles = self._section_lines('styles')
+                for i, container in enumerate(containers):
+                    items.append((container, styles[i] if i < len(styles) else ""))
+            self._decoded[PRESENTATION_TAG] = items
+        return self._decoded[PRESENTATION_TAG]
+
+    @presentation_items.setter
+    def presentation_items(self, value):
+        self._decoded[PRESENTATION_TAG] = value
+
+    def _section_lines(self, name):
+        text = self._decode_span(name)
+        return _span_lines(text, (0, len(text)))
+
+    def is_decoded(self, name: str) -> bool:
+        """Returns True if the named layer has already been decoded (or assigned)."""
+        return name in self._decoded
+
+    def close(self):
+        """Releases the mapping. Layers decoded before closing stay available."""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_mapped(filepath: str, encoding: str = 'utf-8', parser: HabaParser = None) -> MappedHabaData:
+    """
+    Memory-maps a .haba file and finds its layer boundaries without decoding them.
+
+    Args:
+        filepath: Path to the .haba file
+        encoding: An ASCII-compatible encoding of the file
+        parser: The HabaParser used to scan the layers
+
+    Returns:
+        A MappedHabaData; close it (or use it as a context manager) when done
+    """
+    parser = parser or HabaParser()
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            return MappedHabaData(b"", {}, encoding)
+        # The mapping stays valid after the file is closed
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return MappedHabaData(buffer, parser.scan(buffer), encoding)
@@ -6,8 +6,6 @@ authenticating with external language model providers.
 """
 
 import webbrowser
-import requests
-from requests_oauthlib import OAuth2Session
 import os
 import threading
 import json
@@ -16,10 +14,19 @@ import hashlib
 import secrets
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import keyring
 import time
 from datetime import datetime, timedelta
 
+try:
+    from .lazy_import import lazy_import
+except ImportError:
+    from lazy_import import lazy_import
+
+# Imported on first use, so opening the editor does not wait for them
+requests = lazy_import('requests')
+OAuth2Session = lazy_import('requests_oauthlib', 'OAuth2Session')
+keyring = lazy_import('keyring')
+
 
 class OAuth2CallbackHandler(BaseHTTPRequestHandler):
     """HTTP request handler for OAuth 2.0 callback"""
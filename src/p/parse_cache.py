@@ -0,0 +1,143 @@
+"""
+Content-hash keyed cache of parsed .haba documents.
+
+The editor's export and run commands, the exporter and the script runner
+often parse the same unchanged buffer several times in a row.
+CachingHabaParser looks each document up by a hash of its raw text, so
+parsing an unchanged document costs one hash.
+
+The editor's live preview does not use the cache: IncrementalHabaParser
+re-parses only the edited layer, which costs less than hashing the whole
+text on every keystroke.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    from .haba_parser import HabaParser, HabaData, LayerSpans
+except ImportError:
+    from haba_parser import HabaParser, HabaData, LayerSpans
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def text_digest(raw_text: str) -> bytes:
+    """Returns the cache key for a raw .haba text."""
+    return hashlib.blake2b(raw_text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def _estimate_size(haba_data: HabaData) -> int:
+    """Approximate number of bytes retained by a parsed document, source information included."""
+    size = sys.getsizeof(haba_data.content) + sys.getsizeof(haba_data.script)
+    for container, style in haba_data.presentation_items:
+        size += sys.getsizeof(container) + sys.getsizeof(style)
+    # LayerSpans and LineIndex count their arrays in sys.getsizeof
+    size += sys.getsizeof(haba_data.source_spans)
+    if haba_data.line_index is not None:
+        size += sys.getsizeof(haba_data.line_index)
+    return size
+
+
+def _copy_data(haba_data: HabaData) -> HabaData:
+    """Returns a HabaData that callers can modify without affecting the cache."""
+    data = HabaData()
+    data.content = haba_data.content
+    data.presentation_items = list(haba_data.presentation_items)
+    data.script = haba_data.script
+    # Parsed spans (LayerSpans) and a LineIndex are read-only, so they are
+    # shared; spans set as a plain dict are copied
+    spans = haba_data.source_spans
+    data.source_spans = spans if isinstance(spans, LayerSpans) else dict(spans)
+    data.line_index = haba_data.line_index
+    return data
+
+
+class ParseCache:
+    """
+    A thread-safe LRU cache of parsed documents with entry-count and byte budgets.
+
+    Entries are evicted least recently used first when either max_entries or
+    max_bytes (an estimate of the memory held by cached documents) is exceeded.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (HabaData, size)
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes):
+        """Returns a copy of the cached HabaData for key, or None, and records a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy_data(entry[0])
+
+    def put(self, key: bytes, haba_data: HabaData):
+        """Stores a copy of haba_data under key, evicting old entries as needed."""
+        size = _estimate_size(haba_data)
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (_copy_data(haba_data), size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Removes all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters and current usage."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachingHabaParser(HabaParser):
+    """
+    A HabaParser whose parse() results are cached by a hash of the raw text.
+
+    parse() returns a fresh HabaData on every call, so callers may modify it.
+    Several parsers can share one ParseCache.
+    """
+
+    def __init__(self, cache: ParseCache = None):
+        self.cache = cache if cache is not None else ParseCache()
+
+    def parse(self, raw_text: str) -> HabaData:
+        key = text_digest(raw_text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        haba_data = super().parse(raw_text)
+        self.cache.put(key, haba_data)
+        return haba_data
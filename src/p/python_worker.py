@@ -0,0 +1,303 @@
+"""
+Warm Python worker processes for run_python_script.
+
+Starting an interpreter and importing the modules a script needs often
+takes longer than the script itself. A PythonWorker is a long-lived
+interpreter that runs one script after another, and PythonWorkerPool keeps
+workers in a SessionPool, so repeated runs skip the startup and any
+imports already made by earlier runs.
+
+Each run gets a fresh __main__ namespace, an empty stdin, and the working
+directory and sys.path it started with; given the script's file name, it
+also gets __file__ and sys.path[0] as python script.py would. Modules a script imports stay
+loaded, and so does state a script leaves in them; pass max_runs=1 for a
+fresh interpreter per run.
+
+Where the resource module is available (Unix), a pool can limit the CPU
+time of each run and the memory of each worker. A run over its CPU time
+raises CpuTimeExceeded inside the script; a run over the memory limit gets
+a MemoryError.
+
+Workers talk to the pool in JSON lines over private copies of their stdin
+and stdout; the script's own stdin and stdout go to /dev/null below the
+Python level, so nothing a script writes can corrupt the protocol.
+
+This is a library API: the editor and command line runner do not run
+Python scripts, so nothing in the application creates a pool. Pass one to
+run_python_script as worker_pool.
+"""
+
+import builtins
+import io
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Resource limits are not available on this platform
+
+try:
+    from .session_pool import SessionPool, DEFAULT_POOL_SIZE, DEFAULT_MAX_RUNS
+except ImportError:
+    from session_pool import SessionPool, DEFAULT_POOL_SIZE, DEFAULT_MAX_RUNS
+
+
+class PythonWorker:
+    """A long-lived interpreter running scripts sent to it one at a time."""
+
+    def __init__(self, executable: str = 'python', cpu_seconds: float = None, memory_bytes: int = None):
+        """
+        Args:
+            executable: The Python interpreter to start
+            cpu_seconds: CPU time limit of each run, if any
+            memory_bytes: Address space limit of the worker process, if any
+        """
+        self.cpu_seconds = cpu_seconds
+        args = [executable, '-u', os.path.abspath(__file__)]
+        if memory_bytes is not None:
+            args += ['--memory', str(int(memory_bytes))]
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, encoding='utf-8')
+        self._messages = queue.Queue()
+        self._busy = False  # Whether a script is running
+        self._exited = False  # Whether the worker's output has ended
+        threading.Thread(target=self._read_messages, daemon=True).start()
+
+    def _read_messages(self):
+        with self.process.stdout:
+            for line in self.process.stdout:
+                self._messages.put(json.loads(line))
+        self._messages.put(None)
+
+    def is_alive(self) -> bool:
+        return not self._exited and self.process.poll() is None
+
+    def run(self, script: str, on_line, timeout: float, filename: str = None):
+        """
+        Runs a script, passing each output line to on_line(is_stderr, line)
+        as it is printed.
+
+        If filename, the path of a file holding the script, is given, the
+        script sees it as __file__ and its directory as sys.path[0], as with
+        python script.py, and tracebacks show its lines.
+
+        Raises:
+            subprocess.TimeoutExpired: If the script ran longer than timeout
+                                       seconds. The worker is left running
+                                       the script; quit it.
+            RuntimeError: If the worker exited, for example because the
+                          script called os._exit.
+        """
+        request = {'script': script, 'filename': filename, 'cpu_seconds': self.cpu_seconds}
+        if not self.is_alive():
+            raise RuntimeError("Python worker has exited")
+        try:
+            self.process.stdin.write(json.dumps(request) + '\n')
+            self.process.stdin.flush()
+        except OSError:
+            raise RuntimeError("Python worker has exited")
+        self._busy = True
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.process.args, timeout)
+            try:
+                message = self._messages.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if message is None:
+                self._busy = False
+                self._exited = True
+                raise RuntimeError("Python worker exited during the run")
+            if 'done' in message:
+                self._busy = False
+                return
+            if 'out' in message:
+                on_line(False, message['out'])
+            else:
+                on_line(True, message['err'])
+
+    def quit(self):
+        """Stops the worker, killing it if it is still running a script."""
+        if self._busy:
+            self.process.kill()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class PythonWorkerPool(SessionPool):
+    """
+    A thread-safe pool of warm Python workers.
+
+    Usage:
+        with PythonWorkerPool(cpu_seconds=5) as pool:
+            logs, tasks = run_python_script(script, worker_pool=pool)
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_runs: int = DEFAULT_MAX_RUNS,
+                 executable: str = 'python', cpu_seconds: float = None, memory_bytes: int = None):
+        """
+        Args:
+            size: Maximum number of workers running at once
+            max_runs: Runs after which a worker is replaced by a fresh one
+            executable: The Python interpreter to start
+            cpu_seconds: CPU time limit of each run, if any
+            memory_bytes: Address space limit of each worker, if any
+        """
+        super().__init__(lambda: PythonWorker(executable, cpu_seconds, memory_bytes), size, max_runs)
+
+    @staticmethod
+    def _is_healthy(worker) -> bool:
+        return worker.is_alive()
+
+    @staticmethod
+    def _reset(worker) -> bool:
+        return worker.is_alive()
+
+
+# Worker side
+
+_THIS_FILE = os.path.abspath(__file__)
+
+class CpuTimeExceeded(Exception):
+    """Raised inside a script that used up its CPU time limit."""
+
+
+class _LineWriter(io.TextIOBase):
+    """A text stream sending each complete line as a protocol message."""
+
+    def __init__(self, send, key):
+        self._send = send
+        self._key = key
+        self._pending = ''
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        lines = (self._pending + text).split('\n')
+        self._pending = lines.pop()
+        for line in lines:
+            self._send({self._key: line})
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        if self._pending:
+            self._send({self._key: self._pending})
+            self._pending = ''
+
+
+def _cpu_time_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _set_cpu_limit(seconds):
+    """Sets the soft CPU limit seconds from now, or removes it for None."""
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if seconds is None:
+        soft = hard
+    else:
+        soft = int(_cpu_time_used() + seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _run_request(request, send):
+    """Runs one script in a fresh namespace and sends its output."""
+    out = _LineWriter(send, 'out')
+    err = _LineWriter(send, 'err')
+    namespace = {'__name__': '__main__', '__builtins__': builtins}
+    filename = request.get('filename')
+    cwd = os.getcwd()
+    path = list(sys.path)
+    stdin = sys.stdin
+    cpu_seconds = request.get('cpu_seconds')
+    try:
+        sys.stdin = io.StringIO()
+        if filename is not None:
+            namespace['__file__'] = filename
+            sys.path[0] = os.path.dirname(os.path.abspath(filename))
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                if resource is not None and cpu_seconds is not None:
+                    _set_cpu_limit(cpu_seconds)
+                exec(compile(request['script'], filename or '<script>', 'exec'), namespace)
+            except SystemExit as e:
+                # As the interpreter does: a non-integer exit code is printed
+                if e.code is not None and not isinstance(e.code, int):
+                    print(e.code, file=sys.stderr)
+            except BaseException as e:
+                # Leave the worker's own frames out of the traceback
+                report = traceback.TracebackException.from_exception(e)
+                report.stack = traceback.StackSummary.from_list(
+                    [frame for frame in report.stack if frame.filename != _THIS_FILE])
+                print(''.join(report.format()), end='', file=sys.stderr)
+            finally:
+                if resource is not None and cpu_seconds is not None:
+                    _set_cpu_limit(None)
+    finally:
+        sys.stdin = stdin
+        sys.path[:] = path
+        try:
+            os.chdir(cwd)
+        except OSError:
+            pass
+        out.finish()
+        err.finish()
+
+
+def serve(argv=None):
+    """Worker entry point: runs scripts read from stdin until it is closed."""
+    argv = sys.argv[1:] if argv is None else argv
+    protocol_in = os.fdopen(os.dup(0), 'r', encoding='utf-8')
+    protocol_out = os.fdopen(os.dup(1), 'w', encoding='utf-8')
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    # Scripts import from the working directory, as with python -c, not
+    # from this module's directory
+    sys.path[0] = ''
+
+    if resource is not None:
+        if '--memory' in argv:
+            limit = int(argv[argv.index('--memory') + 1])
+            resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+        import signal
+
+        def cpu_time_exceeded(signum, frame):
+            _set_cpu_limit(None)
+            raise CpuTimeExceeded("CPU time limit exceeded")
+        signal.signal(signal.SIGXCPU, cpu_time_exceeded)
+
+    def send(message):
+        protocol_out.write(json.dumps(message) + '\n')
+        protocol_out.flush()
+
+    for line in protocol_in:
+        _run_request(json.loads(line), send)
+        send({'done': True})
+
+
+if __name__ == '__main__':
+    serve()
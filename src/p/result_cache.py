@@ -0,0 +1,138 @@
+"""
+On-disk cache of script run results.
+
+Running an unchanged script layer again usually gives the same logs and
+tasks. ResultCache stores each result as a small JSON file named after a
+hash of what was run (the generated harness page, or the Python script),
+so repeated runs, even from separate CLI invocations, return instantly.
+
+Only deterministic scripts should be cached, so the cache is opt-in. The
+directory is kept under max_bytes by evicting the least recently used
+results; a hit refreshes a result's modification time.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from .atomic_file import atomic_write
+except ImportError:
+    from atomic_file import atomic_write
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".quanta_haba", "script_results")
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+RESULT_SUFFIX = '.json'
+
+
+def result_key(kind: str, text: str) -> str:
+    """Returns the cache key for running text with the given kind of runner ('js' or 'python')."""
+    digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16, person=kind.encode('ascii'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    A thread-safe, size-bounded LRU cache of (logs, tasks) results on disk.
+
+    The directory is scanned on first use; results written by other
+    processes after that are found on lookup but only counted towards
+    max_bytes once this process sees them.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = None  # key -> size, least recently used first; None until scanned
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Returns the cached (logs, tasks) for key, or None, and records a hit or miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            logs, tasks = result['logs'], result['tasks']
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            entries = self._scan()
+            if key in entries:
+                entries.move_to_end(key)
+            self.hits += 1
+        return logs, tasks
+
+    def put(self, key: str, logs, tasks):
+        """
+        Stores a result under key, evicting old results as needed. Write
+        errors are ignored.
+        """
+        data = json.dumps({'logs': logs, 'tasks': tasks}, ensure_ascii=False).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            entries = self._scan()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with atomic_write(self._path(key), 'wb') as f:
+                    f.write(data)
+            except OSError:
+                return  # A result that cannot be cached is simply run again
+            self.current_bytes += len(data) - entries.pop(key, 0)
+            entries[key] = len(data)
+            while self.current_bytes > self.max_bytes:
+                old_key, size = entries.popitem(last=False)
+                try:
+                    os.remove(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+                self.current_bytes -= size
+                self.evictions += 1
+
+    def clear(self):
+        """Removes every cached result."""
+        with self._lock:
+            for key in list(self._scan()):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries = OrderedDict()
+            self.current_bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._scan())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + RESULT_SUFFIX)
+
+    def _scan(self) -> OrderedDict:
+        """Returns the entries, reading the directory the first time. Call with the lock held."""
+        if self._entries is None:
+            found = []
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.name.endswith(RESULT_SUFFIX) and entry.is_file():
+                            stat_result = entry.stat()
+                            found.append((stat_result.st_mtime_ns, entry.name[:-len(RESULT_SUFFIX)],
+                                          stat_result.st_size))
+            except FileNotFoundError:
+                pass
+            found.sort()
+            self._entries = OrderedDict((key, size) for _, key, size in found)
+            self.current_bytes = sum(size for _, _, size in found)
+        return self._entries
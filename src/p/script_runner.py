@@ -1,37 +1,150 @@
+import base64
 import os
+import queue
 import tempfile
+import threading
+import time
 import subprocess
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 try:
     from .haba_parser import HabaParser
+    from .browser_pool import BrowserPool, DEFAULT_POOL_SIZE, DEFAULT_MAX_RUNS
+    from .result_cache import result_key
+    from .lazy_import import lazy_import
 except ImportError:
     from haba_parser import HabaParser
+    from browser_pool import BrowserPool, DEFAULT_POOL_SIZE, DEFAULT_MAX_RUNS
+    from result_cache import result_key
+    from lazy_import import lazy_import
+
+# Selenium is imported when the first browser starts
+webdriver = lazy_import('selenium.webdriver')
+FirefoxOptions = lazy_import('selenium.webdriver.firefox.options', 'Options')
+
+DEFAULT_SCRIPT_TIMEOUT = 10
+# When streaming, a page is polled for new logs every LOG_POLL_INTERVAL
+# seconds until none have arrived for LOG_IDLE_TIME seconds
+LOG_POLL_INTERVAL = 0.05
+LOG_IDLE_TIME = 0.5
+_DRAIN_LOGS = "return window.console_logs.splice(0, window.console_logs.length);"
+# WebDriver's own page load timeout, restored for runs without a timeout
+_WEBDRIVER_PAGE_LOAD_TIMEOUT = 300
+
+
+class _LogStreamTimeout(Exception):
+    """Raised when a page is still logging at the deadline of a streamed run."""
+
+    def __init__(self, todos):
+        super().__init__("The script was still logging at the deadline")
+        self.todos = todos  # The tasks found in the logs streamed so far
+
+
+def page_url(html_content):
+    """
+    Returns a data: URL carrying an HTML page, so a browser can load the
+    page without it being written to disk.
+    """
+    encoded = base64.b64encode(html_content.encode('utf-8')).decode('ascii')
+    return f"data:text/html;charset=utf-8;base64,{encoded}"
+
 
 class ScriptRunner:
     """
     Handles the execution of JavaScript from a .haba file in a headless browser.
+
+    Browsers are started on first use and kept in a BrowserPool, so only the
+    first run pays for the browser startup. Call close() (or use the runner
+    as a context manager) to quit them; any left open are quit at exit.
     """
-    def __init__(self):
-        self.options = FirefoxOptions()
-        self.options.add_argument("--headless")
+    def __init__(self, parser=None, pool=None, pool_size=DEFAULT_POOL_SIZE, max_runs=DEFAULT_MAX_RUNS,
+                 in_memory=True, result_cache=None):
+        """
+        :param parser: The HabaParser used to extract the script layer. Pass a
+                       CachingHabaParser to share parses with the editor.
+        :param pool: A BrowserPool to share with other runners. By default
+                     the runner has its own pool of Firefox sessions.
+        :param pool_size: Maximum number of browsers in the runner's own pool.
+        :param max_runs: Runs after which a browser of the runner's own pool
+                         is replaced.
+        :param in_memory: Whether to send the page to the browser as a data:
+                          URL. Such pages have an opaque origin, so nothing
+                          a script stores survives into the next run, but
+                          storage APIs such as localStorage throw. Pass False
+                          to load the page from a temporary file instead.
+        :param result_cache: A ResultCache of the results of completed runs,
+                             keyed by the generated page. Only use one for
+                             deterministic scripts.
+        """
+        self.parser = parser or HabaParser()
+        self.pool = pool or BrowserPool(self._start_browser, size=pool_size, max_runs=max_runs)
+        self.in_memory = in_memory
+        self.result_cache = result_cache
+
+    def __enter__(self):
+        return self
 
-    def run_script(self, haba_content):
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _start_browser(self):
+        options = FirefoxOptions()
+        options.add_argument("--headless")
+        return webdriver.Firefox(options=options)
+
+    def close(self):
+        """Quits the browsers of the runner's pool."""
+        self.pool.close()
+
+    def run_script(self, haba_content, timeout=None, on_log=None):
         """
         Runs the script from a .haba file content in a headless Firefox browser
         and captures console logs.
 
         :param haba_content: The string content of the .haba file.
+        :param timeout: Seconds the page, and so the script, may take to run.
+                        A script running longer gives an error task, and its
+                        browser is replaced.
+        :param on_log: If given, each console log message is passed to it as
+                       it arrives instead of being returned. Logs are only
+                       read once the page has loaded, so the output of the
+                       script's synchronous code arrives all at once when
+                       it finishes; messages from timers and promises are
+                       then streamed until none arrive for LOG_IDLE_TIME
+                       seconds. A script still logging after timeout
+                       (DEFAULT_SCRIPT_TIMEOUT if None) gives an error task,
+                       and its browser is replaced. Streamed runs are not
+                       cached.
         :return: A list of console log messages.
         """
-        parser = HabaParser()
-        haba_data = parser.parse(haba_content)
+        haba_data = self.parser.parse(haba_content)
         
         if not haba_data.script.strip():
             return [], [] # No script to run
 
-        # Create a temporary HTML file to execute the script
-        html_content = f"""
+        html_content = self._build_page(haba_data)
+        cache_key = None
+        if self.result_cache is not None and on_log is None:
+            cache_key = result_key('js', html_content)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if self.in_memory:
+            return self._run_page(page_url(html_content), timeout, cache_key, on_log)
+
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.html', encoding='utf-8') as f:
+            f.write(html_content)
+            temp_html_path = f.name
+        try:
+            return self._run_page(f"file://{temp_html_path}", timeout, cache_key, on_log)
+        finally:
+            if os.path.exists(temp_html_path):
+                os.remove(temp_html_path)
+
+    def _build_page(self, haba_data):
+        """Returns the HTML page that runs a document's script and records its console logs."""
+        return f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -63,30 +176,145 @@ class ScriptRunner:
         </body>
         </html>
         """
-        
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.html', encoding='utf-8') as f:
-            f.write(html_content)
-            temp_html_path = f.name
-            
-        driver = None
-        logs = []
-        error = None
+
+    def _run_page(self, url, timeout=None, cache_key=None, on_log=None):
+        """
+        Loads the page at url in a pooled browser and collects its logs and
+        tasks, which are cached under cache_key if the run completed.
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else DEFAULT_SCRIPT_TIMEOUT)
+        page_load_timeout = timeout if timeout is not None else _WEBDRIVER_PAGE_LOAD_TIMEOUT
         try:
-            driver = webdriver.Firefox(options=self.options)
-            driver.get(f"file://{temp_html_path}")
-            
-            logs = driver.execute_script("return window.console_logs;")
-            error = driver.execute_script("return window.js_error;")
+            with self.pool.session() as driver:
+                driver.set_page_load_timeout(page_load_timeout)
+                driver.get(url)
 
-        finally:
-            if driver:
-                driver.quit()
-            if os.path.exists(temp_html_path):
-                os.remove(temp_html_path)
+                if on_log is None:
+                    logs = driver.execute_script("return window.console_logs;")
+                    todos = None
+                else:
+                    logs = []
+                    todos = self._stream_logs(driver, on_log, deadline)
+                error = driver.execute_script("return window.js_error;")
+        except Exception as e:
+            if isinstance(e, _LogStreamTimeout):
+                limit = timeout if timeout is not None else DEFAULT_SCRIPT_TIMEOUT
+                todos = e.todos
+            elif not _is_timeout(e):
+                # No browser could be started, or it failed during the run;
+                # either way the script did not run, so this is not cached
+                message = f"Failed to run script: {str(e).strip()}"
+                logs = [message]
+                if on_log is not None:
+                    on_log(logs.pop())
+                return logs, [{
+                    'type': 'error',
+                    'description': message,
+                    'details': ''
+                }]
+            else:
+                limit = page_load_timeout
+                todos = []
+            # The pool quits the browser, which may still be running the script
+            logs = [f"Script execution timed out after {limit} seconds."]
+            if on_log is not None:
+                on_log(logs.pop())
+            return logs, [{
+                'type': 'error',
+                'description': "Script execution timed out.",
+                'details': ''
+            }] + todos
 
+        if todos is not None:
+            return [], self._parse_tasks([], error) + todos
         tasks = self._parse_tasks(logs, error)
+        if cache_key is not None:
+            self.result_cache.put(cache_key, logs, tasks)
         return logs, tasks
 
+    def _stream_logs(self, driver, on_log, deadline):
+        """
+        Passes the page's console logs to on_log as they arrive, until none
+        have arrived for LOG_IDLE_TIME seconds.
+
+        :return: The TODO/FIXME tasks found in the logs.
+        :raises _LogStreamTimeout: If logs were still arriving at the deadline.
+        """
+        todos = []
+        idle_until = time.monotonic() + LOG_IDLE_TIME
+        while True:
+            logs = driver.execute_script(_DRAIN_LOGS)
+            now = time.monotonic()
+            if logs:
+                for log in logs:
+                    on_log(log)
+                todos.extend(self._parse_tasks(logs, None))
+                idle_until = now + LOG_IDLE_TIME
+            if now >= idle_until:
+                return todos
+            if now >= deadline:
+                raise _LogStreamTimeout(todos)
+            time.sleep(LOG_POLL_INTERVAL)
+
+    def run_many(self, documents, max_workers=None, timeout=DEFAULT_SCRIPT_TIMEOUT, read=None):
+        """
+        Runs the scripts of many documents concurrently, one browser per worker.
+
+        Results are yielded as the runs finish, not in input order. Documents
+        are read from the iterable as workers become free, so a long stream of
+        documents is never held in memory at once. The runner's pool grows to
+        max_workers browsers for the batch if it is smaller, and is given
+        back its size afterwards (quitting the extra browsers).
+
+        :param documents: An iterable of .haba file contents, or of items
+                          passed to read.
+        :param max_workers: Number of scripts run at once (defaults to the CPU
+                            count).
+        :param timeout: Seconds each script may take to run (see run_script).
+        :param read: If given, called on a worker thread with each item to get
+                     its .haba file contents, e.g. to read a file by path. An
+                     item that cannot be read (OSError or ValueError) gives
+                     an error task instead of a run.
+        :return: An iterator of (document, logs, tasks) tuples, where document
+                 is the item taken from documents.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        previous_size = self.pool.size
+        batch_size = max(previous_size, max_workers)
+        self.pool.resize(batch_size)
+        documents = iter(documents)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            pending = {}
+            while True:
+                # Keep every worker busy with one run queued behind it
+                for document in documents:
+                    pending[executor.submit(self._run_item, document, timeout, read)] = document
+                    if len(pending) >= max_workers * 2:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    logs, tasks = future.result()
+                    yield pending.pop(future), logs, tasks
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            # The pool may be shared; leave it alone if it was resized meanwhile
+            if self.pool.size == batch_size != previous_size:
+                self.pool.resize(previous_size)
+
+    def _run_item(self, item, timeout, read):
+        """Runs one run_many item, reading it first if needed."""
+        if read is None:
+            return self.run_script(item, timeout)
+        try:
+            haba_content = read(item)
+        except (OSError, ValueError) as e:
+            message = f"Failed to read document: {e}"
+            return [message], [{'type': 'error', 'description': message, 'details': ''}]
+        return self.run_script(haba_content, timeout)
+
     def _parse_tasks(self, logs, error):
         """
         Parses console logs and a JS error to create a list of actionable tasks.
@@ -111,34 +339,129 @@ class ScriptRunner:
         return tasks
 
 
-def run_python_script(script_content):
+def _is_timeout(error):
+    """Returns whether error is selenium's TimeoutException."""
+    # Only a loaded selenium can have raised one, so an error from failing
+    # to import selenium does not try to import it again
+    exceptions = sys.modules.get('selenium.common.exceptions')
+    return exceptions is not None and isinstance(error, exceptions.TimeoutException)
+
+
+def _stream_python_output(script_path, on_line, timeout):
+    """
+    Runs a python script unbuffered, passing each stdout and stderr line to
+    on_line(is_stderr, line) as it is printed.
+
+    :raises subprocess.TimeoutExpired: If the script ran longer than timeout
+                                       seconds; it has been killed.
+    """
+    process = subprocess.Popen(['python', '-u', script_path], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    lines = queue.Queue()
+
+    def pump(pipe, is_stderr):
+        with pipe:
+            for line in pipe:
+                lines.put((is_stderr, line.rstrip('\n')))
+        lines.put(None)
+
+    for pipe, is_stderr in ((process.stdout, False), (process.stderr, True)):
+        threading.Thread(target=pump, args=(pipe, is_stderr), daemon=True).start()
+
+    open_pipes = 2
+    deadline = time.monotonic() + timeout
+    try:
+        while open_pipes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(process.args, timeout)
+            try:
+                item = lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if item is None:
+                open_pipes -= 1
+                continue
+            on_line(*item)
+        process.wait(timeout=max(0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise
+
+
+def run_python_script(script_content, result_cache=None, on_log=None, timeout=DEFAULT_SCRIPT_TIMEOUT,
+                      worker_pool=None):
     """
     Runs a python script and captures its output.
+
+    :param result_cache: A ResultCache of the results of scripts that ran
+                         to completion. Only use one for deterministic scripts.
+    :param on_log: If given, each output line is passed to it as the script
+                   prints it instead of being returned. Streamed runs are
+                   not cached.
+    :param timeout: Seconds the script may run before it is stopped.
+    :param worker_pool: A PythonWorkerPool whose warm interpreters run the
+                        script, instead of a new python process per run.
     """
+    cache_key = None
+    if result_cache is not None and on_log is None:
+        cache_key = result_key('python', script_content)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     logs = []
     tasks = []
+    output = ([], [])  # stdout and stderr lines from a worker
+    last_error = None
+
+    def on_line(is_stderr, line):
+        nonlocal last_error
+        if on_log is None:
+            output[is_stderr].append(line)
+            return
+        on_log(line)
+        if is_stderr and line.strip():
+            last_error = line.strip()
+
     temp_py_path = None
     try:
-        # Create a temporary file to write the script content
+        # Create a temporary file to write the script content. Workers run
+        # the text, but take __file__ and traceback lines from the file.
         with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.py', encoding='utf-8') as f:
             f.write(script_content)
             temp_py_path = f.name
 
-        # Execute the script using subprocess
-        result = subprocess.run(
-            ['python', temp_py_path],
-            capture_output=True,
-            text=True,
-            timeout=10  # 10 second timeout
-        )
+        if worker_pool is not None:
+            with worker_pool.session() as worker:
+                worker.run(script_content, on_line, timeout, filename=temp_py_path)
+            stdout, stderr = "\n".join(output[0]), "\n".join(output[1])
+        else:
+            if on_log is not None:
+                _stream_python_output(temp_py_path, on_line, timeout)
+            else:
+                # Execute the script using subprocess
+                result = subprocess.run(
+                    ['python', temp_py_path],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
+                stdout, stderr = result.stdout, result.stderr
+
+        if on_log is not None:
+            if last_error is not None:
+                tasks.append({'type': 'error', 'description': last_error})
+            return logs, tasks
 
         # Process stdout
-        if result.stdout:
-            logs.extend(result.stdout.strip().split('\n'))
+        if stdout:
+            logs.extend(stdout.strip().split('\n'))
 
         # Process stderr
-        if result.stderr:
-            stderr_lines = result.stderr.strip().split('\n')
+        if stderr:
+            stderr_lines = stderr.strip().split('\n')
             logs.extend(stderr_lines)
             if stderr_lines:
                 tasks.append({
@@ -146,14 +469,21 @@ def run_python_script(script_content):
                     'description': stderr_lines[-1]  # Get the last line of the error message
                 })
 
+        if cache_key is not None:
+            result_cache.put(cache_key, logs, tasks)
+
     except subprocess.TimeoutExpired:
-        logs.append("Script execution timed out after 10 seconds.")
+        logs.append(f"Script execution timed out after {timeout} seconds.")
+        if on_log is not None:
+            on_log(logs.pop())
         tasks.append({
             'type': 'error',
             'description': "Script execution timed out."
         })
     except Exception as e:
         logs.append(f"Failed to run python script: {e}")
+        if on_log is not None:
+            on_log(logs.pop())
         tasks.append({
             'type': 'error',
             'description': f"An unexpected error occurred while running the script: {e}"
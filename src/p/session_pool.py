@@ -0,0 +1,213 @@
+"""
+A pool of long-lived, reusable sessions.
+
+Some runners have expensive sessions: a headless browser (see browser_pool)
+or a warm Python interpreter (see python_worker) takes far longer to start
+than a typical run. SessionPool keeps started sessions and hands them out
+again:
+
+- size bounds the number of sessions; acquiring blocks while all are busy
+- an idle session is health-checked before reuse and replaced if it died
+- a session is recycled (quit and replaced) after max_runs runs, which
+  bounds the state a long-lived session accumulates
+- a released session is reset, so nothing from one run leaks into the next
+
+Sessions still open when the interpreter exits are quit.
+"""
+
+import atexit
+import threading
+import weakref
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 1
+DEFAULT_MAX_RUNS = 100
+
+_open_pools = weakref.WeakSet()
+
+
+class _Session:
+    """A started resource and the number of runs it has served."""
+
+    __slots__ = ('resource', 'runs')
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.runs = 0
+
+
+def _quit(resource):
+    """Quits a resource, ignoring errors from one that has already died."""
+    try:
+        resource.quit()
+    except Exception:
+        pass
+
+
+class SessionPool:
+    """
+    A thread-safe pool of reusable sessions.
+
+    A session is any resource with a quit() method. Subclasses override
+    _is_healthy() and _reset() to check and clean up their resources.
+
+    Usage:
+        pool = SessionPool(start_resource)
+        with pool.session() as resource:
+            ...
+        pool.close()
+    """
+
+    def __init__(self, factory, size: int = DEFAULT_POOL_SIZE, max_runs: int = DEFAULT_MAX_RUNS):
+        """
+        Args:
+            factory: Function starting a new session resource
+            size: Maximum number of sessions open at once
+            max_runs: Runs after which a session is quit and replaced;
+                      0 or None never recycles
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.factory = factory
+        self.size = size
+        self.max_runs = max_runs
+        self.started = 0
+        self.recycled = 0
+        self._idle = []  # Sessions ready for reuse, most recently used last
+        self._open = 0  # Idle and busy sessions
+        self._closed = False
+        self._condition = threading.Condition()
+        _open_pools.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @contextmanager
+    def session(self):
+        """
+        Yields a session resource for one run.
+
+        If the run raises, the session is quit rather than reused, since
+        it may be left in an unknown state.
+        """
+        session = self._acquire()
+        try:
+            yield session.resource
+        except BaseException:
+            self._release(session, discard=True)
+            raise
+        self._release(session)
+
+    def resize(self, size: int):
+        """
+        Changes the maximum number of sessions; sessions above a smaller
+        size are quit as they become idle.
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        with self._condition:
+            self.size = size
+            extra = self._idle[:max(0, self._open - size)]
+            del self._idle[:len(extra)]
+            self._open -= len(extra)
+            self._condition.notify_all()
+        for session in extra:
+            _quit(session.resource)
+
+    def warm(self, count: int = None):
+        """
+        Starts idle sessions ahead of use, up to count (default: size) in total.
+        """
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._condition:
+                if self._closed or self._open >= count:
+                    return
+                self._open += 1
+            session = self._start()
+            with self._condition:
+                self._idle.append(session)
+                self._condition.notify()
+
+    def close(self):
+        """Quits every idle session; busy sessions are quit when released."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for session in idle:
+            _quit(session.resource)
+
+    def _start(self) -> _Session:
+        """Starts a session for a slot already counted in _open."""
+        try:
+            resource = self.factory()
+        except BaseException:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.started += 1
+        return _Session(resource)
+
+    def _acquire(self) -> _Session:
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("session pool is closed")
+                    if self._idle:
+                        session = self._idle.pop()
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        session = None
+                        break
+                    self._condition.wait()
+            if session is None:
+                return self._start()
+            if self._is_healthy(session.resource):
+                return session
+            _quit(session.resource)
+            with self._condition:
+                self._open -= 1
+
+    def _release(self, session: _Session, discard: bool = False):
+        session.runs += 1
+        recycle = not discard and bool(self.max_runs) and session.runs >= self.max_runs
+        if not discard and not recycle:
+            discard = not self._reset(session.resource)
+        with self._condition:
+            if recycle:
+                self.recycled += 1
+                discard = True
+            if discard or self._closed or self._open > self.size:
+                self._open -= 1
+            else:
+                self._idle.append(session)
+                session = None
+            self._condition.notify()
+        if session is not None:
+            _quit(session.resource)
+
+    def _is_healthy(self, resource) -> bool:
+        """Whether an idle resource can be reused; override to check it."""
+        return True
+
+    def _reset(self, resource) -> bool:
+        """
+        Cleans up a resource after a run; returns whether it can be reused.
+        Override to undo what a run may have left behind.
+        """
+        return True
+
+
+@atexit.register
+def _close_open_pools():
+    for pool in list(_open_pools):
+        pool.close()
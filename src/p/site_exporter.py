@@ -0,0 +1,468 @@
+"""
+Parallel, incremental export of a directory tree of .haba files to HTML.
+
+Usage:
+    python -m src.p.site_exporter content/ public/ --workers 8
+
+Every .haba file under the source directory is exported to the same
+relative path under the output directory, with an .html extension. A
+manifest in the output directory records the digest of each source and the
+exporter version that produced its output; later builds only re-export
+files whose source or the exporter changed, and remove the output of
+deleted sources. Sources whose mtime and size are unchanged are skipped
+without being read.
+
+Pages can use a custom template (see export_template), and can be minified
+and precompressed (.html.gz, or .html.zst when the zstandard package is
+installed) for static file servers; changing these options re-exports
+every file.
+
+With shared_css, the styles of all pages are written once to a
+content-hashed stylesheet (haba-styles-<hash>.css) in the output directory,
+which every page links instead of inlining a <style> block. When the set
+of styles changes, the stylesheet gets a new name and every page is
+re-exported to link it.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from .haba_parser import HabaParser
+    from .html_exporter import HtmlExporter, EXPORTER_VERSION
+    from .batch_parser import find_haba_files
+    from .habac import source_digest, decode_source
+    from .atomic_file import atomic_write
+    from .compressed_output import CompressedOutput, resolve_formats, COMPRESSION_SUFFIXES
+    from .export_template import TemplateError
+except ImportError:
+    from haba_parser import HabaParser
+    from html_exporter import HtmlExporter, EXPORTER_VERSION
+    from batch_parser import find_haba_files
+    from habac import source_digest, decode_source
+    from atomic_file import atomic_write
+    from compressed_output import CompressedOutput, resolve_formats, COMPRESSION_SUFFIXES
+    from export_template import TemplateError
+
+MANIFEST_NAME = '.haba-manifest.json'
+MANIFEST_VERSION = 1
+
+# Export statuses
+EXPORTED = 'exported'
+SKIPPED = 'skipped'
+REMOVED = 'removed'
+FAILED = 'failed'
+
+# The outcome for one source file: source and output are paths relative to
+# the source and output directories, and error is a message or None.
+ExportResult = namedtuple('ExportResult', ['source', 'output', 'status', 'error'])
+
+# Aggregate numbers for a site build. html_bytes and compressed_bytes are
+# the total sizes of the site's .html files and of their compressed copies.
+# stylesheet is the shared stylesheet path relative to the output
+# directory, or None when styles are inlined.
+SiteStats = namedtuple('SiteStats', ['files', 'exported', 'skipped', 'removed', 'errors', 'seconds',
+                                     'html_bytes', 'compressed_bytes', 'stylesheet'])
+
+# A file to (re)export: known_digest is the trusted manifest digest, if any,
+# and previous_entry the manifest entry from the last build, if any
+_ExportTask = namedtuple('_ExportTask', ['source', 'output', 'source_path', 'output_path', 'known_digest',
+                                         'previous_entry'])
+
+
+def output_path_for(relative_source: str) -> str:
+    """Returns the output path, relative to the output directory, of a source file."""
+    root, _ = os.path.splitext(relative_source)
+    return root + '.html'
+
+
+def load_manifest(output_root: str) -> dict:
+    """
+    Reads the manifest of an output directory.
+
+    Returns:
+        A dict with 'exporter_version' and 'files' (relative source path ->
+        entry); empty if the manifest is missing, unreadable or from another
+        manifest version
+    """
+    try:
+        with open(os.path.join(output_root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'exporter_version': None, 'files': {}}
+    if not isinstance(manifest, dict) or manifest.get('manifest_version') != MANIFEST_VERSION:
+        return {'exporter_version': None, 'files': {}}
+    return manifest
+
+
+def save_manifest(output_root: str, manifest: dict):
+    """Writes the manifest of an output directory."""
+    manifest = dict(manifest, manifest_version=MANIFEST_VERSION)
+    with atomic_write(os.path.join(output_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def _entry_outputs(entry: dict) -> list:
+    """Returns the output paths, relative to the output directory, recorded in a manifest entry."""
+    if entry.get('sizes'):
+        return list(entry['sizes'])
+    return [entry['output']] if entry.get('output') else []
+
+
+def stylesheet_name(css_text: str) -> str:
+    """Returns the content-hashed file name of a shared stylesheet."""
+    return f"haba-styles-{hashlib.blake2b(css_text.encode('utf-8'), digest_size=8).hexdigest()}.css"
+
+
+def _read_source(task: _ExportTask):
+    """Reads a source file, returning its bytes, stat result and manifest digest."""
+    with open(task.source_path, 'rb') as f:
+        stat_result = os.fstat(f.fileno())
+        raw_bytes = f.read()
+    return raw_bytes, stat_result, source_digest(raw_bytes).hex()
+
+
+def _is_unchanged(task: _ExportTask, digest: str) -> bool:
+    return digest == task.known_digest and os.path.exists(task.output_path)
+
+
+def _collect_styles_chunk(tasks, minify, template_text):
+    """
+    Worker entry point: returns the (class_name, css) rules of each source in
+    a chunk, taking unchanged sources' rules from the manifest.
+
+    Sources that cannot be read give no rules; they fail in the export pass.
+    """
+    parser = HabaParser()
+    exporter = HtmlExporter(minify=minify, template=template_text)
+    collected = []
+    for task in tasks:
+        try:
+            raw_bytes, _, digest = _read_source(task)
+            if _is_unchanged(task, digest):
+                rules = task.previous_entry.get('styles', {})
+            else:
+                rules = dict(exporter.style_compiler.rules(parser.parse(decode_source(raw_bytes))))
+        except (OSError, UnicodeDecodeError):
+            rules = {}
+        collected.append(rules)
+    return collected
+
+
+def _export_one(task: _ExportTask, parser: HabaParser, exporter: HtmlExporter, precompress,
+                stylesheet: str = None):
+    """
+    Exports one source unless its digest matches the manifest.
+
+    Returns:
+        A tuple (ExportResult, manifest entry or None)
+    """
+    try:
+        raw_bytes, stat_result, digest = _read_source(task)
+        entry = {'digest': digest, 'mtime_ns': stat_result.st_mtime_ns,
+                 'size': stat_result.st_size, 'output': task.output}
+        if _is_unchanged(task, digest):
+            # Touched but unchanged
+            entry['sizes'] = task.previous_entry.get('sizes', {})
+            entry['styles'] = task.previous_entry.get('styles', {})
+            return ExportResult(task.source, task.output, SKIPPED, None), entry
+
+        haba_data = parser.parse(decode_source(raw_bytes))
+        os.makedirs(os.path.dirname(task.output_path) or '.', exist_ok=True)
+        title = os.path.splitext(os.path.basename(task.source))[0]
+        stylesheet_href = None
+        if stylesheet is not None:
+            # Relative, so the site also works when opened from disk
+            stylesheet_href = os.path.relpath(stylesheet, os.path.dirname(task.output) or os.curdir)
+            stylesheet_href = stylesheet_href.replace(os.sep, '/')
+        sizes = exporter.export_to_file(haba_data, task.output_path, title, precompress=precompress,
+                                        stylesheet_href=stylesheet_href)
+        entry['sizes'] = {task.output + path[len(task.output_path):]: size for path, size in sizes.items()}
+        entry['styles'] = dict(exporter.style_compiler.rules(haba_data))
+
+        # Remove compressed copies that are no longer produced
+        if task.previous_entry is not None:
+            output_root = task.output_path[:len(task.output_path) - len(task.output)]
+            for output in _entry_outputs(task.previous_entry):
+                if output not in entry['sizes']:
+                    _remove_outputs(output_root, [output])
+        return ExportResult(task.source, task.output, EXPORTED, None), entry
+    except (OSError, UnicodeDecodeError) as e:
+        return ExportResult(task.source, task.output, FAILED, f"{type(e).__name__}: {e}"), None
+
+
+def _export_chunk(tasks, minify, precompress, template_text, stylesheet):
+    """Worker entry point: exports a chunk of files in one task."""
+    parser = HabaParser()
+    exporter = HtmlExporter(minify=minify, template=template_text)
+    return [_export_one(task, parser, exporter, precompress, stylesheet) for task in tasks]
+
+
+def _run_chunks(func, tasks, max_workers, chunk_size, *args) -> list:
+    """
+    Runs func(chunk, *args) over chunks of tasks, in worker processes unless
+    max_workers is 1, and returns the concatenated results in task order.
+    """
+    if not chunk_size:
+        chunk_size = max(1, -(-len(tasks) // (max_workers * 4)))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    if max_workers == 1 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in func(chunk, *args)]
+    results_by_chunk = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, chunk, *args): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            results_by_chunk[futures[future]] = future.result()
+    return [result for i in range(len(chunks)) for result in results_by_chunk[i]]
+
+
+def _write_stylesheet(output_root, exporter, skipped, files, collected, precompress):
+    """
+    Writes the shared stylesheet for all pages unless it already exists.
+
+    Returns:
+        The stylesheet path relative to the output directory
+    """
+    rules = {}
+    for result in skipped:
+        rules.update(files[result.source].get('styles', {}))
+    for task_rules in collected:
+        rules.update(task_rules)
+    css_text = exporter.shared_stylesheet(rules.items())
+    name = stylesheet_name(css_text)
+    path = os.path.join(output_root, name)
+    if not os.path.exists(path):
+        data = css_text.encode('utf-8')
+        if precompress:
+            with CompressedOutput(path, precompress) as out:
+                out.write(data)
+        else:
+            with atomic_write(path, 'wb') as f:
+                f.write(data)
+    return name
+
+
+def _remove_outputs(output_root, paths):
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(output_root, path))
+
+
+def _plan(source_root, output_root, manifest, options, force):
+    """
+    Splits the sources into unchanged files and files to export.
+
+    Returns:
+        A tuple (skipped results, tasks, removed entries, new manifest files)
+    """
+    trusted = (not force and manifest.get('exporter_version') == EXPORTER_VERSION
+               and manifest.get('options') == options)
+    files = manifest['files'] if trusted else {}
+    skipped = []
+    tasks = []
+    new_files = {}
+    for source_path in find_haba_files([source_root]):
+        source = os.path.relpath(source_path, source_root)
+        output = output_path_for(source)
+        output_path = os.path.join(output_root, output)
+        entry = files.get(source)
+        if entry is not None and entry.get('output') == output:
+            try:
+                stat_result = os.stat(source_path)
+            except OSError:
+                stat_result = None
+            if (stat_result is not None
+                    and (entry.get('mtime_ns'), entry.get('size')) == (stat_result.st_mtime_ns, stat_result.st_size)
+                    and os.path.exists(output_path)):
+                skipped.append(ExportResult(source, output, SKIPPED, None))
+                new_files[source] = entry
+                continue
+        known_digest = entry.get('digest') if entry is not None and entry.get('output') == output else None
+        tasks.append(_ExportTask(source, output, source_path, output_path, known_digest,
+                                 manifest['files'].get(source)))
+
+    current = {task.source for task in tasks}.union(new_files)
+    removed = {source: entry for source, entry in manifest['files'].items() if source not in current}
+    return skipped, tasks, removed, new_files
+
+
+def export_site(source_root: str, output_root: str, max_workers: int = None, chunk_size: int = None,
+                force: bool = False, minify: bool = False, precompress=(), template_text: str = None,
+                shared_css: bool = False):
+    """
+    Exports every .haba file under source_root to HTML under output_root.
+
+    Args:
+        source_root: Directory searched recursively for .haba files
+        output_root: Directory receiving the .html files and the manifest
+        max_workers: Number of worker processes (defaults to the CPU count);
+                     1 exports in the current process
+        chunk_size: Files sent to a worker per task (defaults to about four
+                    tasks per worker)
+        force: Re-export every file regardless of the manifest
+        minify: Whether to write minified HTML (see HtmlExporter)
+        precompress: Compression formats ('gzip', 'zstd') of copies written
+                     next to each .html file
+        template_text: A custom page template (see export_template)
+        shared_css: Whether to link one shared, content-hashed stylesheet
+                    from every page instead of inlining the styles
+
+    Returns:
+        A tuple (results, stats): an ExportResult per source file (and per
+        removed output), sorted by source path, and a SiteStats
+
+    Raises:
+        TemplateError: If the template is malformed, or has no {{stylesheet}}
+                       slot for a shared stylesheet
+    """
+    start = time.perf_counter()
+    # Fails here, before any work is sent to the workers, if the template is malformed
+    exporter = HtmlExporter(minify=minify, template=template_text)
+    if shared_css and 'stylesheet' not in exporter.template.slots:
+        raise TemplateError("a shared stylesheet needs a template with a {{stylesheet}} slot")
+    os.makedirs(output_root, exist_ok=True)
+    manifest = load_manifest(output_root)
+    precompress = resolve_formats(precompress)
+    options = {
+        'minify': bool(minify),
+        'precompress': precompress,
+        'template': hashlib.blake2b(template_text.encode('utf-8'), digest_size=16).hexdigest()
+                    if template_text is not None else None,
+        'shared_css': bool(shared_css),
+    }
+    skipped, tasks, removed, new_files = _plan(source_root, output_root, manifest, options, force)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    stylesheet = None
+    previous_stylesheet = manifest.get('stylesheet')
+    if shared_css:
+        collected = _run_chunks(_collect_styles_chunk, tasks, max_workers, chunk_size, minify, template_text)
+        stylesheet = _write_stylesheet(output_root, exporter, skipped, manifest['files'], collected, precompress)
+        if stylesheet != previous_stylesheet:
+            # Unchanged pages, skipped or merely touched, still link the old stylesheet
+            tasks = [task._replace(known_digest=None) for task in tasks]
+            for result in skipped:
+                new_files.pop(result.source)
+                tasks.append(_ExportTask(result.source, result.output, os.path.join(source_root, result.source),
+                                         os.path.join(output_root, result.output), None,
+                                         manifest['files'][result.source]))
+            skipped = []
+
+    outcomes = _run_chunks(_export_chunk, tasks, max_workers, chunk_size,
+                           minify, precompress, template_text, stylesheet)
+
+    results = list(skipped)
+    for result, entry in outcomes:
+        results.append(result)
+        if entry is not None:
+            new_files[result.source] = entry
+
+    # Remove the output of sources that no longer exist
+    for source, entry in removed.items():
+        output = entry.get('output')
+        try:
+            _remove_outputs(output_root, _entry_outputs(entry))
+        except OSError as e:
+            results.append(ExportResult(source, output, FAILED, f"{type(e).__name__}: {e}"))
+            continue
+        results.append(ExportResult(source, output, REMOVED, None))
+
+    if previous_stylesheet and previous_stylesheet != stylesheet:
+        _remove_outputs(output_root, [previous_stylesheet] + [previous_stylesheet + COMPRESSION_SUFFIXES[name]
+                                                              for name in COMPRESSION_SUFFIXES])
+
+    save_manifest(output_root, {'exporter_version': EXPORTER_VERSION, 'options': options,
+                                'stylesheet': stylesheet, 'files': new_files})
+    results.sort(key=lambda result: result.source)
+
+    counts = {status: 0 for status in (EXPORTED, SKIPPED, REMOVED, FAILED)}
+    for result in results:
+        counts[result.status] += 1
+    stats = SiteStats(
+        files=len(skipped) + len(tasks),
+        exported=counts[EXPORTED],
+        skipped=counts[SKIPPED],
+        removed=counts[REMOVED],
+        errors=counts[FAILED],
+        seconds=time.perf_counter() - start,
+        html_bytes=sum(entry.get('sizes', {}).get(entry['output'], 0) for entry in new_files.values()),
+        compressed_bytes=sum(size for entry in new_files.values()
+                             for path, size in entry.get('sizes', {}).items() if path != entry['output']),
+        stylesheet=stylesheet,
+    )
+    return results, stats
+
+
+def main(argv=None):
+    """
+    The main function for the site exporter CLI.
+    """
+    parser = argparse.ArgumentParser(description="Export a directory of .haba files to HTML, re-exporting only changed files.")
+    parser.add_argument("source", help="Directory searched recursively for .haba files.")
+    parser.add_argument("output", help="Directory receiving the exported .html files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Files per worker task.")
+    parser.add_argument("--force", action="store_true", help="Re-export every file.")
+    parser.add_argument("--minify", action="store_true", help="Write minified HTML, CSS and script.")
+    parser.add_argument("--shared-css", action="store_true",
+                        help="Link one shared, content-hashed stylesheet from every page instead of inline styles.")
+    parser.add_argument("--template", default=None, help="Page template file with {{title}}, {{css}}, {{content}} "
+                                                         "and {{script}} slots.")
+    parser.add_argument("--precompress", action="append", default=[], choices=sorted(COMPRESSION_SUFFIXES),
+                        help="Also write a compressed copy next to each page (repeatable; "
+                             "zstd falls back to gzip without the zstandard package).")
+    parser.add_argument("--quiet", action="store_true", help="Only print errors and the summary.")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.source):
+        print(f"Error: Source directory not found at '{args.source}'")
+        sys.exit(1)
+
+    template_text = None
+    if args.template:
+        try:
+            with open(args.template, 'r', encoding='utf-8') as f:
+                template_text = f.read()
+            template = HtmlExporter(template=template_text).template
+            if args.shared_css and 'stylesheet' not in template.slots:
+                raise TemplateError("no {{stylesheet}} slot for --shared-css")
+        except (OSError, TemplateError) as e:
+            print(f"Error: Cannot use template '{args.template}': {e}")
+            sys.exit(1)
+
+    results, stats = export_site(args.source, args.output, max_workers=args.workers,
+                                 chunk_size=args.chunk_size, force=args.force,
+                                 minify=args.minify, precompress=args.precompress,
+                                 template_text=template_text, shared_css=args.shared_css)
+
+    for result in results:
+        if result.status == FAILED:
+            print(f"ERROR    {result.source}: {result.error}")
+        elif not args.quiet and result.status != SKIPPED:
+            print(f"{result.status.upper():<9}{result.source} -> {result.output}")
+
+    print("-" * 30)
+    print(f"{stats.files} files: {stats.exported} exported, {stats.skipped} unchanged, "
+          f"{stats.removed} removed in {stats.seconds:.2f}s")
+    if stats.stylesheet:
+        print(f"Shared stylesheet: {stats.stylesheet}")
+    if args.precompress and stats.html_bytes:
+        # Each page has one compressed copy per format
+        per_format = stats.compressed_bytes / len(resolve_formats(args.precompress))
+        saved = 1 - per_format / stats.html_bytes
+        print(f"HTML: {stats.html_bytes / 1024:.1f} KB, compressed: {per_format / 1024:.1f} KB per format "
+              f"({saved:.0%} saved)")
+    if stats.errors:
+        print(f"{stats.errors} file(s) failed.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Streaming parser for .haba files.
+
+Reads a .haba document from a file object or mmap in fixed-size chunks and
+yields layer events as it goes, so documents larger than memory can be
+converted or exported without ever holding the whole text.
+"""
+
+import codecs
+from collections import namedtuple
+
+try:
+    from .haba_parser import HabaData, _TAG_PATTERN
+except ImportError:
+    from haba_parser import HabaData, _TAG_PATTERN
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Event kinds yielded by HabaStreamParser.iter_events
+CONTENT_EVENT = 'content'
+PRESENTATION_ITEM_EVENT = 'presentation_item'
+SCRIPT_EVENT = 'script'
+
+# A parse event: kind is one of the *_EVENT constants. value is a text chunk
+# for content and script events, and a (container, style) tuple for
+# presentation item events.
+HabaEvent = namedtuple('HabaEvent', ['kind', 'value'])
+
+# Longest layer tag; a partial tag at the end of a chunk is never longer
+_MAX_TAG_LENGTH = len('</presentation_layer>')
+
+# Parser states; inside a layer the state is the layer's tag name
+_OUTSIDE = 'outside'
+_TOP_LEVEL_TAGS = ('content_layer', 'presentation_layer', 'script_layer')
+_TEXT_STATES = {'content_layer': CONTENT_EVENT, 'script_layer': SCRIPT_EVENT}
+_SECTION_TAGS = ('containers', 'styles')
+
+
+class HabaStreamParser:
+    """
+    An event-based parser that reads .haba documents incrementally.
+
+    Content and script text is yielded in chunks as soon as it is read (with
+    the same leading/trailing whitespace stripping as HabaParser.parse).
+    Presentation items are yielded as (container, style) pairs once the
+    presentation layer is closed, since containers and styles are matched by
+    order.
+
+    Layers are expected to follow each other rather than nest. As with
+    HabaParser, only the first occurrence of each layer is used. Because text
+    is yielded as it is read, a content or script layer left unclosed at the
+    end of the file still yields the text read up to that point.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = 'utf-8'):
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+
+    def iter_events(self, source):
+        """
+        Parses a .haba document incrementally.
+
+        Args:
+            source: A text or binary file object, or an mmap. Binary input is
+                decoded with the parser's encoding.
+
+        Yields:
+            HabaEvent tuples in document order
+        """
+        self._reset()
+        buffer = ""
+        for chunk in self._read_chunks(source):
+            buffer += chunk
+            pos = 0
+            for match in _TAG_PATTERN.finditer(buffer):
+                closing, name = match.groups()
+                if not self._is_transition(bool(closing), name):
+                    continue
+                yield from self._feed(buffer[pos:match.start()])
+                yield from self._transition(bool(closing), name, match.group())
+                pos = match.end()
+
+            # Hold back a possible partial tag at the end of the buffer
+            cut = buffer.rfind('<', max(pos, len(buffer) - _MAX_TAG_LENGTH + 1))
+            if cut == -1:
+                cut = len(buffer)
+            yield from self._feed(buffer[pos:cut])
+            buffer = buffer[cut:]
+
+        yield from self._feed(buffer)
+
+    def parse(self, source) -> HabaData:
+        """
+        Parses a whole document from a file object or mmap into a HabaData object.
+        """
+        data = HabaData()
+        content_chunks = []
+        script_chunks = []
+        for event in self.iter_events(source):
+            if event.kind == CONTENT_EVENT:
+                content_chunks.append(event.value)
+            elif event.kind == SCRIPT_EVENT:
+                script_chunks.append(event.value)
+            else:
+                data.presentation_items.append(event.value)
+        data.content = "".join(content_chunks)
+        data.script = "".join(script_chunks)
+        return data
+
+    def _reset(self):
+        self._state = _OUTSIDE
+        self._seen = set()
+        self._text_started = False
+        self._pending_whitespace = ""
+        # Partial last line of each open containers/styles section
+        self._open_sections = {}
+        self._lines = {'containers': [], 'styles': []}
+
+    def _read_chunks(self, source):
+        decoder = None
+        while True:
+            chunk = source.read(self.chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, bytes):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(self.encoding)()
+                chunk = decoder.decode(chunk)
+            yield chunk
+        if decoder is not None:
+            yield decoder.decode(b"", final=True)
+
+    def _is_transition(self, closing, name):
+        """Returns True if the tag changes the parser state; other tags are plain text."""
+        if self._state == _OUTSIDE:
+            return not closing and name in _TOP_LEVEL_TAGS and name not in self._seen
+        if self._state == 'presentation_layer':
+            if name == 'presentation_layer':
+                return closing
+            if name in _SECTION_TAGS:
+                return name in self._open_sections if closing else name not in self._seen
+            return False
+        return closing and name == self._state
+
+    def _transition(self, closing, name, tag_text):
+        if self._state == 'presentation_layer' and name in _SECTION_TAGS:
+            # The containers and styles sections are found independently, so
+            # a tag for one section is plain text inside the other.
+            for section in self._open_sections:
+                if section != name:
+                    self._feed_section(section, tag_text)
+            if closing:
+                self._add_line(name, self._open_sections.pop(name))
+            else:
+                self._seen.add(name)
+                self._open_sections[name] = ""
+            return
+
+        if not closing:
+            self._seen.add(name)
+            self._state = name
+            self._text_started = False
+            self._pending_whitespace = ""
+            return
+
+        if name == 'presentation_layer':
+            # Sections still open when the presentation layer closes are dropped
+            for section in self._open_sections:
+                self._lines[section] = []
+            self._open_sections = {}
+            styles = self._lines['styles']
+            for i, container in enumerate(self._lines['containers']):
+                yield HabaEvent(PRESENTATION_ITEM_EVENT, (container, styles[i] if i < len(styles) else ""))
+
+        # Trailing whitespace of a text layer is dropped
+        self._state = _OUTSIDE
+
+    def _feed(self, text):
+        """Handles text read in the current state."""
+        if not text:
+            return
+        if self._state in _TEXT_STATES:
+            if not self._text_started:
+                text = text.lstrip()
+                if not text:
+                    return
+                self._text_started = True
+            stripped = text.rstrip()
+            if stripped:
+                yield HabaEvent(_TEXT_STATES[self._state], self._pending_whitespace + stripped)
+                self._pending_whitespace = text[len(stripped):]
+            else:
+                self._pending_whitespace += text
+        elif self._state == 'presentation_layer':
+            for section in self._open_sections:
+                self._feed_section(section, text)
+
+    def _feed_section(self, section, text):
+        lines = (self._open_sections[section] + text).split('\n')
+        self._open_sections[section] = lines.pop()
+        for line in lines:
+            self._add_line(section, line)
+
+    def _add_line(self, section, line):
+        line = line.strip()
+        if line:
+            self._lines[section].append(line)
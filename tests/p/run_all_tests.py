@@ -17,9 +17,23 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
 
 # Import all test modules
-from test_haba_parser import TestHabaParser, TestHabaData, TestHabaParserBDD
-from test_html_exporter import TestHtmlExporter, TestHtmlExporterBDD, TestHtmlExporterIntegration
+from test_haba_parser import TestHabaParser, TestHabaData, TestLineIndex, TestCompactHabaData, TestHabaParserBDD
+from test_incremental_parser import TestFindEdit, TestIncrementalHabaParser, TestIncrementalHabaParserBDD
+from test_stream_parser import TestHabaStreamParser, TestHabaStreamParserBDD
+from test_mapped_data import TestMappedHabaData
+from test_parse_cache import TestParseCache, TestCachingHabaParser
+from test_batch_parser import TestBatchParser
+from test_site_exporter import TestSiteExporter
+from test_compressed_output import TestCompressedOutput
+from test_export_template import TestExportTemplate
+from test_habac import TestHabacFormat, TestHabacCache
+from test_html_exporter import TestHtmlExporter, TestStyleCompiler, TestHtmlExporterBDD, TestHtmlExporterIntegration
 from test_script_runner import TestScriptRunner, TestRunPythonScript, TestScriptRunnerBDD, TestScriptRunnerIntegration
+from test_browser_pool import TestBrowserPool
+from test_result_cache import TestResultCache
+from test_python_worker import TestPythonWorkerPool
+from test_import_time import TestImportTime, TestLazyImport
+from test_atomic_file import TestAtomicWrite
 from test_components import TestSymbolOutlinePanel, TestTodoExplorerPanel, TestComponentsBDD, TestComponentsIntegration
 
 from test_quanta_demo import TestQuantaDemoWindow
@@ -128,16 +142,39 @@ def run_all_tests():
         # HabaParser Tests
         (TestHabaParser, "HabaParser Unit Tests"),
         (TestHabaData, "HabaData Unit Tests"),
+        (TestLineIndex, "LineIndex Unit Tests"),
+        (TestCompactHabaData, "CompactHabaData Unit Tests"),
         (TestHabaParserBDD, "HabaParser BDD Tests"),
+        (TestFindEdit, "find_edit Unit Tests"),
+        (TestIncrementalHabaParser, "IncrementalHabaParser Unit Tests"),
+        (TestIncrementalHabaParserBDD, "IncrementalHabaParser BDD Tests"),
+        (TestHabaStreamParser, "HabaStreamParser Unit Tests"),
+        (TestHabaStreamParserBDD, "HabaStreamParser BDD Tests"),
+        (TestMappedHabaData, "MappedHabaData Unit Tests"),
+        (TestParseCache, "ParseCache Unit Tests"),
+        (TestCachingHabaParser, "CachingHabaParser Unit Tests"),
+        (TestBatchParser, "Batch Parser Unit Tests"),
+        (TestHabacFormat, "Habac Format Unit Tests"),
+        (TestHabacCache, "Habac Cache Unit Tests"),
         
         # HtmlExporter Tests
         (TestHtmlExporter, "HtmlExporter Unit Tests"),
+        (TestStyleCompiler, "StyleCompiler Unit Tests"),
+        (TestSiteExporter, "Site Exporter Unit Tests"),
+        (TestCompressedOutput, "Compressed Output Unit Tests"),
+        (TestExportTemplate, "Export Template Unit Tests"),
         (TestHtmlExporterBDD, "HtmlExporter BDD Tests"),
         (TestHtmlExporterIntegration, "HtmlExporter Integration Tests"),
         
         # ScriptRunner Tests
         (TestScriptRunner, "ScriptRunner Unit Tests"),
         (TestRunPythonScript, "Python Script Runner Tests"),
+        (TestBrowserPool, "BrowserPool Unit Tests"),
+        (TestResultCache, "ResultCache Unit Tests"),
+        (TestPythonWorkerPool, "PythonWorkerPool Unit Tests"),
+        (TestLazyImport, "LazyImport Unit Tests"),
+        (TestImportTime, "Import Time Benchmarks"),
+        (TestAtomicWrite, "atomic_write Unit Tests"),
         (TestScriptRunnerBDD, "ScriptRunner BDD Tests"),
         (TestScriptRunnerIntegration, "ScriptRunner Integration Tests"),
         
@@ -172,19 +209,33 @@ def run_specific_tests():
     print("=" * 70)
     
     categories = {
-        '1': ('Unit Tests', [TestHabaParser, TestHabaData, TestHtmlExporter,
-                            TestScriptRunner, TestRunPythonScript,
+        '1': ('Unit Tests', [TestHabaParser, TestHabaData, TestLineIndex, TestCompactHabaData, TestFindEdit,
+                            TestIncrementalHabaParser, TestHabaStreamParser,
+                            TestMappedHabaData, TestParseCache,
+                            TestCachingHabaParser, TestBatchParser,
+                            TestHabacFormat, TestHabacCache, TestHtmlExporter, TestStyleCompiler, TestSiteExporter,
+                            TestCompressedOutput, TestExportTemplate,
+                            TestScriptRunner, TestRunPythonScript, TestBrowserPool, TestResultCache,
+                            TestPythonWorkerPool, TestLazyImport, TestImportTime, TestAtomicWrite,
                             TestSymbolOutlinePanel, TestTodoExplorerPanel,
                             TestQuantaDemoWindow]),
-        '2': ('BDD Tests', [TestHabaParserBDD, TestHtmlExporterBDD,
+        '2': ('BDD Tests', [TestHabaParserBDD, TestIncrementalHabaParserBDD,
+                           TestHabaStreamParserBDD, TestHtmlExporterBDD,
                            TestScriptRunnerBDD, TestComponentsBDD]),
         '3': ('Integration Tests', [TestHtmlExporterIntegration, 
                                    TestScriptRunnerIntegration, 
                                    TestComponentsIntegration]),
-        '4': ('Parser Tests Only', [TestHabaParser, TestHabaData, TestHabaParserBDD]),
-        '5': ('Exporter Tests Only', [TestHtmlExporter, TestHtmlExporterBDD, 
-                                     TestHtmlExporterIntegration]),
-        '6': ('Script Runner Tests Only', [TestScriptRunner, TestRunPythonScript, 
+        '4': ('Parser Tests Only', [TestHabaParser, TestHabaData, TestLineIndex, TestCompactHabaData, TestHabaParserBDD,
+                                   TestFindEdit, TestIncrementalHabaParser,
+                                   TestIncrementalHabaParserBDD, TestHabaStreamParser,
+                                   TestHabaStreamParserBDD, TestMappedHabaData,
+                                   TestParseCache, TestCachingHabaParser,
+                                   TestBatchParser, TestHabacFormat, TestHabacCache]),
+        '5': ('Exporter Tests Only', [TestHtmlExporter, TestStyleCompiler, TestHtmlExporterBDD, 
+                                     TestHtmlExporterIntegration, TestSiteExporter,
+                                     TestCompressedOutput, TestExportTemplate]),
+        '6': ('Script Runner Tests Only', [TestScriptRunner, TestRunPythonScript, TestBrowserPool, TestResultCache,
+                                          TestPythonWorkerPool,
                                           TestScriptRunnerBDD, TestScriptRunnerIntegration]),
         '7': ('Component Tests Only', [TestSymbolOutlinePanel, TestTodoExplorerPanel, 
                                       TestComponentsBDD, TestComponentsIntegration]),
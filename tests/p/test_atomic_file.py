@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+import stat
+import tempfile
+from unittest.mock import patch
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+import atomic_file
+from atomic_file import atomic_write
+
+
+class TestAtomicWrite(unittest.TestCase):
+    """Unit tests for atomic_write"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'out.txt')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_new_file_gets_the_umask_mode_without_changing_the_umask(self):
+        """Test that a new file gets the usual mode and writes never touch the process umask"""
+        with patch('atomic_file.os.umask') as mock_umask:
+            with atomic_write(self.path) as f:
+                f.write("ünïcode")
+        mock_umask.assert_not_called()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), atomic_file._NEW_FILE_MODE)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), "ünïcode")
+
+    def test_existing_mode_is_kept(self):
+        """Test that replacing a file keeps its mode"""
+        with open(self.path, 'w') as f:
+            f.write("old")
+        os.chmod(self.path, 0o600)
+        with atomic_write(self.path, 'wb') as f:
+            f.write(b"new")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_failed_write_leaves_old_file(self):
+        """Test that an error inside the block keeps the old contents and no temporary file"""
+        with open(self.path, 'w') as f:
+            f.write("old")
+        with self.assertRaises(ValueError):
+            with atomic_write(self.path) as f:
+                f.write("partial")
+                raise ValueError("failed")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.temp_dir.name), ['out.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
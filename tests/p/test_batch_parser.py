@@ -0,0 +1,119 @@
+import unittest
+import io
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+import batch_parser
+from batch_parser import find_haba_files, parse_files
+
+
+def write_file(path, content, mode='w'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.write(content)
+
+
+class TestBatchParser(unittest.TestCase):
+    """Unit tests for the batch parsing API"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        for i in range(6):
+            write_file(os.path.join(self.root, 'docs', f'doc{i}.haba'),
+                       f"<content_layer>Document {i}</content_layer>")
+        write_file(os.path.join(self.root, 'docs', 'nested', 'deep.haba'), "<content_layer>Deep</content_layer>")
+        write_file(os.path.join(self.root, 'docs', 'notes.txt'), "not a haba file")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_find_haba_files_in_directory(self):
+        """Test that directories are searched recursively for .haba files"""
+        paths = find_haba_files([os.path.join(self.root, 'docs')])
+        self.assertEqual(len(paths), 7)
+        self.assertTrue(all(path.endswith('.haba') for path in paths))
+
+    def test_find_haba_files_with_glob(self):
+        """Test expanding a glob pattern"""
+        paths = find_haba_files([os.path.join(self.root, 'docs', 'doc[0-2].haba')])
+        self.assertEqual([os.path.basename(path) for path in paths], ['doc0.haba', 'doc1.haba', 'doc2.haba'])
+
+    def test_parse_files_in_process_pool(self):
+        """Test parsing across worker processes keeps input order"""
+        paths = find_haba_files([os.path.join(self.root, 'docs', '*.haba')])
+        results, stats = parse_files(paths, max_workers=2, chunk_size=2)
+
+        self.assertEqual([result.path for result in results], paths)
+        self.assertEqual([result.data.content for result in results], [f"Document {i}" for i in range(6)])
+        self.assertEqual(stats.files, 6)
+        self.assertEqual(stats.errors, 0)
+        self.assertGreater(stats.bytes, 0)
+
+    def test_unreadable_file_is_reported(self):
+        """Test that decoding errors are returned per file"""
+        bad_path = os.path.join(self.root, 'bad.haba')
+        write_file(bad_path, b'\xff\xfe', mode='wb')
+        results, stats = parse_files([bad_path], max_workers=1)
+
+        self.assertIsNone(results[0].data)
+        self.assertIn("UnicodeDecodeError", results[0].error)
+        self.assertEqual(stats.errors, 1)
+
+    def test_malformed_tags_are_reported_when_validating(self):
+        """Test that validation fails files whose layer tags cannot be paired"""
+        bad_path = os.path.join(self.root, 'unclosed.haba')
+        write_file(bad_path, "<content_layer>\nNever closed")
+        for use_habac in (False, True):
+            results, stats = parse_files([bad_path], max_workers=1, use_habac=use_habac, validate=True)
+            self.assertIsNone(results[0].data)
+            self.assertEqual(results[0].error, "line 1: <content_layer> is never closed")
+            self.assertEqual(stats.errors, 1)
+
+        results, stats = parse_files([bad_path], max_workers=1)
+        self.assertEqual(stats.errors, 0)
+
+    def test_parse_files_with_habac(self):
+        """Test that batch parsing can write and reuse .habac caches"""
+        paths = find_haba_files([os.path.join(self.root, 'docs')])
+        parse_files(paths, max_workers=1, use_habac=True)
+        self.assertTrue(all(os.path.exists(path + 'c') for path in paths))
+
+        results, stats = parse_files(paths, max_workers=1, use_habac=True)
+        self.assertEqual(stats.errors, 0)
+        self.assertEqual(results[0].data.content, "Document 0")
+
+    def test_main_reports_throughput(self):
+        """Test the CLI summary output"""
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            batch_parser.main([os.path.join(self.root, 'docs'), '--workers', '1', '--quiet'])
+        output = mock_stdout.getvalue()
+        self.assertIn("Parsed 7 files", output)
+        self.assertIn("files/s", output)
+        self.assertIn("MB/s", output)
+
+    def test_main_exits_with_error_when_files_fail(self):
+        """Test that a failing file gives a non-zero exit code"""
+        write_file(os.path.join(self.root, 'docs', 'bad.haba'), b'\xff', mode='wb')
+        with patch('sys.stdout', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit) as cm:
+                batch_parser.main([os.path.join(self.root, 'docs'), '--workers', '1'])
+        self.assertEqual(cm.exception.code, 1)
+
+    def test_main_reports_malformed_tags(self):
+        """Test that the CLI fails a readable file with an unclosed layer"""
+        write_file(os.path.join(self.root, 'docs', 'unclosed.haba'), "<script_layer>x")
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            with self.assertRaises(SystemExit) as cm:
+                batch_parser.main([os.path.join(self.root, 'docs'), '--workers', '1', '--quiet'])
+        self.assertEqual(cm.exception.code, 1)
+        self.assertIn("unclosed.haba: line 1: <script_layer> is never closed", mock_stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import sys
+import os
+import threading
+from unittest.mock import MagicMock, PropertyMock
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from browser_pool import BrowserPool, BLANK_PAGE
+
+
+class TestBrowserPool(unittest.TestCase):
+    """Unit tests for BrowserPool class"""
+
+    def setUp(self):
+        self.drivers = []
+        self.pool = BrowserPool(self.start_driver, size=2, max_runs=3)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def start_driver(self):
+        driver = MagicMock()
+        driver.window_handles = ['main']
+        self.drivers.append(driver)
+        return driver
+
+    def test_sessions_are_reused(self):
+        """Test that consecutive runs share one started browser"""
+        for _ in range(2):
+            with self.pool.session() as driver:
+                driver.get("file:///page.html")
+
+        self.assertEqual(self.pool.started, 1)
+        self.drivers[0].quit.assert_not_called()
+        self.drivers[0].get.assert_called_with(BLANK_PAGE)
+
+    def test_session_is_recycled_after_max_runs(self):
+        """Test that a browser is replaced after max_runs runs"""
+        for _ in range(4):
+            with self.pool.session():
+                pass
+
+        self.assertEqual(self.pool.started, 2)
+        self.assertEqual(self.pool.recycled, 1)
+        self.drivers[0].quit.assert_called_once()
+
+    def test_dead_session_is_replaced(self):
+        """Test that an idle browser failing its health check is replaced"""
+        with self.pool.session():
+            pass
+        type(self.drivers[0]).current_url = PropertyMock(side_effect=OSError("gone"))
+
+        with self.pool.session() as driver:
+            self.assertIs(driver, self.drivers[1])
+
+    def test_failed_run_discards_session(self):
+        """Test that a browser is not reused after a run raised"""
+        with self.assertRaises(ValueError):
+            with self.pool.session():
+                raise ValueError("run failed")
+
+        self.drivers[0].quit.assert_called_once()
+        with self.pool.session() as driver:
+            self.assertIs(driver, self.drivers[1])
+
+    def test_extra_windows_are_closed_on_reset(self):
+        """Test that windows opened by a script are closed before reuse"""
+        with self.pool.session() as driver:
+            driver.window_handles = ['main', 'popup']
+
+        driver.switch_to.window.assert_any_call('popup')
+        driver.close.assert_called_once()
+        driver.switch_to.window.assert_called_with('main')
+        driver.delete_all_cookies.assert_called_once()
+
+    def test_size_bounds_concurrent_sessions(self):
+        """Test that a third concurrent run waits for a free browser"""
+        first = self.pool._acquire()
+        second = self.pool._acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(self.pool._acquire()))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertEqual(acquired, [])
+
+        self.pool._release(first)
+        waiter.join(1)
+        self.assertEqual(acquired, [first])
+        self.assertEqual(self.pool.started, 2)
+        self.pool._release(second)
+        self.pool._release(acquired[0])
+
+    def test_resize(self):
+        """Test that shrinking the pool quits the idle browsers above the new size"""
+        self.pool.warm()
+        self.pool.resize(1)
+        self.assertEqual(sum(driver.quit.call_count for driver in self.drivers), 1)
+
+        self.pool.resize(3)
+        self.pool.warm()
+        self.assertEqual(self.pool.started, 4)
+
+    def test_warm_and_close(self):
+        """Test starting browsers ahead of use and quitting them on close"""
+        self.pool.warm()
+        self.assertEqual(self.pool.started, 2)
+
+        self.pool.close()
+        for driver in self.drivers:
+            driver.quit.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            with self.pool.session():
+                pass
+
+    def test_factory_failure_frees_the_slot(self):
+        """Test that a browser failing to start does not use up the pool"""
+        pool = BrowserPool(MagicMock(side_effect=[OSError("no browser"), MagicMock()]), size=1)
+        with self.assertRaises(OSError):
+            with pool.session():
+                pass
+        with pool.session() as driver:
+            self.assertIsNotNone(driver)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
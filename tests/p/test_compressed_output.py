@@ -0,0 +1,69 @@
+import unittest
+import gzip
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+import compressed_output
+from compressed_output import CompressedOutput, resolve_formats
+
+
+class TestCompressedOutput(unittest.TestCase):
+    """Unit tests for CompressedOutput and resolve_formats"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'page.html')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_writes_output_and_gzip_copy(self):
+        """Test that both files are written in one pass"""
+        with CompressedOutput(self.path, ['gzip']) as out:
+            out.write(b"<html>")
+            out.write(b"</html>" * 100)
+
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        with gzip.open(self.path + '.gz', 'rb') as f:
+            self.assertEqual(f.read(), raw)
+        self.assertEqual(out.sizes[self.path], len(raw))
+        self.assertLess(out.sizes[self.path + '.gz'], len(raw))
+
+    def test_gzip_output_is_reproducible(self):
+        """Test that the same input compresses to the same bytes"""
+        digests = []
+        for _ in range(2):
+            with CompressedOutput(self.path, ['gzip']) as out:
+                out.write(b"same content")
+            with open(self.path + '.gz', 'rb') as f:
+                digests.append(f.read())
+        self.assertEqual(digests[0], digests[1])
+
+    def test_failed_write_leaves_no_files(self):
+        """Test that an exception discards every output"""
+        with self.assertRaises(RuntimeError):
+            with CompressedOutput(self.path, ['gzip']) as out:
+                out.write(b"partial")
+                raise RuntimeError("export failed")
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_zstd_falls_back_to_gzip(self):
+        """Test that zstd is replaced by gzip without the zstandard package"""
+        with patch.object(compressed_output, 'ZSTD_AVAILABLE', False):
+            self.assertEqual(resolve_formats(['zstd']), ['gzip'])
+            self.assertEqual(resolve_formats(['gzip', 'zstd']), ['gzip'])
+
+    def test_unknown_format_is_rejected(self):
+        """Test that an unknown format raises ValueError"""
+        with self.assertRaises(ValueError):
+            resolve_formats(['brotli'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from export_template import ExportTemplate, TemplateError, compile_template, DEFAULT
+
+
+class TestExportTemplate(unittest.TestCase):
+    """Unit tests for ExportTemplate class"""
+
+    def test_render_slots(self):
+        """Test that slots are replaced by their values"""
+        template = ExportTemplate("<title>{{title}}</title><main>{{ content }}</main>")
+        html = template.render({'title': "Home", 'content': lambda: iter(["<p>", "Hi", "</p>"])})
+        self.assertEqual(html, "<title>Home</title><main><p>Hi</p></main>")
+
+    def test_sections_render_only_with_a_value(self):
+        """Test that a section is skipped when its slot is empty"""
+        template = ExportTemplate("a{{#script}}<script>{{script}}</script>{{/script}}b")
+        self.assertEqual(template.render({'script': "run()"}), "a<script>run()</script>b")
+        self.assertEqual(template.render({'script': ""}), "ab")
+
+    def test_inverted_sections_render_only_without_a_value(self):
+        """Test that an inverted section is rendered when its slot is empty"""
+        template = ExportTemplate("{{#stylesheet}}<link href=\"{{stylesheet}}\">{{/stylesheet}}"
+                                  "{{^stylesheet}}<style>{{css}}</style>{{/stylesheet}}")
+        self.assertEqual(template.render({'stylesheet': "site.css", 'css': "p{}"}), '<link href="site.css">')
+        self.assertEqual(template.render({'stylesheet': None, 'css': "p{}"}), "<style>p{}</style>")
+
+    def test_layouts_per_section_combination(self):
+        """Test rendering adjacent slots and every combination of sections"""
+        template = ExportTemplate("{{title}}{{css}}<{{#script}}s{{/script}}{{^stylesheet}}i{{/stylesheet}}>{{content}}")
+        values = {'title': "T", 'css': "C", 'content': "X"}
+        self.assertEqual(template.render(values), "TC<i>X")
+        self.assertEqual(template.render(dict(values, script="x")), "TC<si>X")
+        self.assertEqual(template.render(dict(values, stylesheet="a.css")), "TC<>X")
+        self.assertEqual(template.render(dict(values, script="x", stylesheet="a.css")), "TC<s>X")
+        self.assertEqual(template._layout(values), (('', 'title'), ('', 'css'), ('<i>', 'content')))
+
+    def test_callable_slot_is_called_per_use(self):
+        """Test that a slot used twice renders its fragments twice"""
+        template = ExportTemplate("{{content}}|{{content}}")
+        self.assertEqual(template.render({'content': lambda: iter(["x", "y"])}), "xy|xy")
+
+    def test_encoded_rendering(self):
+        """Test that static fragments are pre-encoded and slot values are not"""
+        template = ExportTemplate("<p>é{{title}}</p>")
+        fragments = list(template.iter_render({'title': "ü"}, encoding='utf-8'))
+        self.assertEqual(fragments, ["<p>é".encode('utf-8'), "ü", b"</p>"])
+        # The encoded layout is built once and reused
+        self.assertIs(template._layout({'title': "a"}, 'utf-8'), template._layout({'title': "b"}, 'utf-8'))
+
+    def test_slots_property(self):
+        """Test listing the slots a template uses"""
+        self.assertEqual(DEFAULT.slots, {'title', 'css', 'content', 'script', 'stylesheet'})
+
+    def test_compile_template_reuses_compiled_templates(self):
+        """Test that compiling the same text twice returns the same template"""
+        self.assertIs(compile_template("{{title}}"), compile_template("{{title}}"))
+
+    def test_malformed_templates_are_rejected(self):
+        """Test the errors raised for unknown slots and unbalanced sections"""
+        with self.assertRaises(TemplateError):
+            ExportTemplate("{{author}}")
+        with self.assertRaises(TemplateError):
+            ExportTemplate("{{#script}}open")
+        with self.assertRaises(TemplateError):
+            ExportTemplate("{{#script}}{{/title}}")
+
+    def test_from_file(self):
+        """Test compiling a template stored in a file"""
+        with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False, encoding='utf-8') as f:
+            f.write("<h1>{{title}}</h1>")
+            path = f.name
+        try:
+            self.assertEqual(ExportTemplate.from_file(path).render({'title': "T"}), "<h1>T</h1>")
+        finally:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
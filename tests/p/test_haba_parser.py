@@ -1,11 +1,14 @@
 import unittest
+import io
 import sys
 import os
+import tempfile
+from unittest.mock import patch
 
 # Add src/p to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
 
-from haba_parser import HabaParser, HabaData
+from haba_parser import HabaParser, HabaData, CompactHabaData, LineIndex
 
 
 class TestHabaParser(unittest.TestCase):
@@ -190,6 +193,99 @@ class TestHabaParser(unittest.TestCase):
         self.assertEqual(len(parsed.presentation_items), len(reparsed.presentation_items))
         self.assertEqual(parsed.script.strip(), reparsed.script.strip())
 
+    def test_build_to_text_stream(self):
+        """Test that build_to writes the same text as build"""
+        haba_data = self.parser.parse("<content_layer>Hi</content_layer><script_layer>x()</script_layer>")
+        stream = io.StringIO()
+        self.parser.build_to(haba_data, stream)
+        self.assertEqual(stream.getvalue(), self.parser.build(haba_data))
+
+    def test_build_to_binary_stream(self):
+        """Test that build_to encodes when writing to a binary stream"""
+        haba_data = HabaData()
+        haba_data.content = "Ünïcode"
+        haba_data.presentation_items = [("h1", "color: 'red'")]
+        stream = io.BytesIO()
+        self.parser.build_to(haba_data, stream)
+        self.assertEqual(stream.getvalue().decode('utf-8'), self.parser.build(haba_data))
+
+    def test_build_to_file_replaces_atomically(self):
+        """Test that a failed save leaves the existing file untouched"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'doc.haba')
+            haba_data = HabaData()
+            haba_data.content = "First version"
+            self.parser.build_to_file(haba_data, path)
+
+            haba_data.content = "Second version"
+            with patch.object(HabaParser, 'iter_build', side_effect=RuntimeError("disk full")):
+                with self.assertRaises(RuntimeError):
+                    self.parser.build_to_file(haba_data, path)
+
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(self.parser.parse(f.read()).content, "First version")
+            self.assertEqual(os.listdir(temp_dir), ['doc.haba'])
+
+    def test_scan_returns_layer_spans(self):
+        """Test that scan finds every layer boundary in one pass"""
+        haba_content = "<content_layer>Hi</content_layer><presentation_layer><containers>div</containers></presentation_layer>"
+        spans = self.parser.scan(haba_content)
+
+        start, end = spans['content_layer']
+        self.assertEqual(haba_content[start:end], "Hi")
+        start, end = spans['containers']
+        self.assertEqual(haba_content[start:end], "div")
+        self.assertNotIn('styles', spans)
+        self.assertNotIn('script_layer', spans)
+
+    def test_parse_uses_first_layer_occurrence(self):
+        """Test that the first opening tag is paired with the first closing tag after it"""
+        haba_content = "</content_layer><content_layer>first</content_layer><content_layer>second</content_layer>"
+        result = self.parser.parse(haba_content)
+        self.assertEqual(result.content, "first")
+
+    def test_parse_ignores_containers_outside_presentation_layer(self):
+        """Test that containers outside the presentation layer are not used"""
+        haba_content = """
+<containers>
+    span
+</containers>
+<presentation_layer>
+    <styles>
+        color: 'red'
+    </styles>
+</presentation_layer>
+"""
+        result = self.parser.parse(haba_content)
+        self.assertEqual(result.presentation_items, [])
+
+    def test_parse_unclosed_layer(self):
+        """Test that an unclosed layer is ignored"""
+        result = self.parser.parse("<content_layer>Never closed<script_layer>x</script_layer>")
+        self.assertEqual(result.content, "")
+        self.assertEqual(result.script, "x")
+
+    def test_check_well_formed_file(self):
+        """Test that a well-formed file has no problems"""
+        haba_content = "<content_layer>a</content_layer>\n<presentation_layer><containers>h1</containers></presentation_layer>"
+        self.assertEqual(self.parser.check(haba_content), [])
+
+    def test_check_reports_malformed_tags(self):
+        """Test that the tags parse() skips are reported with their lines"""
+        haba_content = ("</content_layer><content_layer>first</content_layer>\n"
+                        "<containers>span</containers>\n"
+                        "<content_layer>second</content_layer>\n"
+                        "<script_layer>never closed")
+        expected = [
+            "line 1: </content_layer> has no opening tag",
+            "line 2: <containers> is outside the presentation layer",
+            "line 2: </containers> is outside the presentation layer",
+            "line 3: <content_layer> is repeated and ignored",
+            "line 4: <script_layer> is never closed",
+        ]
+        self.assertEqual(self.parser.check(haba_content), expected)
+        self.assertEqual(self.parser.check(haba_content.encode('utf-8')), expected)
+
 
 class TestHabaData(unittest.TestCase):
     """Unit tests for HabaData class"""
@@ -213,6 +309,155 @@ class TestHabaData(unittest.TestCase):
         self.assertEqual(data.presentation_items[0], ("div", "color: 'red'"))
         self.assertEqual(data.script, "console.log('test');")
 
+    def test_source_spans_and_line_index(self):
+        """Test that parse records layer spans, and layer_lines indexes the source on first use"""
+        raw_text = "<content_layer>\nHello\n</content_layer>\n<script_layer>\nrun()\n</script_layer>"
+        data = HabaParser().parse(raw_text)
+
+        start, end = data.source_spans['content_layer']
+        self.assertEqual(raw_text[start:end].strip(), "Hello")
+        self.assertIsNone(data.line_index)
+        self.assertIsNone(data.layer_lines('content_layer'))
+        self.assertEqual(data.layer_lines('content_layer', raw_text), (1, 3))
+        self.assertEqual(data.layer_lines('script_layer'), (4, 6))
+        self.assertIsNone(data.layer_lines('presentation_layer'))
+
+    def test_source_spans_are_compact(self):
+        """Test that parsed spans behave as a read-only mapping"""
+        data = HabaParser().parse("<script_layer>run()</script_layer>")
+        self.assertEqual(dict(data.source_spans), {'script_layer': (14, 19)})
+        self.assertNotIn('content_layer', data.source_spans)
+        with self.assertRaises(TypeError):
+            data.source_spans['content_layer'] = (0, 0)
+        # The offsets array is part of the reported size
+        self.assertGreaterEqual(sys.getsizeof(data.source_spans), 8 * 2 * 5)
+
+    def test_compact_parse_keeps_no_source_information(self):
+        """Test that parse_compact attaches neither spans nor a line index"""
+        data = HabaParser().parse_compact("<script_layer>run()</script_layer>")
+        self.assertEqual(data.source_spans, {})
+        self.assertIsNone(data.line_index)
+        self.assertIsNone(data.layer_lines('script_layer'))
+
+    def test_layer_lines_without_source(self):
+        """Test that data not parsed from text has no layer lines"""
+        data = HabaData()
+        self.assertEqual(data.source_spans, {})
+        self.assertIsNone(data.layer_lines('content_layer'))
+
+
+class TestLineIndex(unittest.TestCase):
+    """Unit tests for LineIndex class"""
+
+    def test_line_number(self):
+        """Test mapping offsets to 1-based line numbers"""
+        text = "first\nsecond\n\nfourth"
+        index = LineIndex(text)
+        self.assertEqual(index.line_count, 4)
+        self.assertEqual(index.line_number(0), 1)
+        self.assertEqual(index.line_number(5), 1)  # The newline belongs to its line
+        self.assertEqual(index.line_number(6), 2)
+        self.assertEqual(index.line_number(13), 3)
+        self.assertEqual(index.line_number(len(text)), 4)
+
+    def test_matches_counting_newlines(self):
+        """Test that lookups agree with counting newlines before each offset"""
+        text = "a\nbb\n\nccc\nd\n"
+        index = LineIndex(text)
+        for offset in range(len(text) + 1):
+            self.assertEqual(index.line_number(offset), text.count('\n', 0, offset) + 1)
+
+    def test_position_and_offset(self):
+        """Test (line, column) positions and their inverse"""
+        text = "abc\ndefg\nh"
+        index = LineIndex(text)
+        self.assertEqual(index.position(6), (2, 2))
+        self.assertEqual(index.tk_index(6), "2.2")
+        self.assertEqual(index.offset(2, 2), 6)
+        self.assertEqual(index.line_range(1, 9), (1, 3))
+
+    def test_bytes_source(self):
+        """Test building an index over a bytes buffer"""
+        index = LineIndex(b"one\ntwo\n")
+        self.assertEqual(index.line_count, 3)
+        self.assertEqual(index.line_number(4), 2)
+
+    def test_source_is_not_kept(self):
+        """Test that the index holds only its compact line table, not the source"""
+        index = LineIndex("x\ny")
+        self.assertEqual(LineIndex.__slots__, ('line_starts',))
+        self.assertEqual(index.line_starts.typecode, 'I')
+        self.assertEqual(list(index.line_starts), [0, 2])
+
+    def test_size_includes_line_table(self):
+        """Test that sys.getsizeof counts the line table"""
+        index = LineIndex("x\n" * 1000)
+        self.assertGreaterEqual(sys.getsizeof(index), 4 * index.line_count)
+
+
+class TestCompactHabaData(unittest.TestCase):
+    """Unit tests for CompactHabaData class"""
+
+    HABA_CONTENT = """
+<content_layer>
+    Compact content
+</content_layer>
+<presentation_layer>
+    <containers>
+        h1
+        p
+        p
+    </containers>
+    <styles>
+        color: 'blue'
+        color: 'blue'
+    </styles>
+</presentation_layer>
+<script_layer>
+    console.log('compact');
+</script_layer>
+"""
+
+    def setUp(self):
+        self.parser = HabaParser()
+
+    def test_parse_compact_matches_parse(self):
+        """Test that parse_compact returns the same values as parse"""
+        expected = self.parser.parse(self.HABA_CONTENT)
+        result = self.parser.parse_compact(self.HABA_CONTENT)
+
+        self.assertIsInstance(result, HabaData)
+        self.assertEqual(result.content, expected.content)
+        self.assertEqual(result.presentation_items, expected.presentation_items)
+        self.assertEqual(result.script, expected.script)
+
+    def test_compact_data_has_no_instance_dict(self):
+        """Test that CompactHabaData uses __slots__"""
+        self.assertFalse(hasattr(CompactHabaData(), '__dict__'))
+
+    def test_styles_are_shared_between_documents(self):
+        """Test that identical styles in different documents are the same object"""
+        first = self.parser.parse_compact(self.HABA_CONTENT)
+        second = self.parser.parse_compact(self.HABA_CONTENT)
+        self.assertIs(first.presentation_items[0][1], second.presentation_items[1][1])
+
+    def test_presentation_items_view_mutation(self):
+        """Test that the presentation items view supports list-style changes"""
+        data = CompactHabaData()
+        data.presentation_items.append(("div", "color: 'red'"))
+        data.presentation_items.insert(0, ("h1", ""))
+        self.assertEqual(data.presentation_items, [("h1", ""), ("div", "color: 'red'")])
+
+        del data.presentation_items[0]
+        self.assertEqual(len(data.presentation_items), 1)
+        self.assertEqual(data.presentation_items[0], ("div", "color: 'red'"))
+
+    def test_from_data_and_build(self):
+        """Test converting a HabaData and building it back to .haba text"""
+        data = CompactHabaData.from_data(self.parser.parse(self.HABA_CONTENT))
+        rebuilt = self.parser.parse(self.parser.build(data))
+        self.assertEqual(rebuilt.presentation_items, data.presentation_items)
+
 
 class TestHabaParserBDD(unittest.TestCase):
     """BDD-style tests for HabaParser"""
@@ -0,0 +1,144 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+import habac
+from haba_parser import HabaParser, HabaData
+from habac import (dumps, loads, load_cached, write_cache, cache_path_for, decode_source,
+                   SourceInfo, HabacFormatError, FORMAT_VERSION)
+
+
+SAMPLE_HABA = """
+<content_layer>
+    Pré-parsed content
+</content_layer>
+<presentation_layer>
+    <containers>
+        h1
+        p
+    </containers>
+    <styles>
+        color: 'blue'
+    </styles>
+</presentation_layer>
+<script_layer>
+    console.log('habac');
+</script_layer>
+"""
+
+
+def as_tuple(data):
+    return data.content, list(data.presentation_items), data.script
+
+
+class TestHabacFormat(unittest.TestCase):
+    """Unit tests for .habac serialization"""
+
+    def setUp(self):
+        self.data = HabaParser().parse(SAMPLE_HABA)
+        self.source = SourceInfo(123456789, 42, b"\x01" * 16)
+
+    def test_roundtrip(self):
+        """Test that dumps and loads are inverse operations"""
+        data, source = loads(dumps(self.data, self.source))
+        self.assertEqual(as_tuple(data), as_tuple(self.data))
+        self.assertEqual(source, self.source)
+
+    def test_roundtrip_empty_data(self):
+        """Test serializing an empty HabaData"""
+        data, _ = loads(dumps(HabaData(), self.source))
+        self.assertEqual(as_tuple(data), ("", [], ""))
+
+    def test_bad_magic_is_rejected(self):
+        """Test that non-.habac bytes are rejected"""
+        with self.assertRaises(HabacFormatError):
+            loads(b"NOPE" + dumps(self.data, self.source)[4:])
+
+    def test_other_version_is_rejected(self):
+        """Test that a different format version is rejected"""
+        raw = bytearray(dumps(self.data, self.source))
+        raw[4:6] = (FORMAT_VERSION + 1).to_bytes(2, 'little')
+        with self.assertRaises(HabacFormatError):
+            loads(bytes(raw))
+
+    def test_truncated_data_is_rejected(self):
+        """Test that truncated files are rejected"""
+        raw = dumps(self.data, self.source)
+        with self.assertRaises(HabacFormatError):
+            loads(raw[:-5])
+
+    def test_decode_source_normalizes_newlines(self):
+        """Test that source bytes decode like a file opened in text mode"""
+        self.assertEqual(decode_source("a\r\nb\rc\né".encode('utf-8')), "a\nb\nc\né")
+
+
+class TestHabacCache(unittest.TestCase):
+    """Unit tests for load_cached and write_cache"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'doc.haba')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_HABA)
+        self.expected = HabaParser().parse(SAMPLE_HABA)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_load_cached_writes_cache(self):
+        """Test that the first load parses the source and writes the cache"""
+        data = load_cached(self.path)
+        self.assertEqual(as_tuple(data), as_tuple(self.expected))
+        self.assertTrue(os.path.exists(cache_path_for(self.path)))
+
+    def test_fresh_cache_skips_parsing(self):
+        """Test that an up-to-date cache is loaded without parsing"""
+        write_cache(self.path)
+        with patch.object(HabaParser, 'parse') as mock_parse:
+            data = load_cached(self.path)
+        mock_parse.assert_not_called()
+        self.assertEqual(as_tuple(data), as_tuple(self.expected))
+
+    def test_touched_source_uses_digest(self):
+        """Test that a changed mtime with unchanged bytes still uses the cache"""
+        write_cache(self.path)
+        stat_result = os.stat(self.path)
+        os.utime(self.path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9))
+        with patch.object(HabaParser, 'parse') as mock_parse:
+            load_cached(self.path)
+        mock_parse.assert_not_called()
+
+    def test_modified_source_is_reparsed(self):
+        """Test that a modified source invalidates the cache"""
+        write_cache(self.path)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write("<content_layer>Changed</content_layer>")
+        stat_result = os.stat(self.path)
+        os.utime(self.path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9))
+
+        self.assertEqual(load_cached(self.path).content, "Changed")
+        self.assertEqual(load_cached(self.path, write=False).content, "Changed")
+
+    def test_corrupt_cache_is_replaced(self):
+        """Test that a corrupt cache file is ignored and rewritten"""
+        with open(cache_path_for(self.path), 'wb') as f:
+            f.write(b"garbage")
+        self.assertEqual(as_tuple(load_cached(self.path)), as_tuple(self.expected))
+        with open(cache_path_for(self.path), 'rb') as f:
+            self.assertTrue(f.read().startswith(habac.MAGIC))
+
+    def test_unwritable_cache_still_returns_data(self):
+        """Test that failing to write the cache does not fail the load"""
+        os.mkdir(cache_path_for(self.path))
+        self.assertEqual(as_tuple(load_cached(self.path)), as_tuple(self.expected))
+        with self.assertRaises(OSError):
+            write_cache(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import gzip
+import io
 import sys
 import os
 import tempfile
@@ -6,7 +8,7 @@ import tempfile
 # Add src/p to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
 
-from html_exporter import HtmlExporter
+from html_exporter import HtmlExporter, StyleCompiler, minify_css, minify_script
 from haba_parser import HabaParser, HabaData
 
 
@@ -159,6 +161,210 @@ init();
         self.assertNotIn("'16px'", html)
         self.assertNotIn("'yellow'", html)
 
+    def test_wrap_content_nesting_order(self):
+        """Test that the first container is the outermost one"""
+        haba_data = HabaData()
+        haba_data.content = "Inner text"
+        haba_data.presentation_items = [
+            ("<section>", ""),
+            ("<p id='intro'>", ""),
+            ("span", ""),
+        ]
+
+        wrapped = self.exporter._wrap_content_in_containers(haba_data)
+
+        self.assertEqual(wrapped, "\n".join([
+            '<section class="haba-container-0">',
+            '<p id=\'intro\' class="haba-container-1">',
+            '<div class="haba-container-2">',
+            "Inner text",
+            "</div>",
+            "</p>",
+            "</section>",
+        ]))
+
+    def test_wrap_content_without_containers(self):
+        """Test that content without containers is returned unchanged"""
+        haba_data = HabaData()
+        haba_data.content = "Bare content"
+        self.assertEqual(self.exporter._wrap_content_in_containers(haba_data), "Bare content")
+
+    def test_minified_export(self):
+        """Test that minified output drops indentation but keeps the content"""
+        haba_data = HabaData()
+        haba_data.content = "Line one\n  Line two"
+        haba_data.presentation_items = [("<div>", "color: 'red'; margin: '0 auto'")]
+        haba_data.script = "    function f() {\n\n        return 1;\n    }\n"
+
+        html = HtmlExporter(minify=True).export_to_html(haba_data, "Minified")
+
+        self.assertTrue(html.startswith('<!DOCTYPE html><html lang="en"><head>'))
+        self.assertIn("{color:red;margin:0 auto}", html)
+        self.assertIn("Line one\n  Line two", html)
+        self.assertIn("<script>function f() {\nreturn 1;\n}</script>", html)
+        self.assertLess(len(html), len(self.exporter.export_to_html(haba_data, "Minified")))
+
+    def test_minify_helpers(self):
+        """Test the CSS and script minifiers"""
+        self.assertEqual(minify_css("font-family: Arial, sans-serif; margin: 20px"),
+                         "font-family:Arial,sans-serif;margin:20px")
+        self.assertEqual(minify_script("  a();\n\n  b();  "), "a();\nb();")
+        # Template literal text is left alone
+        self.assertEqual(minify_script("x = `\n  keep`;  "), "x = `\n  keep`;")
+
+    def test_minify_script_keeps_string_continuations(self):
+        """Test that a string continued with a backslash keeps its indented text"""
+        script = 'var s = "abc\\\n    def";\n    f();'
+        self.assertEqual(minify_script(script), 'var s = "abc\\\n    def";\nf();')
+
+    def test_minify_script_keeps_indented_template_literals(self):
+        """Test that template literal text keeps its indentation and blank lines"""
+        script = "  x = `a\n\n    ${ f({a: 1}) }\n  b  `;\n\n    g(`${`inner\n  x`}`);  \n  // it's\n  h();"
+        self.assertEqual(minify_script(script),
+                         "x = `a\n\n    ${ f({a: 1}) }\n  b  `;\ng(`${`inner\n  x`}`);\n// it's\nh();")
+
+    def test_export_to_file_with_precompression(self):
+        """Test writing a gzip copy alongside the HTML file"""
+        haba_data = HabaData()
+        haba_data.content = "Compressed " * 200
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'page.html')
+            sizes = self.exporter.export_to_file(haba_data, path, "Compressed", precompress=['gzip'])
+
+            with open(path, 'rb') as f:
+                raw = f.read()
+            with gzip.open(path + '.gz', 'rb') as f:
+                self.assertEqual(f.read(), raw)
+            self.assertEqual(sizes[path], len(raw))
+            self.assertLess(sizes[path + '.gz'], sizes[path])
+
+    def test_custom_template(self):
+        """Test exporting through a user-provided template"""
+        template = "<html><head><style>{{css}}</style></head><body>{{content}}{{#script}}<script>{{script}}</script>{{/script}}</body></html>"
+        exporter = HtmlExporter(template=template)
+        haba_data = HabaData()
+        haba_data.content = "Templated"
+        haba_data.presentation_items = [("<div>", "color: 'red'")]
+
+        html = exporter.export_to_html(haba_data, "Ignored")
+
+        class_name = exporter.style_compiler.compile("color: 'red'")[0]
+        self.assertEqual(html, f"<html><head><style>        .{class_name} {{ color: red }}\n</style></head>"
+                               f"<body><div class=\"haba-container-0 {class_name}\">\nTemplated\n</div></body></html>")
+
+    def test_export_with_shared_stylesheet(self):
+        """Test that a page links the shared stylesheet instead of inlining styles"""
+        haba_data = HabaData()
+        haba_data.content = "Linked"
+        haba_data.presentation_items = [("<div>", "color: 'red'")]
+
+        html = self.exporter.export_to_html(haba_data, "Linked", stylesheet_href="../haba-styles.css")
+
+        self.assertIn('<link rel="stylesheet" href="../haba-styles.css">', html)
+        self.assertNotIn("<style>", html)
+        class_name = self.exporter.style_compiler.compile("color: 'red'")[0]
+        self.assertIn(f'class="haba-container-0 {class_name}"', html)
+
+    def test_shared_stylesheet_merges_rules(self):
+        """Test that the rules of several documents are written once, in a stable order"""
+        first = HabaData()
+        first.presentation_items = [("<div>", "color: 'red'"), ("<p>", "margin: '0'")]
+        second = HabaData()
+        second.presentation_items = [("<div>", "margin: '0'")]
+        compiler = self.exporter.style_compiler
+
+        css = self.exporter.shared_stylesheet(compiler.rules(first) + compiler.rules(second))
+
+        self.assertEqual(css.count("{ margin: 0 }"), 1)
+        self.assertIn(".haba-content { max-width: 800px; margin: 0 auto; }", css)
+        self.assertEqual(css, self.exporter.shared_stylesheet(compiler.rules(second) + compiler.rules(first)))
+        minified = HtmlExporter(minify=True).shared_stylesheet(compiler.rules(first))
+        self.assertIn("{color:red}", minified)
+
+    def test_export_to_text_stream(self):
+        """Test that streaming to a text stream matches export_to_html"""
+        haba_data = HabaData()
+        haba_data.content = "Streamed content\n" * 100
+        haba_data.presentation_items = [("<div>", "color: 'red'"), ("p", "")]
+        haba_data.script = "console.log('streamed');"
+        stream = io.StringIO()
+
+        self.exporter.export_to_stream(haba_data, stream, "Stream")
+
+        self.assertEqual(stream.getvalue(), self.exporter.export_to_html(haba_data, "Stream"))
+
+    def test_export_to_binary_stream_in_bounded_chunks(self):
+        """Test that a binary stream receives encoded chunks of bounded size"""
+        haba_data = HabaData()
+        haba_data.content = "Ünïcode content " * 1000
+        haba_data.script = "run();"
+        writes = []
+
+        class RecordingStream(io.BytesIO):
+            def write(self, data):
+                writes.append(len(data))
+                return super().write(data)
+
+        stream = RecordingStream()
+        self.exporter.export_to_stream(haba_data, stream, "Chunks", chunk_size=1024)
+
+        expected = self.exporter.export_to_html(haba_data, "Chunks").encode('utf-8')
+        self.assertEqual(stream.getvalue(), expected)
+        self.assertGreater(len(writes), 1)
+        # Each chunk is at most 1024 characters, so at most 2048 bytes here
+        self.assertLessEqual(max(writes), 2048)
+
+
+class TestStyleCompiler(unittest.TestCase):
+    """Unit tests for StyleCompiler class"""
+
+    def setUp(self):
+        self.calls = []
+
+        def convert(style_str):
+            self.calls.append(style_str)
+            return HtmlExporter()._convert_haba_style_to_css(style_str)
+
+        self.compiler = StyleCompiler(convert)
+
+    def test_compile_is_memoized(self):
+        """Test that a repeated style is converted only once"""
+        first = self.compiler.compile("{ color: 'red' }")
+        second = self.compiler.compile("{ color: 'red' }")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[1], "color: red")
+        self.assertTrue(first[0].startswith("haba-style-"))
+        self.assertEqual(self.calls, ["{ color: 'red' }"])
+
+    def test_equivalent_styles_share_a_class(self):
+        """Test that styles with the same CSS get the same class"""
+        first = self.compiler.compile("{ color: 'red' }")
+        second = self.compiler.compile('color: "red"')
+        self.assertEqual(first[0], second[0])
+
+    def test_empty_style_has_no_class(self):
+        """Test that styles without declarations compile to None"""
+        self.assertIsNone(self.compiler.compile(""))
+        self.assertIsNone(self.compiler.compile("{ }"))
+
+    def test_rules_are_deduplicated(self):
+        """Test that a document gets one rule per distinct style"""
+        haba_data = HabaData()
+        haba_data.presentation_items = [("p", "color: 'red'"), ("p", "color: 'blue'"), ("p", "color: 'red'"), ("p", "")]
+
+        rules = self.compiler.rules(haba_data)
+
+        self.assertEqual([css for _, css in rules], ["color: red", "color: blue"])
+
+    def test_memo_is_bounded(self):
+        """Test that the memo is reset once it reaches max_entries"""
+        compiler = StyleCompiler(HtmlExporter()._convert_haba_style_to_css, max_entries=2)
+        for i in range(5):
+            compiler.compile(f"width: '{i}px'")
+        self.assertLessEqual(len(compiler._compiled), 2)
+
 
 class TestHtmlExporterBDD(unittest.TestCase):
     """BDD-style tests for HtmlExporter"""
@@ -310,6 +516,53 @@ greet();
             if os.path.exists(file_path):
                 os.unlink(file_path)
 
+    def test_given_repeated_styles_when_exported_then_stylesheet_has_one_rule(self):
+        """
+        Given: A document where a thousand containers share two styles
+        When: The data is exported to HTML
+        Then: The stylesheet has one rule per distinct style and each container uses its class
+        """
+        # Given
+        haba_data = HabaData()
+        haba_data.content = "Repeated styles"
+        haba_data.presentation_items = [("<div>", "color: 'red'" if i % 2 else "color: 'blue'") for i in range(1000)]
+
+        # When
+        html = self.exporter.export_to_html(haba_data, "Repeated")
+
+        # Then
+        self.assertEqual(html.count("{ color: red }"), 1)
+        self.assertEqual(html.count("{ color: blue }"), 1)
+        red_class = self.exporter.style_compiler.compile("color: 'red'")[0]
+        self.assertIn(f'<div class="haba-container-1 {red_class}">', html)
+        self.assertEqual(html.count(red_class), 501)
+
+    def test_given_large_document_when_streamed_then_writes_are_bounded(self):
+        """
+        Given: A document whose content is much larger than the chunk size
+        When: It is exported to a stream
+        Then: No single write is larger than the chunk size and the output is complete
+        """
+        # Given
+        haba_data = HabaData()
+        haba_data.content = "x" * 100000
+        haba_data.presentation_items = [("<div>", "color: 'blue'")] * 50
+        writes = []
+
+        class RecordingStream(io.StringIO):
+            def write(self, data):
+                writes.append(len(data))
+                return super().write(data)
+
+        stream = RecordingStream()
+
+        # When
+        self.exporter.export_to_stream(haba_data, stream, "Large", chunk_size=4096)
+
+        # Then
+        self.assertLessEqual(max(writes), 4096)
+        self.assertEqual(stream.getvalue(), self.exporter.export_to_html(haba_data, "Large"))
+
 
 class TestHtmlExporterIntegration(unittest.TestCase):
     """Integration tests for HtmlExporter with HabaParser"""
@@ -0,0 +1,115 @@
+import unittest
+import sys
+import os
+import subprocess
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from lazy_import import lazy_import, is_available
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Dependencies that must only be imported on first use
+HEAVY_MODULES = ('selenium', 'requests', 'requests_oauthlib', 'keyring', 'numpy', 'quanta_tissu')
+
+# Standard library modules cli_runner must not import, since only parsing
+# many files in worker processes needs them
+PROCESS_POOL_MODULES = ('multiprocessing', 'concurrent.futures.process')
+
+# Generous upper bound on a module's cumulative import time, in seconds
+IMPORT_TIME_BUDGET = 1.0
+
+
+def import_times(*args):
+    """
+    Runs python -X importtime with args from the repository root and
+    returns the cumulative import time in seconds of each imported module.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+                            capture_output=True, text=True, timeout=60)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.rstrip().endswith('imported package'):
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative) / 1e6
+        except ValueError:
+            continue  # The header line
+    return result, times
+
+
+class TestImportTime(unittest.TestCase):
+    """Import-time benchmarks for the command line runner and the editor"""
+
+    def assert_light(self, times, module):
+        self.assertIn(module, times)
+        heavy = sorted(name for name in times if name.split('.')[0] in HEAVY_MODULES)
+        self.assertEqual(heavy, [], f"{module} imports heavy dependencies at load time")
+        self.assertLess(times[module], IMPORT_TIME_BUDGET,
+                        f"{module} took {times[module]:.3f}s to import")
+
+    def test_cli_runner_help(self):
+        """Test that cli_runner --help does not import any heavy dependency"""
+        result, times = import_times('-m', 'src.p.cli_runner', '--help')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("usage:", result.stdout)
+        # Run with -m, cli_runner itself is __main__ rather than an import
+        self.assert_light(times, 'src.p.script_runner')
+
+    def test_cli_runner_import(self):
+        """Test the import time of cli_runner"""
+        result, times = import_times('-c', 'import src.p.cli_runner')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assert_light(times, 'src.p.cli_runner')
+
+    def test_cli_runner_does_not_import_process_pools(self):
+        """Test that importing cli_runner does not import multiprocessing"""
+        result = subprocess.run([sys.executable, '-c', 'import sys, src.p.cli_runner; print(*sys.modules, sep="\\n")'],
+                                cwd=ROOT, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        modules = set(result.stdout.splitlines())
+        for module in PROCESS_POOL_MODULES:
+            self.assertNotIn(module, modules)
+
+    @unittest.skipUnless(is_available('tkinter'), "tkinter is not available")
+    def test_editor_import(self):
+        """Test that the editor defers selenium, OAuth and model imports"""
+        result, times = import_times('-c', 'import src.p.editor')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assert_light(times, 'src.p.editor')
+
+
+class TestLazyImport(unittest.TestCase):
+    """Unit tests for lazy_import"""
+
+    def test_module_is_imported_on_first_use(self):
+        """Test that a lazy module forwards attribute access once imported"""
+        sys.modules.pop('colorsys', None)
+        colorsys = lazy_import('colorsys')
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn('colorsys', sys.modules)
+
+    def test_attribute_is_callable(self):
+        """Test that a lazy attribute forwards calls"""
+        Fraction = lazy_import('fractions', 'Fraction')
+        self.assertEqual(Fraction(1, 2) + Fraction(1, 2), 1)
+
+    def test_missing_module_fails_on_first_use(self):
+        """Test that a missing module raises ImportError when used, not when declared"""
+        missing = lazy_import('no_such_module_for_lazy_import')
+        self.assertFalse(is_available('no_such_module_for_lazy_import'))
+        with self.assertRaises(ImportError):
+            missing.anything
+
+    def test_missing_attribute_raises_import_error(self):
+        """Test that a missing attribute raises ImportError, as from module import name would"""
+        missing = lazy_import('colorsys', 'no_such_function')
+        with self.assertRaises(ImportError):
+            missing()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import random
+import sys
+import os
+import time
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from haba_parser import HabaParser
+from incremental_parser import IncrementalHabaParser, find_edit
+
+
+SAMPLE_HABA = """
+<content_layer>
+    Hello World
+</content_layer>
+<presentation_layer>
+    <containers>
+        h1
+        p
+    </containers>
+    <styles>
+        color: 'blue'
+        color: 'red'
+    </styles>
+</presentation_layer>
+<script_layer>
+    console.log('hi');
+</script_layer>
+"""
+
+
+def as_tuple(data):
+    return data.content, data.presentation_items, data.script
+
+
+class TestFindEdit(unittest.TestCase):
+    """Unit tests for find_edit"""
+
+    def test_equal_texts(self):
+        """Test that equal texts have no edit"""
+        self.assertIsNone(find_edit("abc", "abc"))
+
+    def test_insertion(self):
+        """Test locating an insertion"""
+        self.assertEqual(find_edit("abcd", "abXcd"), (2, 0, "X"))
+
+    def test_deletion(self):
+        """Test locating a deletion"""
+        self.assertEqual(find_edit("abcd", "ad"), (1, 2, ""))
+
+    def test_replacement_in_large_text(self):
+        """Test locating a replacement beyond the first comparison block"""
+        old = "a" * 10000 + "b" + "c" * 10000
+        new = "a" * 10000 + "XY" + "c" * 10000
+        self.assertEqual(find_edit(old, new), (10000, 1, "XY"))
+
+
+class TestIncrementalHabaParser(unittest.TestCase):
+    """Unit tests for IncrementalHabaParser class"""
+
+    def setUp(self):
+        self.parser = HabaParser()
+        self.incremental = IncrementalHabaParser(self.parser)
+        self.incremental.parse(SAMPLE_HABA)
+
+    def test_edit_in_content_layer_is_partial(self):
+        """Test that typing inside the content layer only re-parses that layer"""
+        offset = SAMPLE_HABA.index("World") + len("World")
+        result = self.incremental.apply_edit(offset, 0, "!")
+
+        self.assertEqual(result.content, "Hello World!")
+        self.assertEqual(self.incremental.full_parses, 1)
+        self.assertEqual(self.incremental.partial_parses, 1)
+
+    def test_edit_in_styles_updates_presentation_items(self):
+        """Test that editing a style line updates the paired presentation item"""
+        offset = SAMPLE_HABA.index("'red'") + 1
+        result = self.incremental.apply_edit(offset, 3, "green")
+
+        self.assertEqual(result.presentation_items, [("h1", "color: 'blue'"), ("p", "color: 'green'")])
+        self.assertEqual(self.incremental.full_parses, 1)
+
+    def test_edit_touching_tag_triggers_full_parse(self):
+        """Test that breaking a layer tag falls back to a full parse"""
+        offset = SAMPLE_HABA.index("<script_layer>") + 1
+        result = self.incremental.apply_edit(offset, 1, "")
+
+        self.assertEqual(result.script, "")
+        self.assertEqual(self.incremental.full_parses, 2)
+
+    def test_update_with_full_text(self):
+        """Test that update locates the edit from the full new text"""
+        new_text = SAMPLE_HABA.replace("console.log('hi');", "console.log('bye');")
+        result = self.incremental.update(new_text)
+
+        self.assertEqual(result.script, "console.log('bye');")
+        self.assertEqual(self.incremental.partial_parses, 1)
+
+    def test_edit_outside_document_raises(self):
+        """Test that an out-of-range edit is rejected"""
+        with self.assertRaises(ValueError):
+            self.incremental.apply_edit(len(SAMPLE_HABA), 1, "")
+
+    def test_returned_data_is_independent(self):
+        """Test that mutating a result does not affect later results"""
+        result = self.incremental.update(SAMPLE_HABA)
+        result.presentation_items.append(("div", ""))
+        result.script = "changed"
+
+        again = self.incremental.update(SAMPLE_HABA)
+        self.assertEqual(as_tuple(again), as_tuple(self.parser.parse(SAMPLE_HABA)))
+
+    def test_edit_does_not_scan_the_whole_document(self):
+        """Test that a keystroke in a document of many lines costs less than a full parse"""
+        text = SAMPLE_HABA.replace("Hello World", "x\n" * 1000000)
+        incremental = IncrementalHabaParser(self.parser)
+        incremental.parse(text)
+        offset = text.index("console.log")
+
+        def best_time(func, count):
+            best = float('inf')
+            for _ in range(3):
+                start = time.perf_counter()
+                for i in range(count):
+                    func(i)
+                best = min(best, (time.perf_counter() - start) / count)
+            return best
+
+        full = best_time(lambda i: self.parser.parse(text), 3)
+        partial = best_time(lambda i: incremental.apply_edit(offset, 0, "x"), 10)
+
+        self.assertEqual(incremental.full_parses, 1)
+        # Work per line of the document, such as building a line index, would
+        # make an edit cost many full parses
+        self.assertLess(partial, full, f"edit took {partial * 1000:.2f} ms, full parse {full * 1000:.2f} ms")
+
+
+class TestIncrementalHabaParserBDD(unittest.TestCase):
+    """BDD-style tests for IncrementalHabaParser"""
+
+    def test_given_random_edits_when_applied_then_matches_full_parse(self):
+        """
+        Given: A document receiving a sequence of random edits, including tag edits
+        When: Each edit is applied incrementally
+        Then: The result always equals a full parse of the edited text
+        """
+        # Given
+        rng = random.Random(42)
+        atoms = ["<content_layer>", "</content_layer>", "<presentation_layer>", "</presentation_layer>",
+                 "<containers>", "</containers>", "<styles>", "</styles>", "<script_layer>",
+                 "</script_layer>", "a", "\n", " ", "<", ">", "/", "layer"]
+        parser = HabaParser()
+        text = SAMPLE_HABA
+        incremental = IncrementalHabaParser(parser)
+        incremental.parse(text)
+
+        for _ in range(500):
+            offset = rng.randint(0, len(text))
+            removed = rng.randint(0, min(4, len(text) - offset))
+            inserted = "".join(rng.choice(atoms + ["x"] * 10) for _ in range(rng.randint(0, 2)))
+
+            # When
+            result = incremental.apply_edit(offset, removed, inserted)
+            text = text[:offset] + inserted + text[offset + removed:]
+
+            # Then
+            self.assertEqual(as_tuple(result), as_tuple(parser.parse(text)))
+            self.assertEqual(incremental.spans, parser.scan(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from haba_parser import HabaParser, HabaData
+from mapped_data import MappedHabaData, open_mapped
+
+
+SAMPLE_HABA = """
+<content_layer>
+    Hello Wörld
+</content_layer>
+<presentation_layer>
+    <containers>
+        h1
+        p
+    </containers>
+    <styles>
+        color: 'blue'
+    </styles>
+</presentation_layer>
+<script_layer>
+    console.log('mapped');
+</script_layer>
+"""
+
+
+class TestMappedHabaData(unittest.TestCase):
+    """Unit tests for MappedHabaData and open_mapped"""
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile(suffix='.haba', delete=False) as f:
+            f.write(SAMPLE_HABA.encode('utf-8'))
+            self.path = f.name
+        self.expected = HabaParser().parse(SAMPLE_HABA)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_open_mapped_matches_parser(self):
+        """Test that mapped layers decode to the same values as HabaParser.parse"""
+        with open_mapped(self.path) as data:
+            self.assertIsInstance(data, HabaData)
+            self.assertEqual(data.content, self.expected.content)
+            self.assertEqual(data.presentation_items, self.expected.presentation_items)
+            self.assertEqual(data.script, self.expected.script)
+
+    def test_layers_are_decoded_lazily(self):
+        """Test that only the accessed layer is decoded"""
+        with open_mapped(self.path) as data:
+            self.assertFalse(data.is_decoded('content_layer'))
+            data.content
+            self.assertTrue(data.is_decoded('content_layer'))
+            self.assertFalse(data.is_decoded('script_layer'))
+            self.assertFalse(data.is_decoded('presentation_layer'))
+
+    def test_spans_are_byte_offsets(self):
+        """Test that spans index the encoded file"""
+        with open_mapped(self.path) as data:
+            start, end = data.spans['content_layer']
+            self.assertEqual(SAMPLE_HABA.encode('utf-8')[start:end].decode('utf-8').strip(), "Hello Wörld")
+
+    def test_assignment_overrides_mapped_layer(self):
+        """Test that layers can be reassigned like plain HabaData attributes"""
+        with open_mapped(self.path) as data:
+            data.script = "console.log('edited');"
+            self.assertEqual(data.script, "console.log('edited');")
+            self.assertEqual(HabaParser().build(data).count("edited"), 1)
+
+    def test_decoded_layers_survive_close(self):
+        """Test that layers decoded before closing remain available"""
+        data = open_mapped(self.path)
+        content = data.content
+        data.close()
+        self.assertEqual(data.content, content)
+
+    def test_open_empty_file(self):
+        """Test mapping an empty file"""
+        with tempfile.NamedTemporaryFile(suffix='.haba', delete=False) as f:
+            empty_path = f.name
+        try:
+            with open_mapped(empty_path) as data:
+                self.assertEqual(data.content, "")
+                self.assertEqual(data.presentation_items, [])
+                self.assertEqual(data.script, "")
+        finally:
+            os.remove(empty_path)
+
+    def test_mapped_data_from_bytes(self):
+        """Test building MappedHabaData over an in-memory buffer"""
+        buffer = SAMPLE_HABA.encode('utf-8')
+        data = MappedHabaData(buffer, HabaParser().scan(buffer))
+        self.assertEqual(data.content, self.expected.content)
+
+
+if __name__ == '__main__':
+    unittest.main()
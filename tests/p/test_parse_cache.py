@@ -0,0 +1,147 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from haba_parser import HabaParser, HabaData
+from parse_cache import ParseCache, CachingHabaParser, text_digest
+
+
+SAMPLE_HABA = """
+<content_layer>
+    Cached content
+</content_layer>
+<presentation_layer>
+    <containers>
+        h1
+    </containers>
+    <styles>
+        color: 'blue'
+    </styles>
+</presentation_layer>
+<script_layer>
+    console.log('cached');
+</script_layer>
+"""
+
+
+class TestParseCache(unittest.TestCase):
+    """Unit tests for ParseCache class"""
+
+    def make_data(self, content):
+        data = HabaData()
+        data.content = content
+        return data
+
+    def test_get_missing_key_counts_miss(self):
+        """Test that a lookup of an unknown key is a miss"""
+        cache = ParseCache()
+        self.assertIsNone(cache.get(b"missing"))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_put_then_get_counts_hit(self):
+        """Test that a stored document is returned on lookup"""
+        cache = ParseCache()
+        cache.put(b"key", self.make_data("hello"))
+        self.assertEqual(cache.get(b"key").content, "hello")
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_entry_limit_evicts_least_recently_used(self):
+        """Test LRU eviction by entry count"""
+        cache = ParseCache(max_entries=2)
+        cache.put(b"a", self.make_data("a"))
+        cache.put(b"b", self.make_data("b"))
+        cache.get(b"a")
+        cache.put(b"c", self.make_data("c"))
+
+        self.assertIsNone(cache.get(b"b"))
+        self.assertIsNotNone(cache.get(b"a"))
+        self.assertIsNotNone(cache.get(b"c"))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_byte_budget_evicts_entries(self):
+        """Test LRU eviction by byte budget"""
+        cache = ParseCache(max_entries=100, max_bytes=3000)
+        for i in range(5):
+            cache.put(bytes([i]), self.make_data("x" * 1000))
+        self.assertLessEqual(cache.stats()['bytes'], 3000)
+        self.assertLess(len(cache), 5)
+        self.assertIsNotNone(cache.get(bytes([4])))
+
+    def test_spans_dict_is_copied(self):
+        """Test that a mutable source_spans dict is not shared with callers"""
+        cache = ParseCache()
+        data = self.make_data("x")
+        data.source_spans = {'content_layer': (1, 2)}
+        cache.put(b"a", data)
+        cache.get(b"a").source_spans['content_layer'] = (0, 0)
+        self.assertEqual(cache.get(b"a").source_spans, {'content_layer': (1, 2)})
+
+    def test_oversized_document_is_not_cached(self):
+        """Test that a document larger than the byte budget is skipped"""
+        cache = ParseCache(max_bytes=100)
+        cache.put(b"big", self.make_data("x" * 1000))
+        self.assertEqual(len(cache), 0)
+
+
+class TestCachingHabaParser(unittest.TestCase):
+    """Unit tests for CachingHabaParser class"""
+
+    def setUp(self):
+        self.parser = CachingHabaParser()
+
+    def test_parse_matches_uncached_parser(self):
+        """Test that cached parses equal HabaParser.parse"""
+        expected = HabaParser().parse(SAMPLE_HABA)
+        for _ in range(2):
+            result = self.parser.parse(SAMPLE_HABA)
+            self.assertEqual(result.content, expected.content)
+            self.assertEqual(result.presentation_items, expected.presentation_items)
+            self.assertEqual(result.script, expected.script)
+
+    def test_unchanged_text_is_parsed_once(self):
+        """Test that repeated parses of the same text only scan once"""
+        with patch.object(HabaParser, 'scan', wraps=self.parser.scan) as mock_scan:
+            self.parser.parse(SAMPLE_HABA)
+            self.parser.parse(str(SAMPLE_HABA))
+            self.assertEqual(mock_scan.call_count, 1)
+        self.assertEqual(self.parser.cache.stats()['hits'], 1)
+
+    def test_results_can_be_modified_safely(self):
+        """Test that modifying a returned HabaData does not change the cache"""
+        first = self.parser.parse(SAMPLE_HABA)
+        first.script = "changed"
+        first.presentation_items.append(("p", ""))
+
+        second = self.parser.parse(SAMPLE_HABA)
+        self.assertEqual(second.script, "console.log('cached');")
+        self.assertEqual(len(second.presentation_items), 1)
+
+    def test_byte_budget_counts_line_index(self):
+        """Test that a document's line table counts against the byte budget"""
+        raw_text = "<content_layer>\n" + "x\n" * 10000 + "</content_layer>"
+        data = HabaParser().parse(raw_text)
+        data.layer_lines('content_layer', raw_text)
+        line_table_bytes = 4 * data.line_index.line_count
+
+        # Room for the content of both documents, but not for their line tables
+        cache = ParseCache(max_bytes=2 * sys.getsizeof(data.content) + line_table_bytes)
+        cache.put(b"first", data)
+        self.assertGreaterEqual(cache.stats()['bytes'], sys.getsizeof(data.content) + line_table_bytes)
+        cache.put(b"second", data)
+
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertIsNone(cache.get(b"first"))
+        self.assertIsNotNone(cache.get(b"second"))
+
+    def test_text_digest_distinguishes_texts(self):
+        """Test that different texts have different keys"""
+        self.assertEqual(text_digest(SAMPLE_HABA), text_digest(SAMPLE_HABA))
+        self.assertNotEqual(text_digest(SAMPLE_HABA), text_digest(SAMPLE_HABA + " "))
+
+
+if __name__ == '__main__':
+    unittest.main()
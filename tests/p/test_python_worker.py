@@ -0,0 +1,98 @@
+import unittest
+import re
+import sys
+import os
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from python_worker import PythonWorkerPool, resource
+from script_runner import run_python_script
+
+
+class TestPythonWorkerPool(unittest.TestCase):
+    """Unit tests for PythonWorkerPool and run_python_script on warm workers"""
+
+    def setUp(self):
+        self.pool = PythonWorkerPool(executable=sys.executable, max_runs=5)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def run_script(self, script, **kwargs):
+        return run_python_script(script, worker_pool=self.pool, **kwargs)
+
+    def test_runs_reuse_one_worker(self):
+        """Test that consecutive scripts run in the same warm interpreter"""
+        self.assertEqual(self.run_script("print('one')"), (['one'], []))
+        self.assertEqual(self.run_script("import sys\nprint('two', file=sys.stderr)"),
+                         (['two'], [{'type': 'error', 'description': 'two'}]))
+        self.assertEqual(self.pool.started, 1)
+
+    def test_each_run_gets_a_fresh_namespace(self):
+        """Test that names defined by one script are not visible to the next"""
+        self.run_script("leftover = 1")
+        logs, tasks = self.run_script("print('leftover' in globals(), __name__)")
+        self.assertEqual(logs, ['False __main__'])
+
+    def test_errors_are_reported_like_a_fresh_interpreter(self):
+        """Test that tracebacks show only the script's frames"""
+        script = "def f():\n    raise KeyError('k')\nf()"
+        logs, tasks = self.run_script(script)
+        fresh_logs, fresh_tasks = run_python_script(script)
+        self.assertEqual([re.sub(r'File ".*"', 'File', log) for log in logs],
+                         [re.sub(r'File ".*"', 'File', log) for log in fresh_logs])
+        self.assertTrue(logs[1].endswith('.py", line 3, in <module>'))
+        self.assertEqual((logs[2], logs[4]), ('    f()', "    raise KeyError('k')"))
+        self.assertEqual(tasks, [{'type': 'error', 'description': "KeyError: 'k'"}])
+
+        logs, tasks = self.run_script("import sys\nsys.exit('bye')")
+        self.assertEqual(logs, ['bye'])
+
+    def test_script_file_is_set(self):
+        """Test that a script sees its file and directory, as with python script.py"""
+        logs, tasks = self.run_script("import os, sys\nprint(os.path.dirname(__file__) == sys.path[0], __file__.endswith('.py'))")
+        self.assertEqual(logs, ['True True'])
+
+    def test_streamed_run(self):
+        """Test that output lines reach on_log as they are printed"""
+        streamed = []
+        result = self.run_script("print('a')\nprint('b')", on_log=streamed.append)
+        self.assertEqual(result, ([], []))
+        self.assertEqual(streamed, ['a', 'b'])
+
+    def test_timed_out_worker_is_replaced(self):
+        """Test that a script over its timeout is stopped and its worker discarded"""
+        logs, tasks = self.run_script("import time\ntime.sleep(30)", timeout=0.5)
+        self.assertEqual(logs, ["Script execution timed out after 0.5 seconds."])
+        self.assertEqual(self.run_script("print('next')"), (['next'], []))
+        self.assertEqual(self.pool.started, 2)
+
+    def test_exited_worker_is_replaced(self):
+        """Test that a script ending its interpreter fails and does not break later runs"""
+        logs, tasks = self.run_script("import os\nos._exit(3)")
+        self.assertEqual(tasks[0]['type'], 'error')
+        self.assertEqual(self.run_script("print('next')"), (['next'], []))
+
+    def test_worker_is_recycled_after_max_runs(self):
+        """Test that a worker is replaced after max_runs runs"""
+        for _ in range(6):
+            self.run_script("pass")
+        self.assertEqual(self.pool.started, 2)
+        self.assertEqual(self.pool.recycled, 1)
+
+    @unittest.skipIf(resource is None, "resource limits are not available")
+    def test_cpu_time_limit(self):
+        """Test that a run over its CPU time limit is interrupted inside the script"""
+        pool = PythonWorkerPool(executable=sys.executable, cpu_seconds=1)
+        try:
+            logs, tasks = run_python_script("while True:\n    pass", worker_pool=pool)
+            self.assertEqual(tasks, [{'type': 'error', 'description': 'CpuTimeExceeded: CPU time limit exceeded'}])
+            self.assertEqual(run_python_script("print('ok')", worker_pool=pool), (['ok'], []))
+            self.assertEqual(pool.started, 1)
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -58,6 +58,17 @@ class TestQuantaDemoWindow(unittest.TestCase):
         self.assertIsNone(self.app.model)
         self.assertIsNone(self.app.tokenizer)
 
+    @patch('p.editor.QUANTA_TISSU_AVAILABLE', True)
+    @patch('p.editor.Tokenizer', create=True, side_effect=ModuleNotFoundError("No module named 'quanta_tissu.tisslm'"))
+    @patch('builtins.open', new_callable=mock_open, read_data='{"embedding_dim": 128}')
+    @patch('os.path.join', return_value='/fake/path/to/config')
+    def test_initialize_model_missing_submodule(self, mock_join, mock_file, mock_tokenizer):
+        """Test model initialization when quanta_tissu is installed without the model modules."""
+        self.app.initialize_model()
+        self.app.log_to_console.assert_any_call("Error: `quanta_tissu` model could not be imported (No module named 'quanta_tissu.tisslm'). Demo will use stubbed responses.")
+        self.assertIsNone(self.app.model)
+        self.assertIsNone(self.app.tokenizer)
+
     def test_process_next_task_found(self):
         """Test processing when a TODO task is found."""
         self.app.prompt_text = MagicMock()
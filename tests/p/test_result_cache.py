@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from result_cache import ResultCache, result_key
+
+
+class TestResultCache(unittest.TestCase):
+    """Unit tests for ResultCache class"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, 'results')
+        self.cache = ResultCache(self.directory)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_put_then_get(self):
+        """Test that a stored result is returned and counted as a hit"""
+        tasks = [{'type': 'todo', 'description': 'TODO: ünïcode', 'details': ''}]
+        self.assertIsNone(self.cache.get(result_key('js', "page")))
+        self.cache.put(result_key('js', "page"), ['log'], tasks)
+
+        self.assertEqual(self.cache.get(result_key('js', "page")), (['log'], tasks))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_results_persist_across_instances(self):
+        """Test that a new cache on the same directory finds earlier results"""
+        self.cache.put(result_key('python', "print(1)"), ['1'], [])
+        cache = ResultCache(self.directory)
+        self.assertEqual(cache.get(result_key('python', "print(1)")), (['1'], []))
+        self.assertEqual(len(cache), 1)
+        self.assertGreater(cache.current_bytes, 0)
+
+    def test_keys_depend_on_the_runner_kind(self):
+        """Test that the same text run as JavaScript and as Python has different keys"""
+        self.assertNotEqual(result_key('js', "x"), result_key('python', "x"))
+        self.assertEqual(result_key('js', "x"), result_key('js', "x"))
+
+    def test_least_recently_used_results_are_evicted(self):
+        """Test that the byte budget evicts the least recently used result"""
+        self.cache.put('a', ['x' * 40], [])
+        size = self.cache.current_bytes
+        self.cache.max_bytes = size * 2
+        self.cache.put('b', ['y' * 40], [])
+        self.cache.get('a')
+        self.cache.put('c', ['z' * 40], [])
+
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'b.json')))
+
+    def test_corrupt_result_is_a_miss(self):
+        """Test that an unreadable result file is ignored"""
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, 'bad.json'), 'w') as f:
+            f.write("{not json")
+        self.assertIsNone(self.cache.get('bad'))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_clear(self):
+        """Test removing every result"""
+        self.cache.put('a', [], [])
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
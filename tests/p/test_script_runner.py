@@ -1,13 +1,17 @@
 import unittest
+import base64
+import io
 import sys
 import os
+import tempfile
 from unittest.mock import patch, MagicMock
 
 # Add src/p to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
 
-from script_runner import ScriptRunner, run_python_script
+from script_runner import ScriptRunner, run_python_script, page_url
 from haba_parser import HabaParser, HabaData
+from result_cache import ResultCache
 
 
 class TestScriptRunner(unittest.TestCase):
@@ -65,6 +69,9 @@ console.log('Test log message');
         
         self.assertEqual(logs, ['Test log message'])
         self.assertEqual(len(tasks), 0)
+        # The browser is kept for the next run and quit on close
+        mock_driver.quit.assert_not_called()
+        self.script_runner.close()
         mock_driver.quit.assert_called_once()
         
     @patch('script_runner.webdriver')
@@ -119,6 +126,202 @@ console.log('FIXME: Handle edge case');
         self.assertEqual(tasks[1]['type'], 'todo')
         self.assertEqual(tasks[1]['description'], 'FIXME: Handle edge case')
         
+    @patch('script_runner.webdriver')
+    def test_repeated_runs_reuse_the_browser(self, mock_webdriver):
+        """Test that only the first run starts a browser"""
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        mock_driver.execute_script.side_effect = [['first'], None, ['second'], None]
+        haba_content = "<script_layer>console.log('run');</script_layer>"
+
+        first_logs, _ = self.script_runner.run_script(haba_content)
+        second_logs, _ = self.script_runner.run_script(haba_content)
+
+        self.assertEqual((first_logs, second_logs), (['first'], ['second']))
+        mock_webdriver.Firefox.assert_called_once()
+        self.script_runner.close()
+        mock_driver.quit.assert_called_once()
+
+    @patch('script_runner.tempfile.NamedTemporaryFile')
+    @patch('script_runner.webdriver')
+    def test_page_is_loaded_from_memory(self, mock_webdriver, mock_tempfile):
+        """Test that the page is sent as a data: URL without touching the disk"""
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        mock_driver.execute_script.side_effect = [['ünïcode'], None]
+
+        logs, tasks = self.script_runner.run_script("<script_layer>console.log('ünïcode');</script_layer>")
+
+        self.assertEqual(logs, ['ünïcode'])
+        mock_tempfile.assert_not_called()
+        url = mock_driver.get.call_args_list[0].args[0]
+        self.assertTrue(url.startswith("data:text/html;charset=utf-8;base64,"))
+        self.assertEqual(url, page_url(self.script_runner._build_page(
+            self.parser.parse("<script_layer>console.log('ünïcode');</script_layer>"))))
+
+    def test_page_url_round_trip(self):
+        """Test that a data: URL decodes back to the page"""
+        url = page_url("<p>é</p>")
+        self.assertEqual(base64.b64decode(url.split(',', 1)[1]).decode('utf-8'), "<p>é</p>")
+
+    @patch('script_runner.webdriver')
+    def test_run_many_runs_every_document_concurrently(self, mock_webdriver):
+        """Test that run_many yields one result per document from several browsers"""
+        def start_browser(*args, **kwargs):
+            driver = MagicMock()
+            # Each page logs the page it was loaded from
+            driver.execute_script.side_effect = lambda script: (
+                [driver.get.call_args.args[0]] if 'console_logs' in script else None)
+            return driver
+        mock_webdriver.Firefox.side_effect = start_browser
+        documents = [f"<script_layer>console.log({i});</script_layer>" for i in range(10)]
+
+        results = list(self.script_runner.run_many(documents, max_workers=3))
+
+        self.assertEqual(sorted(document for document, _, _ in results), sorted(documents))
+        for document, logs, tasks in results:
+            page = self.script_runner._build_page(self.parser.parse(document))
+            self.assertEqual(logs, [page_url(page)])
+        self.assertLessEqual(mock_webdriver.Firefox.call_count, 3)
+        # The pool grew for the batch only
+        self.assertEqual(self.script_runner.pool.size, 1)
+        self.script_runner.close()
+
+    @patch('script_runner.webdriver')
+    def test_run_many_reads_items(self, mock_webdriver):
+        """Test that run_many reads each item with read and reports unreadable ones"""
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        mock_driver.execute_script.side_effect = lambda script: ['ran'] if 'console_logs' in script else None
+        contents = {'a.haba': "<script_layer>console.log(1);</script_layer>"}
+
+        def read(path):
+            if path not in contents:
+                raise FileNotFoundError(f"No such file: '{path}'")
+            return contents[path]
+
+        results = dict((path, (logs, tasks)) for path, logs, tasks in
+                       self.script_runner.run_many(['a.haba', 'missing.haba'], max_workers=2, read=read))
+
+        self.assertEqual(results['a.haba'], (['ran'], []))
+        logs, tasks = results['missing.haba']
+        self.assertEqual(tasks[0]['type'], 'error')
+        self.assertIn("Failed to read document: No such file: 'missing.haba'", tasks[0]['description'])
+        self.script_runner.close()
+
+    @patch('script_runner.webdriver')
+    def test_run_script_timeout(self, mock_webdriver):
+        """Test that a script exceeding its timeout gives an error task and a new browser"""
+        from selenium.common.exceptions import TimeoutException
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        mock_driver.get.side_effect = TimeoutException("page load")
+
+        logs, tasks = self.script_runner.run_script("<script_layer>while (true) {}</script_layer>", timeout=2)
+
+        mock_driver.set_page_load_timeout.assert_called_once_with(2)
+        self.assertIn("timed out after 2 seconds", logs[0])
+        self.assertEqual(tasks[0]['type'], 'error')
+        mock_driver.quit.assert_called_once()
+
+    @patch('script_runner.webdriver')
+    def test_run_script_timeout_without_timeout(self, mock_webdriver):
+        """Test that the timeout message gives the page load timeout in effect"""
+        from selenium.common.exceptions import TimeoutException
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        mock_driver.get.side_effect = TimeoutException("page load")
+
+        logs, tasks = self.script_runner.run_script("<script_layer>while (true) {}</script_layer>")
+
+        self.assertEqual(logs, ["Script execution timed out after 300 seconds."])
+
+    @patch('script_runner.webdriver')
+    def test_run_script_result_cache(self, mock_webdriver):
+        """Test that an unchanged script is answered from the result cache"""
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        mock_driver.execute_script.side_effect = [['TODO: cache'], None]
+        haba_content = "<script_layer>console.log('TODO: cache');</script_layer>"
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir)
+            runner = ScriptRunner(result_cache=cache)
+            first = runner.run_script(haba_content)
+            second = ScriptRunner(result_cache=ResultCache(temp_dir)).run_script(haba_content)
+
+        self.assertEqual(first, second)
+        self.assertEqual(second[1][0]['description'], 'TODO: cache')
+        self.assertEqual(mock_driver.execute_script.call_count, 2)
+        runner.close()
+
+    @patch('script_runner.webdriver')
+    def test_failed_runs_are_not_cached(self, mock_webdriver):
+        """Test that a run without a browser is not stored"""
+        mock_webdriver.Firefox.side_effect = Exception("WebDriver error")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir)
+            ScriptRunner(result_cache=cache).run_script("<script_layer>run();</script_layer>")
+            self.assertEqual(len(cache), 0)
+
+    @patch('script_runner.webdriver')
+    def test_browser_failure_gives_error_task(self, mock_webdriver):
+        """Test that a script whose browser failed to start is reported as an error"""
+        mock_webdriver.Firefox.side_effect = Exception("geckodriver not found")
+
+        logs, tasks = self.script_runner.run_script("<script_layer>throw new Error('x');</script_layer>")
+
+        self.assertEqual(logs, ["Failed to run script: geckodriver not found"])
+        self.assertEqual(tasks, [{'type': 'error', 'description': "Failed to run script: geckodriver not found",
+                                  'details': ''}])
+
+    @patch('script_runner.LOG_POLL_INTERVAL', 0.01)
+    @patch('script_runner.LOG_IDLE_TIME', 0.2)
+    @patch('script_runner.webdriver')
+    def test_run_script_streams_logs(self, mock_webdriver):
+        """Test that streamed logs are passed to the callback as they arrive"""
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+        batches = [['loaded'], [], ['TODO: later'], []]
+
+        def execute_script(script):
+            if 'splice' in script:
+                return batches.pop(0) if batches else []
+            return None  # js_error
+        mock_driver.execute_script.side_effect = execute_script
+        streamed = []
+
+        logs, tasks = self.script_runner.run_script("<script_layer>setTimeout(f, 10);</script_layer>",
+                                                    on_log=streamed.append)
+
+        self.assertEqual(streamed, ['loaded', 'TODO: later'])
+        self.assertEqual(logs, [])
+        self.assertEqual(tasks, [{'type': 'todo', 'description': 'TODO: later', 'details': ''}])
+
+    @patch('script_runner.LOG_POLL_INTERVAL', 0.01)
+    @patch('script_runner.webdriver')
+    def test_streamed_script_still_logging_times_out(self, mock_webdriver):
+        """Test that a streamed script still logging at its timeout gives an error task and a new browser"""
+        mock_driver = MagicMock()
+        mock_webdriver.Firefox.return_value = mock_driver
+
+        def execute_script(script):
+            if 'splice' in script:
+                return ['TODO: tick']
+            return None
+        mock_driver.execute_script.side_effect = execute_script
+        streamed = []
+
+        logs, tasks = self.script_runner.run_script("<script_layer>setInterval(f, 1);</script_layer>",
+                                                    timeout=0.1, on_log=streamed.append)
+
+        self.assertEqual(logs, [])
+        self.assertEqual(streamed[-1], "Script execution timed out after 0.1 seconds.")
+        self.assertEqual(tasks[0], {'type': 'error', 'description': "Script execution timed out.", 'details': ''})
+        self.assertEqual(tasks[1], {'type': 'todo', 'description': 'TODO: tick', 'details': ''})
+        mock_driver.quit.assert_called_once()
+
     @patch('script_runner.webdriver')
     def test_run_script_webdriver_exception(self, mock_webdriver):
         """Test handling of webdriver exceptions"""
@@ -181,6 +384,42 @@ class TestRunPythonScript(unittest.TestCase):
         self.assertEqual(tasks[0]['type'], 'error')
         self.assertIn("NameError", tasks[0]['description'])
         
+    @patch('script_runner.subprocess.run')
+    def test_run_python_script_result_cache(self, mock_run):
+        """Test that a completed Python run is cached and a timed-out one is not"""
+        mock_result = MagicMock()
+        mock_result.stdout = "cached"
+        mock_result.stderr = ""
+        mock_run.return_value = mock_result
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir)
+            self.assertEqual(run_python_script("print('cached')", cache), (["cached"], []))
+            self.assertEqual(run_python_script("print('cached')", cache), (["cached"], []))
+            self.assertEqual(mock_run.call_count, 1)
+            self.assertEqual(cache.hits, 1)
+
+            from subprocess import TimeoutExpired
+            mock_run.side_effect = TimeoutExpired('python', 10)
+            run_python_script("while True: pass", cache)
+            self.assertEqual(len(cache), 1)
+
+    @patch('script_runner.subprocess.Popen')
+    def test_run_python_script_streams_output(self, mock_popen):
+        """Test that output lines are passed to the callback as they are printed"""
+        process = mock_popen.return_value
+        process.stdout = io.StringIO("first\nsecond\n")
+        process.stderr = io.StringIO("Traceback\nValueError: boom\n")
+        streamed = []
+
+        logs, tasks = run_python_script("print('first')", on_log=streamed.append)
+
+        self.assertEqual(logs, [])
+        self.assertEqual(sorted(streamed), sorted(["first", "second", "Traceback", "ValueError: boom"]))
+        self.assertLess(streamed.index("first"), streamed.index("second"))
+        self.assertEqual(tasks, [{'type': 'error', 'description': "ValueError: boom"}])
+        self.assertIn('-u', mock_popen.call_args.args[0])
+
     @patch('script_runner.subprocess.run')
     def test_run_python_script_timeout(self, mock_run):
         """Test running Python script that times out"""
@@ -248,6 +487,9 @@ console.log('JavaScript executed successfully');
         # Then
         self.assertEqual(logs, ['JavaScript executed successfully'])
         self.assertEqual(len(tasks), 0)
+        # The browser is kept for the next run and quit on close
+        mock_driver.quit.assert_not_called()
+        self.script_runner.close()
         mock_driver.quit.assert_called_once()
         
     @patch('script_runner.webdriver')
@@ -417,6 +659,9 @@ function testFunction() {
         # Verify script execution
         self.assertEqual(logs, ['Integration test log'])
         self.assertEqual(len(tasks), 0)
+        # The browser is kept for the next run and quit on close
+        mock_driver.quit.assert_not_called()
+        self.script_runner.close()
         mock_driver.quit.assert_called_once()
 
 
@@ -0,0 +1,262 @@
+import unittest
+import gzip
+import io
+import json
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+import site_exporter
+from site_exporter import export_site, load_manifest, MANIFEST_NAME, EXPORTED, SKIPPED, REMOVED, FAILED
+
+
+def write_file(path, content, mode='w'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.write(content)
+
+
+class TestSiteExporter(unittest.TestCase):
+    """Unit tests for the site exporter"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.temp_dir.name, 'content')
+        self.output = os.path.join(self.temp_dir.name, 'public')
+        for i in range(4):
+            write_file(os.path.join(self.source, f'page{i}.haba'), f"<content_layer>Page {i}</content_layer>")
+        write_file(os.path.join(self.source, 'blog', 'post.haba'), "<content_layer>Post</content_layer>")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def statuses(self, results):
+        return {result.source: result.status for result in results}
+
+    def test_first_build_exports_every_file(self):
+        """Test that every source is exported to the mirrored .html path"""
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        self.assertEqual(stats.exported, 5)
+        self.assertEqual(stats.errors, 0)
+        with open(os.path.join(self.output, 'blog', 'post.html'), encoding='utf-8') as f:
+            html = f.read()
+        self.assertIn("Post", html)
+        self.assertIn("<title>post</title>", html)
+
+        manifest = load_manifest(self.output)
+        self.assertEqual(len(manifest['files']), 5)
+        self.assertEqual(manifest['files'][os.path.join('blog', 'post.haba')]['output'],
+                         os.path.join('blog', 'post.html'))
+
+    def test_unchanged_build_skips_every_file(self):
+        """Test that a second build without changes exports nothing"""
+        export_site(self.source, self.output, max_workers=1)
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        self.assertEqual(stats.exported, 0)
+        self.assertEqual(stats.skipped, 5)
+
+    def test_only_changed_files_are_exported(self):
+        """Test that edited files are re-exported and touched files are not"""
+        export_site(self.source, self.output, max_workers=1)
+        write_file(os.path.join(self.source, 'page1.haba'), "<content_layer>Edited</content_layer>")
+        touched = os.path.join(self.source, 'page2.haba')
+        os.utime(touched, ns=(0, 0))
+
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        statuses = self.statuses(results)
+        self.assertEqual(statuses['page1.haba'], EXPORTED)
+        self.assertEqual(statuses['page2.haba'], SKIPPED)
+        self.assertEqual(stats.exported, 1)
+        with open(os.path.join(self.output, 'page1.html'), encoding='utf-8') as f:
+            self.assertIn("Edited", f.read())
+
+    def test_exporter_version_change_rebuilds_everything(self):
+        """Test that a manifest from another exporter version is not trusted"""
+        export_site(self.source, self.output, max_workers=1)
+        with patch.object(site_exporter, 'EXPORTER_VERSION', 'next'):
+            results, stats = export_site(self.source, self.output, max_workers=1)
+        self.assertEqual(stats.exported, 5)
+
+    def test_missing_output_is_exported_again(self):
+        """Test that a deleted output file is regenerated"""
+        export_site(self.source, self.output, max_workers=1)
+        os.remove(os.path.join(self.output, 'page0.html'))
+
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        self.assertEqual(self.statuses(results)['page0.haba'], EXPORTED)
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'page0.html')))
+
+    def test_deleted_source_removes_output(self):
+        """Test that the output of a deleted source is removed"""
+        export_site(self.source, self.output, max_workers=1)
+        os.remove(os.path.join(self.source, 'page3.haba'))
+
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        self.assertEqual(self.statuses(results)['page3.haba'], REMOVED)
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'page3.html')))
+        self.assertNotIn('page3.haba', load_manifest(self.output)['files'])
+
+    def test_export_in_process_pool(self):
+        """Test exporting across worker processes"""
+        results, stats = export_site(self.source, self.output, max_workers=2, chunk_size=1)
+        self.assertEqual(stats.exported, 5)
+        self.assertEqual([result.source for result in results], sorted(result.source for result in results))
+
+    def test_undecodable_source_is_reported(self):
+        """Test that a bad source is reported and retried on the next build"""
+        write_file(os.path.join(self.source, 'bad.haba'), b'\xff\xfe', mode='wb')
+
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        self.assertEqual(self.statuses(results)['bad.haba'], FAILED)
+        self.assertEqual(stats.errors, 1)
+        self.assertNotIn('bad.haba', load_manifest(self.output)['files'])
+
+    def test_corrupt_manifest_triggers_full_build(self):
+        """Test that an unreadable manifest is ignored"""
+        export_site(self.source, self.output, max_workers=1)
+        with open(os.path.join(self.output, MANIFEST_NAME), 'w') as f:
+            f.write("{not json")
+
+        results, stats = export_site(self.source, self.output, max_workers=1)
+
+        self.assertEqual(stats.exported, 5)
+        with open(os.path.join(self.output, MANIFEST_NAME)) as f:
+            self.assertEqual(len(json.load(f)['files']), 5)
+
+    def test_precompressed_minified_build(self):
+        """Test that compressed copies are written, recorded and cleaned up"""
+        results, stats = export_site(self.source, self.output, max_workers=1, minify=True, precompress=['gzip'])
+
+        gz_path = os.path.join(self.output, 'page0.html.gz')
+        with gzip.open(gz_path, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'<!DOCTYPE html><html lang="en"><head>'))
+        self.assertGreater(stats.html_bytes, 0)
+        self.assertGreater(stats.compressed_bytes, 0)
+
+        # Changing the options rebuilds every page and drops the stale copies
+        results, stats = export_site(self.source, self.output, max_workers=1)
+        self.assertEqual(stats.exported, 5)
+        self.assertFalse(os.path.exists(gz_path))
+
+    def test_deleted_source_removes_compressed_copies(self):
+        """Test that every output of a deleted source is removed"""
+        export_site(self.source, self.output, max_workers=1, precompress=['gzip'])
+        os.remove(os.path.join(self.source, 'page1.haba'))
+
+        export_site(self.source, self.output, max_workers=1, precompress=['gzip'])
+
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'page1.html')))
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'page1.html.gz')))
+
+    def test_main_reports_compression_savings(self):
+        """Test that the CLI reports the size saved by precompression"""
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            site_exporter.main([self.source, self.output, '--workers', '1', '--minify', '--precompress', 'gzip'])
+        self.assertIn("saved)", mock_stdout.getvalue())
+
+    def test_template_change_rebuilds_everything(self):
+        """Test that pages are re-exported when the template changes"""
+        export_site(self.source, self.output, max_workers=1)
+        results, stats = export_site(self.source, self.output, max_workers=1,
+                                     template_text="<h1>{{title}}</h1>{{content}}")
+
+        self.assertEqual(stats.exported, 5)
+        with open(os.path.join(self.output, 'page2.html'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), "<h1>page2</h1>Page 2")
+
+    def test_shared_css_build(self):
+        """Test that every page links one content-hashed stylesheet"""
+        write_file(os.path.join(self.source, 'styled.haba'),
+                   "<content_layer>Styled</content_layer><presentation_layer><containers>div</containers>"
+                   "<styles>color: 'red'</styles></presentation_layer>")
+
+        results, stats = export_site(self.source, self.output, max_workers=1, shared_css=True)
+
+        self.assertTrue(stats.stylesheet.startswith('haba-styles-'))
+        with open(os.path.join(self.output, stats.stylesheet), encoding='utf-8') as f:
+            self.assertIn("color: red", f.read())
+        with open(os.path.join(self.output, 'blog', 'post.html'), encoding='utf-8') as f:
+            html = f.read()
+        self.assertIn(f'<link rel="stylesheet" href="../{stats.stylesheet}">', html)
+        self.assertNotIn("<style>", html)
+
+        # An unchanged build keeps the stylesheet and skips every page
+        results, again = export_site(self.source, self.output, max_workers=1, shared_css=True)
+        self.assertEqual(again.stylesheet, stats.stylesheet)
+        self.assertEqual(again.exported, 0)
+
+    def test_new_style_replaces_shared_stylesheet(self):
+        """Test that a new style renames the stylesheet and relinks unchanged pages"""
+        results, first = export_site(self.source, self.output, max_workers=1, shared_css=True)
+        write_file(os.path.join(self.source, 'page1.haba'),
+                   "<content_layer>Blue</content_layer><presentation_layer><containers>div</containers>"
+                   "<styles>color: 'blue'</styles></presentation_layer>")
+
+        results, second = export_site(self.source, self.output, max_workers=1, shared_css=True)
+
+        self.assertNotEqual(second.stylesheet, first.stylesheet)
+        self.assertEqual(second.exported, 5)
+        self.assertFalse(os.path.exists(os.path.join(self.output, first.stylesheet)))
+        with open(os.path.join(self.output, 'page0.html'), encoding='utf-8') as f:
+            self.assertIn(second.stylesheet, f.read())
+
+    def test_new_style_relinks_touched_pages(self):
+        """Test that a page touched but not changed is relinked when the stylesheet changes"""
+        results, first = export_site(self.source, self.output, max_workers=1, shared_css=True)
+        os.utime(os.path.join(self.source, 'page0.haba'), ns=(0, 0))
+        write_file(os.path.join(self.source, 'page1.haba'),
+                   "<content_layer>Blue</content_layer><presentation_layer><containers>div</containers>"
+                   "<styles>color: 'blue'</styles></presentation_layer>")
+
+        results, second = export_site(self.source, self.output, max_workers=1, shared_css=True)
+
+        self.assertEqual(self.statuses(results)['page0.haba'], EXPORTED)
+        with open(os.path.join(self.output, 'page0.html'), encoding='utf-8') as f:
+            html = f.read()
+        self.assertIn(second.stylesheet, html)
+        self.assertNotIn(first.stylesheet, html)
+
+    def test_shared_css_needs_stylesheet_slot(self):
+        """Test that a template without a {{stylesheet}} slot is rejected"""
+        with self.assertRaises(site_exporter.TemplateError):
+            export_site(self.source, self.output, max_workers=1, shared_css=True,
+                        template_text="{{content}}")
+
+    def test_main_rejects_bad_template(self):
+        """Test that a malformed template file is reported before exporting"""
+        template_path = os.path.join(self.temp_dir.name, 'bad.tmpl')
+        write_file(template_path, "{{unknown}}")
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            with self.assertRaises(SystemExit) as cm:
+                site_exporter.main([self.source, self.output, '--template', template_path])
+        self.assertEqual(cm.exception.code, 1)
+        self.assertIn("Cannot use template", mock_stdout.getvalue())
+
+    def test_main_reports_summary(self):
+        """Test the CLI summary output"""
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            site_exporter.main([self.source, self.output, '--workers', '1'])
+        output = mock_stdout.getvalue()
+        self.assertIn("5 files: 5 exported, 0 unchanged, 0 removed", output)
+
+    def test_main_exits_with_error_when_files_fail(self):
+        """Test that a failing file gives a non-zero exit code"""
+        write_file(os.path.join(self.source, 'bad.haba'), b'\xff', mode='wb')
+        with patch('sys.stdout', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit) as cm:
+                site_exporter.main([self.source, self.output, '--workers', '1'])
+        self.assertEqual(cm.exception.code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import io
+import mmap
+import sys
+import os
+import tempfile
+
+# Add src/p to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'p'))
+
+from haba_parser import HabaParser
+from stream_parser import (HabaStreamParser, HabaEvent, CONTENT_EVENT,
+                           PRESENTATION_ITEM_EVENT, SCRIPT_EVENT)
+
+
+SAMPLE_HABA = """
+<content_layer>
+    Welcome to QuantaHaba!
+    Ünïcode content.
+</content_layer>
+<presentation_layer>
+    <containers>
+        h1
+        p
+        div
+    </containers>
+    <styles>
+        color: 'blue'
+        color: 'red'
+    </styles>
+</presentation_layer>
+<script_layer>
+    console.log('streamed');
+</script_layer>
+"""
+
+
+class TestHabaStreamParser(unittest.TestCase):
+    """Unit tests for HabaStreamParser class"""
+
+    def setUp(self):
+        self.expected = HabaParser().parse(SAMPLE_HABA)
+
+    def assert_matches_parser(self, result):
+        self.assertEqual(result.content, self.expected.content)
+        self.assertEqual(result.presentation_items, self.expected.presentation_items)
+        self.assertEqual(result.script, self.expected.script)
+
+    def test_parse_text_stream(self):
+        """Test parsing a text file object"""
+        result = HabaStreamParser().parse(io.StringIO(SAMPLE_HABA))
+        self.assert_matches_parser(result)
+
+    def test_parse_with_tiny_chunks(self):
+        """Test that tags and multi-byte characters split across chunks are handled"""
+        for chunk_size in (1, 2, 3, 7):
+            with self.subTest(chunk_size=chunk_size):
+                parser = HabaStreamParser(chunk_size=chunk_size)
+                self.assert_matches_parser(parser.parse(io.BytesIO(SAMPLE_HABA.encode('utf-8'))))
+
+    def test_parse_mmap(self):
+        """Test parsing a memory-mapped file"""
+        with tempfile.NamedTemporaryFile(suffix='.haba', delete=False) as f:
+            f.write(SAMPLE_HABA.encode('utf-8'))
+            path = f.name
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                result = HabaStreamParser(chunk_size=16).parse(mapped)
+            self.assert_matches_parser(result)
+        finally:
+            os.remove(path)
+
+    def test_iter_events_order(self):
+        """Test that events are yielded in document order"""
+        events = list(HabaStreamParser(chunk_size=8).iter_events(io.StringIO(SAMPLE_HABA)))
+        kinds = [event.kind for event in events]
+
+        self.assertIsInstance(events[0], HabaEvent)
+        self.assertEqual(kinds[0], CONTENT_EVENT)
+        self.assertEqual(kinds[-1], SCRIPT_EVENT)
+        items = [event.value for event in events if event.kind == PRESENTATION_ITEM_EVENT]
+        self.assertEqual(items, [("h1", "color: 'blue'"), ("p", "color: 'red'"), ("div", "")])
+
+    def test_parse_empty_stream(self):
+        """Test parsing an empty stream"""
+        result = HabaStreamParser().parse(io.StringIO(""))
+        self.assertEqual(result.content, "")
+        self.assertEqual(result.presentation_items, [])
+        self.assertEqual(result.script, "")
+
+
+class TestHabaStreamParserBDD(unittest.TestCase):
+    """BDD-style tests for HabaStreamParser"""
+
+    def test_given_large_content_layer_when_streamed_then_chunks_are_bounded(self):
+        """
+        Given: A document with a content layer much larger than the chunk size
+        When: The document is streamed
+        Then: Content arrives in many chunks no larger than about one read
+        """
+        # Given
+        chunk_size = 1024
+        content = "line of content\n" * 10000
+        haba_content = f"<content_layer>\n{content}</content_layer>"
+
+        # When
+        events = list(HabaStreamParser(chunk_size=chunk_size).iter_events(io.StringIO(haba_content)))
+
+        # Then
+        self.assertGreater(len(events), 100)
+        self.assertTrue(all(len(event.value) <= 2 * chunk_size for event in events))
+        self.assertEqual("".join(event.value for event in events), content.strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,8 @@ from unittest.mock import patch, mock_open, MagicMock
 import sys
 import os
 import io
+import json
+import tempfile
 
 # Add the root directory to the path to allow imports from src
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -13,6 +15,10 @@ sys.modules['selenium'] = selenium_mock
 sys.modules['selenium.webdriver'] = MagicMock()
 sys.modules['selenium.webdriver.firefox'] = MagicMock()
 sys.modules['selenium.webdriver.firefox.options'] = MagicMock()
+sys.modules['selenium.common'] = MagicMock()
+selenium_exceptions_mock = MagicMock()
+selenium_exceptions_mock.TimeoutException = type('TimeoutException', (Exception,), {})
+sys.modules['selenium.common.exceptions'] = selenium_exceptions_mock
 
 # We need to import the cli_runner module to test its main function
 from src.p import cli_runner
@@ -73,5 +79,102 @@ class TestCliRunner(unittest.TestCase):
         output = mock_stdout.getvalue()
         self.assertIn("Error: File not found", output)
 
+class TestCliRunnerBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        for name in ('a.haba', 'b.haba', os.path.join('sub', 'c.haba')):
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"<script_layer>console.log('{name}');</script_layer>")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_main(self, args, results):
+        """Runs main with a ScriptRunner whose run_many gives results[contents] for each file."""
+        def run_many(paths, max_workers=None, timeout=None, read=None):
+            for path in paths:
+                try:
+                    contents = read(path)
+                except OSError as e:
+                    yield path, [], [{'type': 'error', 'description': f"Failed to read document: {e}"}]
+                    continue
+                logs, tasks = results.get(contents, ([], []))
+                yield path, logs, tasks
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch('src.p.cli_runner.ScriptRunner') as mock_script_runner, \
+                patch('sys.stdout', stdout), patch('sys.stderr', stderr):
+            mock_script_runner.return_value.run_many.side_effect = run_many
+            try:
+                cli_runner.main(args)
+                code = 0
+            except SystemExit as e:
+                code = e.code
+        mock_script_runner.return_value.close.assert_called_once()
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_jsonl_output_for_a_directory(self):
+        code, stdout, stderr = self.run_main([self.root, '--jsonl', '--jobs', '2'], {
+            "<script_layer>console.log('a.haba');</script_layer>": (['a.haba'], []),
+        })
+
+        self.assertEqual(code, 0)
+        records = [json.loads(line) for line in stdout.splitlines()]
+        self.assertEqual(sorted(os.path.relpath(record['file'], self.root) for record in records),
+                         ['a.haba', 'b.haba', os.path.join('sub', 'c.haba')])
+        by_name = {os.path.basename(record['file']): record for record in records}
+        self.assertEqual(by_name['a.haba']['logs'], ['a.haba'])
+        self.assertTrue(all(record['ok'] for record in records))
+        summary = json.loads(stderr)['summary']
+        self.assertEqual(summary['documents'], 3)
+        self.assertEqual(summary['script_errors'], 0)
+
+    def test_script_errors_give_exit_code_3(self):
+        error = {'type': 'error', 'description': 'ReferenceError: x is not defined', 'details': ''}
+        code, stdout, stderr = self.run_main([os.path.join(self.root, '*.haba')], {
+            "<script_layer>console.log('b.haba');</script_layer>": ([], [error]),
+        })
+
+        self.assertEqual(code, 3)
+        self.assertIn("[ERROR] " + os.path.join(self.root, 'b.haba'), stdout)
+        self.assertIn("- [ERROR] ReferenceError: x is not defined", stdout)
+        self.assertIn("Ran 2 scripts", stdout)
+        self.assertIn("1 script(s) reported errors.", stdout)
+
+    def test_missing_file_gives_exit_code_1(self):
+        code, stdout, stderr = self.run_main(
+            [os.path.join(self.root, 'a.haba'), os.path.join(self.root, 'missing.haba'), '--quiet'], {})
+
+        self.assertEqual(code, 1)
+        self.assertNotIn("[OK]", stdout)
+        self.assertIn("missing.haba", stdout)
+        self.assertIn("1 file(s) could not be read.", stdout)
+
+    @patch('src.p.script_runner.webdriver')
+    def test_browser_failure_fails_the_run(self, mock_webdriver):
+        mock_webdriver.Firefox.side_effect = OSError("geckodriver not found")
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch('sys.stdout', stdout), patch('sys.stderr', stderr):
+            with self.assertRaises(SystemExit) as cm:
+                cli_runner.main([self.root, '--jsonl', '--jobs', '2'])
+
+        self.assertEqual(cm.exception.code, 3)
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertFalse(any(record['ok'] for record in records))
+        self.assertIn("geckodriver not found", records[0]['tasks'][0]['description'])
+        self.assertEqual(json.loads(stderr.getvalue())['summary']['script_errors'], 3)
+
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_no_matching_files(self, mock_stderr):
+        with self.assertRaises(SystemExit) as cm:
+            cli_runner.main([os.path.join(self.root, '*.missing')])
+        self.assertEqual(cm.exception.code, 1)
+        self.assertIn("No .haba files found", mock_stderr.getvalue())
+
 if __name__ == '__main__':
     unittest.main()
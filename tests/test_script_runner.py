@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, call
 import sys
 import os
 
@@ -42,14 +42,16 @@ class TestScriptRunner(unittest.TestCase):
         </script_layer>
         """
         
-        runner = ScriptRunner()
+        runner = ScriptRunner(in_memory=False)
 
         # Act
         logs, tasks = runner.run_script(haba_content)
 
         # Assert
         mock_firefox.assert_called_once()
-        mock_driver.get.assert_called_once_with("file:///tmp/fake_file.html")
+        self.assertEqual(mock_driver.get.call_args_list[0], call("file:///tmp/fake_file.html"))
+        # The page is reset before the browser is reused
+        mock_driver.get.assert_called_with("about:blank")
         self.assertEqual(mock_driver.execute_script.call_count, 2)
         
         # Check logs